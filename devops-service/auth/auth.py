@@ -1,16 +1,26 @@
+from typing import Callable, Optional
 from fastapi import Depends, HTTPException, status, Request
+from fastapi.responses import RedirectResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from auth.utils import verify_password, get_user, verify_token
+from fastapi.templating import Jinja2Templates
+from auth.utils import verify_password_async, get_user, verify_token
 from auth.models import User
 
 security = HTTPBearer()
 
+# Политики для неавторизованного запроса
+LOGIN_PAGE = "login_page"  # отдать страницу входа по тому же адресу
+REDIRECT = "redirect"      # перенаправить на /login
+API = "api"                # 401 (для JSON API)
+
+login_templates = Jinja2Templates(directory=["./templates/auth", "./templates/main"])
+
 async def authenticate_user(username: str, password: str):
     """Аутентификация пользователя"""
     user = get_user(username)
     if not user:
         return False
-    if not verify_password(password, user["hashed_password"]):
+    if not await verify_password_async(password, user["hashed_password"]):
         return False
     return user
 
@@ -32,28 +42,90 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
     
     return user
 
+def _user_from_token(token: Optional[str]):
+    if not token:
+        return None
+    username = verify_token(token)
+    return get_user(username) if username else None
+
 async def get_current_user_from_request(request: Request):
-    """Получение текущего пользователя из заголовка Authorization или cookie"""
+    """
+    Получение текущего пользователя из заголовка Authorization или cookie.
+    
+    Пользователь определяется один раз за запрос и хранится в request.state.user,
+    повторные вызовы (зависимости, вложенные функции) берут его оттуда.
+    """
+    if hasattr(request.state, "user"):
+        return request.state.user
+    
+    user = None
     # Проверяем заголовок Authorization
     auth_header = request.headers.get("Authorization")
     if auth_header and auth_header.startswith("Bearer "):
-        token = auth_header.split(" ")[1]
-        username = verify_token(token)
-        if username:
-            user = get_user(username)
-            if user:
-                return user
+        user = _user_from_token(auth_header.split(" ")[1])
     
     # Проверяем cookie
-    token = request.cookies.get("access_token")
-    if token:
-        username = verify_token(token)
-        if username:
-            user = get_user(username)
-            if user:
-                return user
+    if user is None:
+        user = _user_from_token(request.cookies.get("access_token"))
+    
+    request.state.user = user
+    return user
+
+class AuthRequired(Exception):
+    """Запрос к странице без авторизации (ответ - по политике LOGIN_PAGE или REDIRECT)"""
+    
+    def __init__(self, policy: str):
+        self.policy = policy
+
+async def auth_required_handler(request: Request, exc: AuthRequired):
+    """Обработчик AuthRequired (регистрируется в main.py)"""
+    if exc.policy == REDIRECT:
+        return RedirectResponse(url="/login", status_code=302)
+    return login_templates.TemplateResponse("login.html", {"request": request})
+
+class UserRequired:
+    """
+    Зависимость FastAPI: текущий пользователь или отказ по политике.
+    
+    Используется в параметре обработчика (current_user: dict = Depends(page_user))
+    или для всего роутера (APIRouter(dependencies=[Depends(page_user)])).
+    """
+    
+    def __init__(self, policy: str = API):
+        self.policy = policy
+    
+    async def __call__(self, request: Request) -> dict:
+        user = await get_current_user_from_request(request)
+        if user:
+            return user
+        if self.policy == API:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Необходима авторизация"
+            )
+        raise AuthRequired(self.policy)
+
+# Страницы: форма входа по тому же адресу; перенаправление на /login; JSON API: 401
+page_user = UserRequired(LOGIN_PAGE)
+redirect_user = UserRequired(REDIRECT)
+api_user = UserRequired(API)
+
+class Permission:
+    """
+    Зависимость FastAPI: пользователь с правом check (функция из auth/permissions.py),
+    иначе 403. Неавторизованный запрос обрабатывается зависимостью auth.
+    """
+    
+    def __init__(self, check: Callable[[Optional[dict]], bool], detail: str, auth: UserRequired = api_user):
+        self.check = check
+        self.detail = detail
+        self.auth = auth
     
-    return None
+    async def __call__(self, request: Request) -> dict:
+        user = await self.auth(request)
+        if not self.check(user):
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=self.detail)
+        return user
 
 def create_access_token(data: dict):
     """Создание токена доступа"""
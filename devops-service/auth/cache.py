@@ -0,0 +1,136 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+from data.atomic import atomic_dump_json, file_lock
+
+
+class UserStore:
+    """
+    Процессный кэш пользователей поверх users.json.
+
+    Файл читается один раз и перечитывается, только если изменились его
+    mtime или размер (другой процесс, ручное редактирование). Запись через
+    save() сразу обновляет кэш (write-through). Запись идет под файловой
+    блокировкой users.json, поэтому воркеры не затирают изменения друг друга.
+    """
+
+    def __init__(self, users_file: str):
+        self.users_file = users_file
+        self._lock = threading.Lock()
+        self._users: Dict[str, dict] = {}
+        self._signature: Optional[Tuple[int, int]] = None
+
+    def _file_signature(self) -> Optional[Tuple[int, int]]:
+        """Подпись файла (mtime, размер) для обнаружения внешних изменений"""
+        try:
+            stat = os.stat(self.users_file)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _refresh(self):
+        """Перечитывает файл, если он изменился с момента последней загрузки"""
+        signature = self._file_signature()
+        if signature == self._signature:
+            return
+        users = {}
+        if signature is not None:
+            try:
+                with open(self.users_file, "r", encoding="utf-8") as f:
+                    users = json.load(f)
+            except json.JSONDecodeError as e:
+                # Файл в процессе ручного редактирования - оставляем прежний кэш
+                print(f"Ошибка загрузки пользователей: {e}")
+                return
+        self._users = users
+        self._signature = signature
+
+    def get(self, username: str) -> Optional[dict]:
+        """Пользователь по имени (копия записи) или None"""
+        with self._lock:
+            self._refresh()
+            user = self._users.get(username)
+        return dict(user) if user is not None else None
+
+    def all(self) -> Dict[str, dict]:
+        """Все пользователи (копия, ее можно изменять и передать в save)"""
+        with self._lock:
+            self._refresh()
+            return {name: dict(user) for name, user in self._users.items()}
+
+    def _write(self, users: Dict[str, dict]):
+        atomic_dump_json(self.users_file, users)
+        self._users = {name: dict(user) for name, user in users.items()}
+        self._signature = self._file_signature()
+
+    def save(self, users: Dict[str, dict]):
+        """Записывает пользователей в файл и обновляет кэш"""
+        os.makedirs(os.path.dirname(self.users_file) or ".", exist_ok=True)
+        with self._lock, file_lock(self.users_file):
+            self._write(users)
+
+    def add(self, username: str, user: dict) -> bool:
+        """
+        Добавляет пользователя, если имя свободно (False - имя занято).
+        Проверка и запись идут под одной блокировкой, поэтому одновременная
+        регистрация в разных процессах не теряет пользователей.
+        """
+        os.makedirs(os.path.dirname(self.users_file) or ".", exist_ok=True)
+        with self._lock, file_lock(self.users_file):
+            self._refresh()
+            if username in self._users:
+                return False
+            users = dict(self._users)
+            users[username] = user
+            self._write(users)
+            return True
+
+    def invalidate(self):
+        """Сбрасывает кэш, следующее обращение перечитает файл"""
+        with self._lock:
+            self._signature = None
+
+
+class TokenCache:
+    """
+    LRU-кэш проверенных JWT: токен -> (имя пользователя, срок действия).
+
+    Повторная проверка того же токена не декодирует JWT и не проверяет
+    подпись; запись с истекшим exp удаляется при обращении.
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+
+    def get(self, token: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                return None
+            username, expires_at = entry
+            if expires_at <= time.time():
+                del self._entries[token]
+                return None
+            self._entries.move_to_end(token)
+            return username
+
+    def put(self, token: str, username: str, expires_at: float):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[token] = (username, expires_at)
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 from typing import Optional, Literal
 from datetime import datetime
 
@@ -41,6 +41,10 @@ class NewsUpdate(BaseModel):
     label: Optional[str] = None
 
 class News(BaseModel):
+    # Неизменяемая: NewsStore отдает всем запросам общие объекты из кэша,
+    # изменения - через model_copy(update=...) и NewsStore.put
+    model_config = ConfigDict(frozen=True)
+
     id: str
     title: str
     content: str
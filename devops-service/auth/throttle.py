@@ -0,0 +1,110 @@
+import math
+import os
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, Hashable, Optional
+from services.metrics import metrics
+
+
+class LoginThrottled(Exception):
+    """Слишком много попыток входа (HTTP 429, при перегрузке хеширования - 503; с Retry-After)"""
+
+    def __init__(self, detail: str, retry_after: int, status_code: int = 429):
+        super().__init__(detail)
+        self.detail = detail
+        self.retry_after = retry_after
+        self.status_code = status_code
+
+
+class SlidingWindow:
+    """Счетчик событий по ключу за последние window секунд"""
+
+    def __init__(self, limit: int, window: float, max_keys: int = 10000):
+        self.limit = limit
+        self.window = window
+        self.max_keys = max_keys
+        self._events: Dict[Hashable, Deque[float]] = {}
+
+    def _trim(self, key: Hashable, now: float) -> Optional[Deque[float]]:
+        events = self._events.get(key)
+        if events is None:
+            return None
+        while events and events[0] <= now - self.window:
+            events.popleft()
+        if not events:
+            del self._events[key]
+            return None
+        return events
+
+    def retry_after(self, key: Hashable, now: float) -> int:
+        """0, если лимит не исчерпан, иначе - через сколько секунд освободится попытка"""
+        if self.limit <= 0:
+            return 0
+        events = self._trim(key, now)
+        if events is None or len(events) < self.limit:
+            return 0
+        return max(1, math.ceil(events[0] + self.window - now))
+
+    def add(self, key: Hashable, now: float):
+        if self.limit <= 0:
+            return
+        if key not in self._events and len(self._events) >= self.max_keys:
+            # Защита от роста памяти при переборе ключей: удаляем самый старый
+            self._events.pop(next(iter(self._events)))
+        self._events.setdefault(key, deque()).append(now)
+
+    def reset(self, key: Hashable):
+        self._events.pop(key, None)
+
+
+class LoginThrottle:
+    """
+    Ограничение попыток входа, проверяется до bcrypt.
+
+    С одного IP - не более ip_limit попыток за window секунд; попытка
+    учитывается сразу, поэтому параллельный перебор тоже ограничен.
+    Для пары (имя пользователя, IP) - не более user_limit неверных паролей
+    за window секунд (успешный вход сбрасывает счетчик пары). Неудачи
+    считаются по паре, а не по имени, чтобы перебор с чужих адресов
+    не блокировал вход владельцу учетной записи.
+    """
+
+    def __init__(self, ip_limit: int = 20, user_limit: int = 5, window: float = 60.0):
+        self._lock = threading.Lock()
+        self.by_ip = SlidingWindow(ip_limit, window)
+        self.by_user = SlidingWindow(user_limit, window)
+
+    @classmethod
+    def from_env(cls) -> "LoginThrottle":
+        return cls(
+            ip_limit=int(os.getenv("LOGIN_IP_LIMIT", "20")),
+            user_limit=int(os.getenv("LOGIN_USER_LIMIT", "5")),
+            window=float(os.getenv("LOGIN_WINDOW", "60"))
+        )
+
+    def check(self, ip: str, username: Optional[str] = None):
+        """Учитывает попытку входа (или регистрации - без имени) или отклоняет ее (LoginThrottled)"""
+        now = time.time()
+        with self._lock:
+            retry_after = self.by_ip.retry_after(ip, now)
+            if retry_after:
+                metrics.inc("login_throttled_ip")
+                raise LoginThrottled("Слишком много попыток входа с вашего адреса. Попробуйте позже", retry_after)
+            retry_after = self.by_user.retry_after((username, ip), now) if username is not None else 0
+            if retry_after:
+                metrics.inc("login_throttled_user")
+                raise LoginThrottled("Слишком много неудачных попыток входа. Попробуйте позже", retry_after)
+            self.by_ip.add(ip, now)
+
+    def record_failure(self, ip: str, username: str):
+        """Учитывает неверный пароль для пары (имя, IP)"""
+        with self._lock:
+            self.by_user.add((username, ip), time.time())
+
+    def record_success(self, ip: str, username: str):
+        with self._lock:
+            self.by_user.reset((username, ip))
+
+
+login_throttle = LoginThrottle.from_env()
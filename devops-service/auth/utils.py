@@ -1,15 +1,26 @@
 from passlib.context import CryptContext
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
-import json
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
 import os
+import time
 from typing import Optional
+from auth.cache import TokenCache, UserStore
+from auth.throttle import LoginThrottled
+from services.metrics import metrics
 
 # Настройки для JWT
 SECRET_KEY = "your-secret-key-here"  # В продакшене использовать переменную окружения
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 1440  # 24 часа
 
+USERS_FILE = "data/users/users.json"
+# Пользователи в памяти процесса (перечитываются при изменении файла)
+user_store = UserStore(USERS_FILE)
+# Проверенные токены: повторная проверка без декодирования JWT
+token_cache = TokenCache(int(os.getenv("AUTH_TOKEN_CACHE_SIZE", "1024")))
+
 # Настройки для хеширования паролей
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
@@ -25,6 +36,37 @@ def get_password_hash(password: str) -> str:
     """Хеширование пароля"""
     return pwd_context.hash(password)
 
+# bcrypt (~0.3 с на вызов) выполняется в отдельных потоках, чтобы не блокировать
+# цикл событий; число потоков и очередь ожидания ограничены
+HASH_WORKERS = int(os.getenv("AUTH_HASH_WORKERS", str(min(2, os.cpu_count() or 1))))
+HASH_QUEUE_LIMIT = int(os.getenv("AUTH_HASH_QUEUE", "32"))
+_hash_executor = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="bcrypt")
+_hash_pending = 0
+
+async def _run_hash(func, *args):
+    """Выполняет функцию bcrypt в пуле потоков (LoginThrottled 503, если очередь заполнена)"""
+    global _hash_pending
+    if _hash_pending >= HASH_QUEUE_LIMIT:
+        metrics.inc("auth_hash_rejected")
+        raise LoginThrottled("Сервер перегружен попытками входа. Попробуйте через несколько секунд", 2, status_code=503)
+    _hash_pending += 1
+    metrics.set_gauge("auth_hash_pending", _hash_pending)
+    started = time.perf_counter()
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_hash_executor, func, *args)
+    finally:
+        _hash_pending -= 1
+        metrics.set_gauge("auth_hash_pending", _hash_pending)
+        metrics.observe("auth_hash_seconds", time.perf_counter() - started)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Проверка пароля без блокировки цикла событий"""
+    return await _run_hash(verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    """Хеширование пароля без блокировки цикла событий"""
+    return await _run_hash(get_password_hash, password)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """Создание JWT токена"""
     to_encode = data.copy()
@@ -37,35 +79,33 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     return encoded_jwt
 
 def verify_token(token: str) -> Optional[str]:
-    """Проверка JWT токена"""
+    """Проверка JWT токена (результат кэшируется до истечения exp)"""
+    username = token_cache.get(token)
+    if username is not None:
+        return username
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
         if username is None:
             return None
+        expires_at = payload.get("exp")
+        # Токены без срока действия не кэшируем
+        if isinstance(expires_at, (int, float)):
+            token_cache.put(token, username, float(expires_at))
         return username
     except JWTError:
         return None
 
 def load_users() -> dict:
-    """Загрузка пользователей из JSON файла"""
-    users_file = "data/users/users.json"
-    if os.path.exists(users_file):
-        with open(users_file, "r", encoding="utf-8") as f:
-            return json.load(f)
-    return {}
+    """Загрузка пользователей (из кэша, файл перечитывается только при изменении)"""
+    return user_store.all()
 
 def save_users(users: dict):
     """Сохранение пользователей в JSON файл"""
-    # Ensure nested users directory exists before writing file
-    os.makedirs("data/users", exist_ok=True)
-    with open("data/users/users.json", "w", encoding="utf-8") as f:
-        json.dump(users, f, ensure_ascii=False, indent=2)
+    # Атомарная запись: сбой посреди сохранения не потеряет базу пользователей;
+    # кэш пользователей обновляется сразу
+    user_store.save(users)
 
 def get_user(username: str):
     """Получение пользователя по имени"""
-    users = load_users()
-    if username in users:
-        user_dict = users[username]
-        return user_dict
-    return None 
\ No newline at end of file
+    return user_store.get(username)
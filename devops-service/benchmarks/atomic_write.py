@@ -0,0 +1,48 @@
+"""
+Бенчмарк стоимости атомарной записи (временный файл + fsync + os.replace)
+по сравнению с прямой перезаписью файла через open('w').
+
+Запуск из каталога devops-service:
+    python -m benchmarks.atomic_write
+"""
+import json
+import os
+import tempfile
+import time
+from data.atomic import atomic_dump_json
+
+
+def plain_dump_json(path: str, data):
+    """Прежний способ записи: перезапись файла на месте"""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+
+
+def throughput(func, path: str, data, seconds: float = 1.0) -> float:
+    """Количество записей в секунду"""
+    count = 0
+    started = time.perf_counter()
+    while time.perf_counter() - started < seconds:
+        func(path, data)
+        count += 1
+    return count / (time.perf_counter() - started)
+
+
+def run(label: str, data):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.json")
+        variants = (
+            ("open('w')", plain_dump_json),
+            ("atomic", atomic_dump_json),
+            ("atomic без fsync каталога", lambda p, d: atomic_dump_json(p, d, fsync_dir=False)),
+        )
+        print(f"--- {label} ---")
+        for name, func in variants:
+            print(f"{name:28} {throughput(func, path, data):10.1f} записей/с")
+
+
+if __name__ == "__main__":
+    small = {"username": "user", "role": "DevOps", "full_name": "Иванов Иван"}
+    large = {str(i): {"id": str(i), "title": f"Новость {i}", "content": "Текст " * 50} for i in range(2000)}
+    run("малый документ (~100 байт)", small)
+    run("большой документ (~700 КБ)", large)
@@ -0,0 +1,66 @@
+"""
+Бенчмарк стоимости авторизации одного запроса: проверка JWT и поиск
+пользователя. Прежний способ (декодирование JWT и чтение users.json на
+каждый запрос) сравнивается с кэшем пользователей и проверенных токенов.
+
+Запуск из каталога devops-service:
+    python -m benchmarks.auth_overhead
+"""
+import json
+import os
+import tempfile
+import time
+from jose import jwt
+from auth.cache import TokenCache, UserStore
+from auth.utils import ALGORITHM, SECRET_KEY, create_access_token
+
+ITERATIONS = 20000
+
+
+def old_get_user(users_file: str, token: str):
+    """Прежний способ: декодирование JWT и чтение users.json"""
+    username = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM]).get("sub")
+    with open(users_file, "r", encoding="utf-8") as f:
+        return json.load(f).get(username)
+
+
+def cached_get_user(store: UserStore, tokens: TokenCache, token: str):
+    """Новый способ: кэш проверенных токенов и пользователей в памяти"""
+    username = tokens.get(token)
+    if username is None:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        username = payload["sub"]
+        tokens.put(token, username, payload["exp"])
+    return store.get(username)
+
+
+def measure(func) -> float:
+    """Среднее время одного вызова, мкс"""
+    started = time.perf_counter()
+    for _ in range(ITERATIONS):
+        func()
+    return (time.perf_counter() - started) / ITERATIONS * 1e6
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        users_file = os.path.join(tmp, "users.json")
+        for count in (10, 1000):
+            users = {
+                f"user{i}": {"username": f"user{i}", "hashed_password": "$2b$12$" + "x" * 53, "role": "DevOps"}
+                for i in range(count)
+            }
+            with open(users_file, "w", encoding="utf-8") as f:
+                json.dump(users, f, ensure_ascii=False, indent=2)
+            token = create_access_token({"sub": "user1"})
+            store, tokens = UserStore(users_file), TokenCache()
+
+            old = measure(lambda: old_get_user(users_file, token))
+            new = measure(lambda: cached_get_user(store, tokens, token))
+            print(f"--- {count} пользователей ---")
+            print(f"users.json + JWT: {old:.1f} мкс/запрос")
+            print(f"кэш:              {new:.1f} мкс/запрос (в {old / new:.0f} раз быстрее)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Бенчмарк проверки чарта целиком (/settings/validate-chart).
+
+Прежний способ: файлы чарта загружаются и проверяются по одному
+(validate_file на каждый файл, последовательно). Новый: ChartValidator -
+распаковка архива в память и параллельная проверка в пуле процессов;
+повторная загрузка того же чарта берется из кэша результатов.
+
+Запуск из каталога devops-service:
+    python -m benchmarks.chart_validate
+"""
+import asyncio
+import io
+import tarfile
+import time
+from typing import Dict
+from services.chart_validator import ChartValidator
+from services.template_validator import TemplateValidator
+
+TEMPLATES = 40
+RESOURCES = 10
+
+TEMPLATE = """apiVersion: apps/v1
+kind: Deployment
+metadata:
+  name: "{{ release }}-app-%(i)d"
+spec:
+  replicas: "{{ replicas | default(1) }}"
+  template:
+    spec:
+      containers:
+        - name: app-%(i)d
+          image: "{{ registry }}/app-%(i)d:{{ tag | default('latest') }}"
+          env:
+# {%% for name, value in env.items() %%}
+            - name: "{{ name | upper }}"
+              value: "{{ value }}"
+# {%% endfor %%}
+"""
+
+
+def make_template(i: int) -> str:
+    """Шаблон из RESOURCES ресурсов (элементы kind: List), чтобы проверка файла была заметной по времени"""
+    items = []
+    for j in range(RESOURCES):
+        lines = (TEMPLATE % {"i": i * RESOURCES + j}).splitlines()
+        items.append("\n".join(["- " + lines[0]] + [line if line.startswith("#") else "  " + line for line in lines[1:]]))
+    return "apiVersion: v1\nkind: List\nitems:\n" + "\n".join(items) + "\n"
+
+
+def make_chart(templates: int) -> Dict[str, str]:
+    files = {
+        "bench/Chart.yaml": "apiVersion: v2\nname: bench\nversion: 0.1.0\n",
+        "bench/values.yaml": "replicas: 2\nregistry: registry.local\n"
+    }
+    for i in range(templates):
+        files[f"bench/templates/app-{i}.yaml"] = make_template(i)
+    return files
+
+
+def make_archive(files: Dict[str, str]) -> bytes:
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w:gz") as archive:
+        for name, content in files.items():
+            data = content.encode("utf-8")
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            archive.addfile(info, io.BytesIO(data))
+    return buffer.getvalue()
+
+
+async def main():
+    files = make_chart(TEMPLATES)
+    archive = make_archive(files)
+    print(f"--- чарт: {len(files)} файлов, архив {len(archive) // 1024} КБ ---")
+
+    validator = TemplateValidator(cache_size=0)
+    started = time.perf_counter()
+    for name, content in files.items():
+        validator.validate_file(name[len("bench/"):], content)
+    print(f"по одному файлу, последовательно:   {(time.perf_counter() - started) * 1000:.0f} мс")
+
+    charts = ChartValidator.from_env(TemplateValidator())
+    try:
+        # Запуск пула процессов - один раз на процесс приложения
+        await charts.validate([("warmup/values.yaml", "a: 1")])
+        started = time.perf_counter()
+        chart_files, skipped = charts.extract([("bench.tgz", io.BytesIO(archive))])
+        print(f"распаковка в память:                {(time.perf_counter() - started) * 1000:.1f} мс")
+        started = time.perf_counter()
+        report = await charts.validate(chart_files, skipped)
+        print(f"ChartValidator, пул процессов:       {(time.perf_counter() - started) * 1000:.0f} мс (воркеров: {charts.workers})")
+        started = time.perf_counter()
+        await charts.validate(chart_files, skipped)
+        print(f"ChartValidator, повтор (кэш):       {(time.perf_counter() - started) * 1000:.1f} мс")
+        print(f"отчет: {report['summary']}")
+    finally:
+        charts.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,174 @@
+"""
+Локальный поддельный сервер Ollama для тестов и нагрузочных бенчмарков.
+
+Поддерживает /api/tags, /api/ps, /api/chat (потоковый и обычный ответ),
+/api/generate, /api/embeddings и /api/pull. Задержка ответа, число
+параллельно обрабатываемых запросов (как OLLAMA_NUM_PARALLEL) и доля
+ошибок настраиваются.
+
+Запуск из каталога devops-service:
+    python -m benchmarks.fake_ollama --port 11500 --models llama3.2,llama3.2:1b --latency 0.5 --parallel 2
+"""
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterable
+
+ANSWER = "Это ответ поддельного сервера Ollama."
+
+
+class FakeOllamaServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port: int, models: Iterable[str] = ("llama3.2:1b",), latency: float = 0.1,
+                 token_delay: float = 0.01, tokens: int = 10, parallel: int = 1, fail_rate: float = 0.0,
+                 load_delay: float = 0.0, embedding_dim: int = 64):
+        super().__init__(("127.0.0.1", port), FakeOllamaHandler)
+        self.models = set(models)
+        self.latency = latency
+        self.token_delay = token_delay
+        self.tokens = tokens
+        self.fail_rate = fail_rate
+        # Время "загрузки модели в память" при первом запросе к ней
+        self.load_delay = load_delay
+        self.embedding_dim = embedding_dim
+        self.loaded_models = set()
+        # Как Ollama: сверх parallel запросы ждут в очереди сервера
+        self.slots = threading.Semaphore(parallel)
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def start(self) -> "FakeOllamaServer":
+        """Запускает сервер в фоновом потоке"""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def has_model(self, model: str) -> bool:
+        return model in self.models or f"{model}:latest" in self.models
+
+    def load(self, model: str):
+        """Имитирует загрузку модели в память при первом обращении"""
+        if model not in self.loaded_models:
+            time.sleep(self.load_delay)
+            self.loaded_models.add(model)
+
+
+class FakeOllamaHandler(BaseHTTPRequestHandler):
+    server: FakeOllamaServer
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, payload, status: int = 200):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length", 0))
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def do_GET(self):
+        if self.path == "/api/tags":
+            self._send_json({"models": [{"name": name} for name in sorted(self.server.models)]})
+        elif self.path == "/api/ps":
+            self._send_json({"models": [{"name": name} for name in sorted(self.server.loaded_models)]})
+        else:
+            self._send_json({"error": "not found"}, 404)
+
+    def do_POST(self):
+        body = self._read_json()
+        with self.server._lock:
+            self.server.requests += 1
+
+        if self.path == "/api/pull":
+            self.server.models.add(body.get("name") or body.get("model", ""))
+            self._send_json({"status": "success"})
+            return
+        if self.path == "/api/embeddings":
+            self._send_json({"embedding": self._embedding(body.get("prompt", ""))})
+            return
+        if self.path not in ("/api/chat", "/api/generate"):
+            self._send_json({"error": "not found"}, 404)
+            return
+
+        model = body.get("model", "")
+        if not self.server.has_model(model):
+            self._send_json({"error": f"model '{model}' not found"}, 404)
+            return
+        if random.random() < self.server.fail_rate:
+            self._send_json({"error": "internal error"}, 500)
+            return
+
+        with self.server.slots:
+            self.server.load(model)
+            # Запрос на загрузку модели без сообщений/промпта (прогрев)
+            if not body.get("messages") and not body.get("prompt"):
+                self._send_json({"model": model, "done": True, "done_reason": "load"})
+                return
+            time.sleep(self.server.latency)
+            if body.get("stream", True):
+                self._stream(model)
+            else:
+                time.sleep(self.server.token_delay * self.server.tokens)
+                self._send_json({"model": model, "message": {"role": "assistant", "content": ANSWER}, "done": True})
+
+    def _stream(self, model: str):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        words = ANSWER.split(" ")
+        for i in range(self.server.tokens):
+            chunk = {"model": model, "message": {"role": "assistant", "content": words[i % len(words)] + " "}, "done": False}
+            self.wfile.write((json.dumps(chunk, ensure_ascii=False) + "\n").encode("utf-8"))
+            self.wfile.flush()
+            time.sleep(self.server.token_delay)
+        self.wfile.write((json.dumps({"model": model, "message": {"role": "assistant", "content": ""}, "done": True}) + "\n").encode("utf-8"))
+        self.close_connection = True
+
+    def _embedding(self, text: str):
+        """Детерминированный "эмбеддинг": мешок слов, разложенный по хэшам"""
+        vector = [0.0] * self.server.embedding_dim
+        for word in re.findall(r"\w+", text.lower()):
+            vector[int(hashlib.md5(word.encode("utf-8")).hexdigest(), 16) % self.server.embedding_dim] += 1.0
+        return vector
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Поддельный сервер Ollama")
+    parser.add_argument("--port", type=int, default=11500)
+    parser.add_argument("--models", default="llama3.2:1b", help="Модели через запятую")
+    parser.add_argument("--latency", type=float, default=0.1, help="Задержка до первого фрагмента, с")
+    parser.add_argument("--token-delay", type=float, default=0.01, help="Задержка между фрагментами, с")
+    parser.add_argument("--tokens", type=int, default=10, help="Число фрагментов в ответе")
+    parser.add_argument("--parallel", type=int, default=1, help="Параллельно обрабатываемых запросов")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Доля ответов HTTP 500")
+    parser.add_argument("--load-delay", type=float, default=0.0, help="Время загрузки модели при первом запросе, с")
+    args = parser.parse_args()
+
+    server = FakeOllamaServer(
+        args.port, args.models.split(","), args.latency, args.token_delay,
+        args.tokens, args.parallel, args.fail_rate, args.load_delay
+    )
+    print(f"Поддельный Ollama на http://127.0.0.1:{args.port} (модели: {args.models})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
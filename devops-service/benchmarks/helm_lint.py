@@ -0,0 +1,101 @@
+"""
+Бенчмарк проверки типичных ошибок Helm на многомегабайтных отрендеренных
+манифестах (результат helm template) и на шаблоне с директивами.
+
+Прежний способ: findall по {{ ... }}, два search по неправильным
+обращениям к .Values/.Release и по одному новому выражению на каждую
+из 12 функций Helm - около 15 проходов по тексту, без позиций находок.
+Новый: HelmLinter - все правила в одном выражении, один проход, строка и
+столбец у каждой находки.
+
+Запуск из каталога devops-service:
+    python -m benchmarks.helm_lint
+"""
+import re
+import time
+from services.helm_lint import HELM_FUNCTIONS, HelmLinter
+
+REPEATS = 5
+
+MANIFEST = """---
+# Source: portal/templates/deployment.yaml
+apiVersion: apps/v1
+kind: Deployment
+metadata:
+  name: prod-portal-%(i)d
+  labels:
+    app.kubernetes.io/name: portal-%(i)d
+    app.kubernetes.io/instance: prod
+    helm.sh/chart: portal-1.4.2
+spec:
+  replicas: 3
+  selector:
+    matchLabels:
+      app.kubernetes.io/name: portal-%(i)d
+  template:
+    spec:
+      containers:
+        - name: portal
+          image: "registry.local/portal:1.4.2"
+          env:
+            - name: DATABASE_URL
+              value: "postgres://portal.db.svc.cluster.local:5432/portal"
+            - name: CACHE_TTL
+              value: "300"
+          ports:
+            - containerPort: 8080
+          resources:
+            limits:
+              cpu: 500m
+              memory: 512Mi
+"""
+
+TEMPLATE = """  name: {{ include "portal.fullname" . }}-%(i)d
+  replicas: {{ .Values.replicaCount }}
+  image: "{{ .Values.image.repository }}:{{ .Values.image.tag | default .Chart.AppVersion }}"
+  release: {{ .Release.Name }}
+  labels: {{- toYaml .Values.labels | nindent 4 }}
+"""
+
+
+def old_lint(content: str) -> list:
+    """Прежние проверки validate_helm: отдельный проход на каждое выражение"""
+    warnings = []
+    re.findall(r'\{\{.*?\}\}', content)
+    for pattern in (r'\.Values\s*\.', r'\.Release\s*\.'):
+        if re.search(pattern, content):
+            warnings.append(pattern)
+    for func in HELM_FUNCTIONS:
+        # Выражение строится заново на каждый вызов
+        if re.search(r'\{\{\s*' + func + r'\s*[^(]', content):
+            warnings.append(func)
+    return warnings
+
+
+def measure(func) -> float:
+    """Среднее время одного вызова, мс"""
+    started = time.perf_counter()
+    for _ in range(REPEATS):
+        func()
+    return (time.perf_counter() - started) / REPEATS * 1000
+
+
+def main():
+    linter = HelmLinter()
+    unlimited = HelmLinter(max_findings=10 ** 9)
+    for name, block, count in (
+        ("отрендеренный манифест", MANIFEST, 2500),
+        ("отрендеренный манифест", MANIFEST, 10000),
+        ("шаблон с директивами", TEMPLATE, 20000),
+    ):
+        content = "".join(block % {"i": i} for i in range(count))
+        findings = linter.lint(content)
+        print(f"--- {name}: {content.count(chr(10))} строк, {len(content) / 1024 / 1024:.1f} МБ ---")
+        print(f"прежние проверки (~15 проходов):  {measure(lambda: old_lint(content)):.1f} мс")
+        print(f"HelmLinter (один проход):         {measure(lambda: linter.lint(content)):.1f} мс, находок: {len(findings)}")
+        if len(findings) >= linter.max_findings:
+            print(f"HelmLinter без лимита находок:    {measure(lambda: unlimited.lint(content)):.1f} мс")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Нагрузочный бенчмарк маршрутизации запросов LLMService по нескольким
+экземплярам Ollama (поддельные серверы benchmarks.fake_ollama).
+
+Сценарии: один экземпляр, три экземпляра, три экземпляра с одним
+недоступным (переключение и отключение автоматом), занятая основная
+модель с переходом на резервную.
+
+Запуск из каталога devops-service:
+    python -m benchmarks.llm_routing
+"""
+import asyncio
+import os
+import time
+from typing import Dict, List, Optional
+from benchmarks.fake_ollama import FakeOllamaServer
+from services.llm_service import LLMService
+
+REQUESTS = 60
+BASE_PORT = 11600
+# Порт, на котором никто не слушает (недоступный экземпляр)
+DEAD_PORT = 11599
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+async def run(label: str, servers: List[FakeOllamaServer], hosts: List[str], parallel: int,
+              fallback_model: Optional[str] = None, fallback_hosts: Optional[List[str]] = None):
+    env: Dict[str, str] = {
+        "OLLAMA_HOSTS": ",".join(hosts),
+        "OLLAMA_MODEL": "llama3.2",
+        "OLLAMA_NUM_PARALLEL": str(parallel),
+        "OLLAMA_FALLBACK_MODEL": fallback_model or "",
+        "OLLAMA_FALLBACK_HOSTS": ",".join(fallback_hosts or []),
+        "OLLAMA_HEALTH_INTERVAL": "1",
+        "LLM_CACHE_MAX_ENTRIES": "0",
+        "LLM_QUEUE_SIZE": str(REQUESTS * 2),
+        "LLM_QUEUE_TIMEOUT": "120",
+    }
+    os.environ.update(env)
+    for server in servers:
+        server.requests = 0
+
+    service = LLMService()
+    await service.startup()
+    # Первая проверка доступности экземпляров и прогрев моделей
+    await service.pool.probe_all()
+    await service.lifecycle.wait_ready()
+
+    async def one(i: int):
+        started = time.perf_counter()
+        await service.generate_response(f"Вопрос номер {i} про деплой", user=f"user{i}")
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(one(i) for i in range(REQUESTS)), return_exceptions=True)
+    elapsed = time.perf_counter() - started
+    latencies = [r for r in results if isinstance(r, float)]
+    errors = len(results) - len(latencies)
+
+    print(f"--- {label} ---")
+    print(f"запросов: {REQUESTS}, ошибок: {errors}, время: {elapsed:.2f} с, {REQUESTS / elapsed:.1f} запросов/с")
+    if latencies:
+        print(f"задержка p50: {percentile(latencies, 0.5):.2f} с, p95: {percentile(latencies, 0.95):.2f} с")
+    print("распределение:", ", ".join(f"{server.server_address[1]}={server.requests}" for server in servers))
+    for backend in service.pool.status():
+        state = "отключен" if backend["circuit_open"] else ("доступен" if backend["healthy"] else "недоступен")
+        print(f"  {backend['url']} {backend['model']}: {state}")
+    await service.shutdown()
+
+
+async def main():
+    parallel = 2
+    servers = [
+        FakeOllamaServer(BASE_PORT + i, models=("llama3.2:latest",), latency=0.3, token_delay=0.01, parallel=parallel).start()
+        for i in range(3)
+    ]
+    fallback_server = FakeOllamaServer(BASE_PORT + 3, models=("llama3.2:1b",), latency=0.1, token_delay=0.005, parallel=4).start()
+    urls = [f"http://127.0.0.1:{server.server_address[1]}" for server in servers]
+    try:
+        await run("1 экземпляр", servers[:1], urls[:1], parallel)
+        await run("3 экземпляра", servers, urls, parallel)
+        await run("3 экземпляра, один недоступен", servers[:2], urls[:2] + [f"http://127.0.0.1:{DEAD_PORT}"], parallel)
+        await run(
+            "1 экземпляр + резервная модель llama3.2:1b",
+            [servers[0], fallback_server], urls[:1], parallel,
+            fallback_model="llama3.2:1b",
+            fallback_hosts=[f"http://127.0.0.1:{fallback_server.server_address[1]}"]
+        )
+    finally:
+        for server in servers + [fallback_server]:
+            server.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
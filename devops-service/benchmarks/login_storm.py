@@ -0,0 +1,102 @@
+"""
+Бенчмарк задержки обычных запросов во время шквала попыток входа.
+
+Пока идут LOGINS параллельных попыток входа с неверным паролем (bcrypt
+на каждую), отдельная задача каждые 20 мс запрашивает /health и меряет
+задержку от запланированного времени запроса (с учетом блокировки цикла
+событий). Сценарии: bcrypt прямо в цикле событий (прежнее поведение),
+bcrypt в пуле потоков без ограничения попыток, пул потоков с ограничением
+попыток входа (LOGIN_IP_LIMIT / LOGIN_USER_LIMIT).
+
+Запуск из каталога devops-service:
+    python -m benchmarks.login_storm
+"""
+import asyncio
+import time
+from typing import List
+import httpx
+import routes.auth
+from auth.auth import authenticate_user
+from auth.throttle import login_throttle
+from auth.utils import get_user, load_users, verify_password
+from main import app
+
+LOGINS = 40
+PROBE_INTERVAL = 0.02
+
+
+async def blocking_authenticate_user(username: str, password: str):
+    """Прежний способ: bcrypt в async-функции блокирует цикл событий"""
+    user = get_user(username)
+    if not user or not verify_password(password, user["hashed_password"]):
+        return False
+    return user
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+async def run(label: str, username: str):
+    transport = httpx.ASGITransport(app=app, client=("10.0.0.1", 40000))
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        latencies: List[float] = []
+        storm_done = asyncio.Event()
+
+        async def probe():
+            scheduled = time.perf_counter()
+            while True:
+                await client.get("/health")
+                latencies.append(time.perf_counter() - scheduled)
+                if storm_done.is_set():
+                    break
+                scheduled = time.perf_counter() + PROBE_INTERVAL
+                await asyncio.sleep(PROBE_INTERVAL)
+
+        async def login():
+            response = await client.post("/login", json={"username": username, "password": "wrong-password"})
+            return response.status_code
+
+        probe_task = asyncio.create_task(probe())
+        started = time.perf_counter()
+        statuses = await asyncio.gather(*(login() for _ in range(LOGINS)))
+        elapsed = time.perf_counter() - started
+        storm_done.set()
+        await probe_task
+
+    counts = {code: statuses.count(code) for code in sorted(set(statuses))}
+    print(f"--- {label} ---")
+    print(f"попыток входа: {LOGINS}, ответы: {counts}, время: {elapsed:.2f} с")
+    print(
+        f"/health во время шквала: {len(latencies)} запросов, "
+        f"p50 {percentile(latencies, 0.5) * 1000:.1f} мс, p95 {percentile(latencies, 0.95) * 1000:.1f} мс, "
+        f"max {max(latencies) * 1000:.1f} мс"
+    )
+
+
+async def main():
+    username = next(iter(load_users()), None)
+    if username is None:
+        print("Нет пользователей в data/users/users.json - зарегистрируйте пользователя для бенчмарка")
+        return
+    ip_limit, user_limit = login_throttle.by_ip.limit, login_throttle.by_user.limit
+    try:
+        # Без ограничения попыток: каждая попытка доходит до bcrypt
+        login_throttle.by_ip.limit = login_throttle.by_user.limit = 0
+        routes.auth.authenticate_user = blocking_authenticate_user
+        await run("bcrypt в цикле событий", username)
+        routes.auth.authenticate_user = authenticate_user
+        await run("bcrypt в пуле потоков", username)
+
+        login_throttle.by_ip.limit, login_throttle.by_user.limit = ip_limit, user_limit
+        await run(f"пул потоков + ограничение попыток ({ip_limit}/IP, {user_limit}/имя+IP)", username)
+    finally:
+        routes.auth.authenticate_user = authenticate_user
+        login_throttle.by_ip.limit, login_throttle.by_user.limit = ip_limit, user_limit
+        login_throttle.by_ip.reset("10.0.0.1")
+        login_throttle.by_user.reset((username, "10.0.0.1"))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
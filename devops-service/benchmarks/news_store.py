@@ -0,0 +1,119 @@
+"""
+Бенчмарк кэша новостей (NewsStore) на 10k и 100k записей.
+
+Сравнивает прежний NewsManager (перечитывание news.json и линейный
+проход по всем новостям на каждый вызов, поиск - по вхождению подстроки)
+с общим процессным кэшем и индексами NewsStore.
+
+Запуск из каталога devops-service:
+    python -m benchmarks.news_store
+"""
+import json
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+from auth.models import News
+from data.news_manager import NewsManager
+
+
+class OldNewsManager:
+    """Прежняя реализация чтения: файл читается и разбирается на каждый вызов"""
+
+    def __init__(self, news_file: Path):
+        self.news_file = news_file
+
+    def _load_news(self) -> dict:
+        with open(self.news_file, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    @staticmethod
+    def _to_news(news_data: dict) -> News:
+        if isinstance(news_data.get("created_at"), str):
+            news_data["created_at"] = datetime.fromisoformat(news_data["created_at"].replace("Z", "+00:00"))
+        return News(**news_data)
+
+    def get_news(self, news_id: str):
+        all_news = self._load_news()
+        return self._to_news(all_news[news_id]) if news_id in all_news else None
+
+    def get_labels(self):
+        return sorted({news["label"] for news in self._load_news().values() if "label" in news})
+
+    def get_all_news(self, page: int = 1, per_page: int = 10, search: str = None):
+        news_list = [self._to_news(news_data) for news_data in self._load_news().values()]
+        if search:
+            search_lower = search.lower()
+            news_list = [news for news in news_list
+                         if search_lower in news.title.lower() or search_lower in news.content.lower()]
+        news_list.sort(key=lambda x: x.created_at, reverse=True)
+        start = (page - 1) * per_page
+        return news_list[start:start + per_page]
+
+
+def generate_news_file(news_dir: Path, count: int):
+    """Генерирует news.json с заданным количеством новостей"""
+    labels = ["release", "incident", "maintenance", "info", "security"]
+    start = datetime(2024, 1, 1)
+    data = {}
+    for i in range(count):
+        news_id = str(uuid.uuid4())
+        data[news_id] = {
+            "id": news_id,
+            "title": f"Новость {i}",
+            "content": f"Содержание новости {i}. " * 20,
+            "label": labels[i % len(labels)],
+            "author": "bench",
+            "created_at": str(start + timedelta(minutes=i)),
+            "updated_at": None,
+        }
+    news_dir.mkdir(parents=True, exist_ok=True)
+    with open(news_dir / "news.json", "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    return list(data)
+
+
+def measure(func, repeat: int) -> float:
+    """Среднее время вызова в миллисекундах"""
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - started) / repeat * 1000
+
+
+def run(count: int, repeat: int = 5):
+    with tempfile.TemporaryDirectory() as tmp:
+        news_dir = Path(tmp) / "news"
+        ids = generate_news_file(news_dir, count)
+        manager = NewsManager(data_dir=str(news_dir))
+        old = OldNewsManager(news_dir / "news.json")
+        news_id = ids[count // 2]
+        query = str(count // 3)
+        # Первое обращение загружает кэш - оно измеряется отдельно ниже
+        manager.get_labels()
+
+        print(f"--- {count} новостей ---")
+        for name, old_func, func in (
+            ("get_news", lambda: old.get_news(news_id), lambda: manager.get_news(news_id)),
+            ("get_labels", old.get_labels, manager.get_labels),
+            ("get_all_news", lambda: old.get_all_news(page=1, per_page=6),
+             lambda: manager.get_all_news(page=1, per_page=6)),
+            ("search", lambda: old.get_all_news(page=1, per_page=6, search=query),
+             lambda: manager.get_all_news(page=1, per_page=6, search=query)),
+        ):
+            old_ms = measure(old_func, repeat)
+            new_ms = measure(func, repeat * 20)
+            print(f"{name:14} прежний: {old_ms:9.2f} мс   NewsStore: {new_ms:9.3f} мс")
+
+        def reload():
+            # Разовая стоимость: загрузка файла и построение индексов при первом обращении
+            manager.store.invalidate()
+            manager.get_labels()
+
+        print(f"{'загрузка':14} чтение файла и построение индексов: {measure(reload, 1):9.2f} мс")
+
+
+if __name__ == "__main__":
+    for count in (10_000, 100_000):
+        run(count)
@@ -0,0 +1,190 @@
+"""
+Бенчмарк рендеринга /settings/render: повторный рендеринг одного и того же
+шаблона в стиле Helm (Deployment + Service с циклами и фильтрами).
+
+Сравниваются: прежний способ (новое Environment и компиляция на каждый
+вызов прямо в цикле событий), скомпилированный шаблон из кэша и
+TemplateRenderer (пул процессов, песочница, LRU в воркерах) - задержка
+одного запроса и пропускная способность при CONCURRENCY параллельных
+запросах. Отдельно: задержка цикла событий, пока рендерится тяжелый шаблон.
+
+Запуск из каталога devops-service:
+    python -m benchmarks.template_render
+"""
+import asyncio
+import time
+from typing import List
+from jinja2 import Environment
+from services.template_renderer import TemplateRenderer
+
+ITERATIONS = 500
+CONCURRENCY = 8
+PROBE_INTERVAL = 0.01
+
+TEMPLATE = """apiVersion: apps/v1
+kind: Deployment
+metadata:
+  name: {{ release }}-{{ chart | lower }}
+  labels:
+{%- for key, value in labels.items() | sort %}
+    {{ key }}: {{ value | string | tojson }}
+{%- endfor %}
+spec:
+  replicas: {{ replicas | default(1) }}
+  template:
+    spec:
+      containers:
+{%- for container in containers %}
+        - name: {{ container.name }}
+          image: "{{ container.image }}:{{ container.tag | default('latest') }}"
+          env:
+{%- for name, value in container.env.items() | sort %}
+            - name: {{ name | upper }}
+              value: {{ value | string | tojson }}
+{%- endfor %}
+          ports:
+{%- for port in container.ports %}
+            - containerPort: {{ port }}
+{%- endfor %}
+{%- if container.resources is defined %}
+          resources:
+            limits:
+              cpu: {{ container.resources.cpu }}
+              memory: {{ container.resources.memory }}
+{%- endif %}
+{%- endfor %}
+---
+apiVersion: v1
+kind: Service
+metadata:
+  name: {{ release }}-{{ chart | lower }}
+spec:
+  ports:
+{%- for container in containers %}{% for port in container.ports %}
+    - name: {{ container.name }}-{{ port }}
+      port: {{ port }}
+{%- endfor %}{% endfor %}
+"""
+
+VARIABLES = {
+    "release": "prod",
+    "chart": "Portal",
+    "replicas": 3,
+    "labels": {f"label-{i}": f"value-{i}" for i in range(10)},
+    "containers": [
+        {
+            "name": f"app-{i}",
+            "image": f"registry.local/app-{i}",
+            "tag": "1.2.3",
+            "env": {f"var_{j}": j for j in range(20)},
+            "ports": [8000 + i, 9000 + i],
+            "resources": {"cpu": "500m", "memory": "512Mi"}
+        }
+        for i in range(5)
+    ]
+}
+
+# Тяжелый шаблон: выводит символ на каждой внешней итерации (можно прервать по времени)
+HEAVY = "{% for i in range(100000) %}{% for j in range(2000) %}{% endfor %}.{% endfor %}"
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+def old_render(source: str) -> str:
+    """Прежний способ: новое окружение и компиляция на каждый запрос"""
+    return Environment().from_string(source).render(**VARIABLES)
+
+
+def measure(func) -> float:
+    """Среднее время одного вызова, мс"""
+    started = time.perf_counter()
+    for _ in range(ITERATIONS):
+        func()
+    return (time.perf_counter() - started) / ITERATIONS * 1000
+
+
+async def probe_during(awaitable) -> float:
+    """Максимальная задержка цикла событий (мс), пока выполняется awaitable"""
+    delays: List[float] = []
+    done = asyncio.Event()
+
+    async def probe():
+        while not done.is_set():
+            scheduled = time.perf_counter() + PROBE_INTERVAL
+            await asyncio.sleep(PROBE_INTERVAL)
+            delays.append(time.perf_counter() - scheduled)
+
+    task = asyncio.create_task(probe())
+    await asyncio.sleep(PROBE_INTERVAL * 2)
+    try:
+        await awaitable
+    finally:
+        done.set()
+        await task
+    return max(delays) * 1000
+
+
+async def inline_heavy(seconds: float):
+    """Тяжелый шаблон прямо в цикле событий (прерывается по времени, чтобы бенчмарк завершился)"""
+    deadline = time.perf_counter() + seconds
+    for _ in Environment().from_string(HEAVY).generate():
+        if time.perf_counter() > deadline:
+            break
+
+
+async def main():
+    compiled = Environment().from_string(TEMPLATE)
+    print(f"--- рендеринг одного шаблона, {ITERATIONS} раз ---")
+    print(f"прежний способ (компиляция на каждый запрос): {measure(lambda: old_render(TEMPLATE)):.3f} мс")
+    print(f"скомпилированный шаблон из кэша:              {measure(lambda: compiled.render(**VARIABLES)):.3f} мс")
+
+    renderer = TemplateRenderer.from_env()
+    try:
+        # Первый запрос запускает воркеры
+        started = time.perf_counter()
+        await renderer.render(TEMPLATE, VARIABLES)
+        print(f"TemplateRenderer: запуск пула {(time.perf_counter() - started) * 1000:.0f} мс")
+
+        latencies = []
+        for _ in range(100):
+            started = time.perf_counter()
+            result = await renderer.render(TEMPLATE, VARIABLES)
+            latencies.append(time.perf_counter() - started)
+        assert result["rendered"] == compiled.render(**VARIABLES)
+        print(
+            f"TemplateRenderer, по одному запросу: p50 {percentile(latencies, 0.5) * 1000:.3f} мс, "
+            f"p95 {percentile(latencies, 0.95) * 1000:.3f} мс"
+        )
+
+        started = time.perf_counter()
+
+        async def client():
+            for _ in range(ITERATIONS // CONCURRENCY):
+                await renderer.render(TEMPLATE, VARIABLES)
+
+        await asyncio.gather(*(client() for _ in range(CONCURRENCY)))
+        total = ITERATIONS // CONCURRENCY * CONCURRENCY
+        print(
+            f"TemplateRenderer, {CONCURRENCY} параллельных клиентов: "
+            f"{total / (time.perf_counter() - started):.0f} рендерингов/с (воркеров: {renderer.workers})"
+        )
+
+        print(f"--- тяжелый шаблон (лимит {renderer.cpu_seconds:g} с CPU) ---")
+        stall = await probe_during(inline_heavy(renderer.cpu_seconds))
+        print(f"в цикле событий: максимальная задержка цикла {stall:.0f} мс")
+        results = []
+
+        async def heavy():
+            results.append(await renderer.render(HEAVY))
+
+        stall = await probe_during(heavy())
+        print(f"в пуле процессов: максимальная задержка цикла {stall:.0f} мс, ответ: {results[0].get('error')}")
+    finally:
+        renderer.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,136 @@
+"""
+Бенчмарк валидации шаблонов (/settings/validate) на больших Helm-чартах.
+
+Прежний способ: validate_jinja разбирает шаблон трижды (parse для
+синтаксиса, parse для переменных, from_string для пробного рендеринга),
+регулярные выражения Helm компилируются на каждый вызов. Новый: один
+разбор, общее AST, без выполнения шаблона, предкомпилированные проверки,
+и кэш результатов по хешу содержимого (повторная проверка при вводе
+в интерфейсе).
+
+Запуск из каталога devops-service:
+    python -m benchmarks.template_validate
+"""
+import re
+import time
+import yaml
+from jinja2 import Environment, TemplateSyntaxError, UndefinedError
+from jinja2.meta import find_undeclared_variables
+from services.template_validator import TemplateValidator
+
+REPEATS = 5
+
+# Ресурсы чарта - элементы списка kind: List (один YAML-документ)
+RESOURCE = """apiVersion: apps/v1
+kind: Deployment
+metadata:
+  name: "{{ release }}-app-%(i)d"
+  labels:
+    app: "{{ chart | lower }}-%(i)d"
+    version: "{{ version | default('1.0.0') }}"
+spec:
+  replicas: "{{ replicas | default(1) }}"
+  template:
+    spec:
+      containers:
+        - name: app-%(i)d
+          image: "{{ registry }}/app-%(i)d:{{ tag | default('latest') }}"
+          env:
+# {%% for name, value in env.items() %%}
+            - name: "{{ name | upper }}"
+              value: "{{ value }}"
+# {%% endfor %%}
+# {%% if resources is defined %%}
+          resources:
+            limits:
+              cpu: "{{ resources.cpu }}"
+              memory: "{{ resources.memory }}"
+# {%% endif %%}
+"""
+
+
+def make_chart(resources: int) -> str:
+    items = []
+    for i in range(resources):
+        lines = (RESOURCE % {"i": i}).splitlines()
+        items.append("\n".join(["- " + lines[0]] + [line if line.startswith("#") else "  " + line for line in lines[1:]]))
+    return "apiVersion: v1\nkind: List\nitems:\n" + "\n".join(items) + "\n"
+
+
+def old_validate_jinja(env: Environment, template_content: str) -> dict:
+    """Прежний validate_jinja: три разбора шаблона"""
+    result = {"valid": True, "errors": [], "warnings": [], "variables": []}
+    try:
+        env.parse(template_content)
+        ast = env.parse(template_content)
+        undeclared = find_undeclared_variables(ast)
+        result["variables"] = list(undeclared)
+        if undeclared:
+            result["warnings"].append(
+                f"Найдены переменные, которые могут быть не определены: {', '.join(undeclared)}"
+            )
+        try:
+            env.from_string(template_content).render({})
+        except UndefinedError as e:
+            result["warnings"].append(f"Неопределенная переменная при рендеринге: {str(e)}")
+        except Exception as e:
+            result["warnings"].append(f"Предупреждение при рендеринге: {str(e)}")
+    except TemplateSyntaxError as e:
+        result["valid"] = False
+        result["errors"].append({"message": f"Синтаксическая ошибка: {e.message}", "line": e.lineno})
+    return result
+
+
+def old_validate_helm(env: Environment, template_content: str) -> dict:
+    """Прежний validate_helm: YAML, validate_jinja и регулярные выражения на каждый вызов"""
+    result = {"valid": True, "errors": [], "warnings": []}
+    try:
+        yaml.safe_load(template_content)
+    except yaml.YAMLError as e:
+        result["valid"] = False
+        result["errors"].append({"message": f"Ошибка YAML: {str(e)}"})
+        return result
+    if re.findall(r'\{\{.*?\}\}', template_content):
+        jinja_result = old_validate_jinja(env, template_content)
+        result["valid"] = jinja_result["valid"]
+        result["errors"].extend(jinja_result["errors"])
+        result["warnings"].extend(jinja_result["warnings"])
+    for pattern in (r'\.Values\s*\.', r'\.Release\s*\.'):
+        re.search(pattern, template_content)
+    for func in ['include', 'required', 'tpl', 'default', 'empty', 'coalesce',
+                 'toYaml', 'toJson', 'b64enc', 'b64dec', 'indent', 'nindent']:
+        re.search(r'\{\{\s*' + func + r'\s*[^(]', template_content)
+    return result
+
+
+def measure(func) -> float:
+    """Среднее время одного вызова, мс"""
+    started = time.perf_counter()
+    for _ in range(REPEATS):
+        func()
+    return (time.perf_counter() - started) / REPEATS * 1000
+
+
+def main():
+    env = Environment()
+    for resources in (50, 200, 800):
+        chart = make_chart(resources)
+        # Без кэша - стоимость первой проверки нового содержимого
+        uncached = TemplateValidator(cache_size=0)
+        cached = TemplateValidator()
+
+        old_result = old_validate_helm(env, chart)
+        new_result = uncached.validate_helm(chart)
+        assert old_result["valid"] == new_result["valid"]
+
+        print(f"--- Helm-чарт: {resources} ресурсов, {chart.count(chr(10))} строк, {len(chart) // 1024} КБ ---")
+        print(f"validate_jinja прежний (3 разбора):  {measure(lambda: old_validate_jinja(env, chart)):.1f} мс")
+        print(f"validate_jinja один разбор:          {measure(lambda: uncached.validate_jinja(chart)):.1f} мс")
+        print(f"validate_helm прежний:               {measure(lambda: old_validate_helm(env, chart)):.1f} мс")
+        print(f"validate_helm один разбор:           {measure(lambda: uncached.validate_helm(chart)):.1f} мс")
+        cached.validate_helm(chart)
+        print(f"validate_helm повтор (кэш):          {measure(lambda: cached.validate_helm(chart)):.3f} мс")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Бенчмарк пропускной способности: один воркер uvicorn против нескольких.
+
+Запускает serve.py с --workers 1 и --workers N на свободном порту,
+ждет готовности и в течение DURATION секунд нагружает страницу
+новостей (авторизация по cookie, рендер шаблона) CONCURRENCY
+параллельными клиентами. Печатает запросы в секунду и задержки.
+Выигрыш от воркеров ограничен числом CPU машины.
+
+Запуск из каталога devops-service:
+    python -m benchmarks.workers [N]
+"""
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+from typing import List
+import httpx
+from auth.auth import create_access_token
+from auth.utils import load_users
+
+DURATION = 10.0
+CONCURRENCY = 32
+PATH = "/news"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+async def wait_ready(base_url: str, timeout: float = 60.0):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get("/login")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"Сервер {base_url} не запустился за {timeout:.0f} с")
+
+
+async def load(base_url: str, token: str):
+    latencies: List[float] = []
+    errors = 0
+    deadline = time.perf_counter() + DURATION
+    limits = httpx.Limits(max_connections=CONCURRENCY, max_keepalive_connections=CONCURRENCY)
+    async with httpx.AsyncClient(base_url=base_url, cookies={"access_token": token}, limits=limits) as client:
+
+        async def worker():
+            nonlocal errors
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                try:
+                    response = await client.get(PATH)
+                    if response.status_code != 200:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append(time.perf_counter() - started)
+
+        await asyncio.gather(*(worker() for _ in range(CONCURRENCY)))
+    return latencies, errors
+
+
+async def run(workers: int, token: str):
+    port = free_port()
+    env = dict(os.environ, WEB_CONCURRENCY=str(workers))
+    server = subprocess.Popen(
+        [sys.executable, "serve.py", "--host", "127.0.0.1", "--port", str(port)],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        await wait_ready(base_url)
+        await load(base_url, token)  # прогрев кэшей во всех воркерах
+        latencies, errors = await load(base_url, token)
+    finally:
+        server.terminate()
+        server.wait(timeout=60)
+    print(f"--- воркеров: {workers} ---")
+    print(
+        f"{len(latencies) / DURATION:.0f} запросов/с, ошибок: {errors}, "
+        f"p50 {percentile(latencies, 0.5) * 1000:.1f} мс, p95 {percentile(latencies, 0.95) * 1000:.1f} мс"
+    )
+
+
+async def main():
+    username = next(iter(load_users()), None)
+    if username is None:
+        print("Нет пользователей в data/users/users.json - зарегистрируйте пользователя для бенчмарка")
+        return
+    token = create_access_token({"sub": username})
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else max(2, os.cpu_count() or 1)
+    print(f"CPU: {os.cpu_count()}, параллельных клиентов: {CONCURRENCY}, {PATH}, {DURATION:.0f} с")
+    await run(1, token)
+    await run(workers, token)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
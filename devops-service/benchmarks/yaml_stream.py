@@ -0,0 +1,87 @@
+"""
+Бенчмарк проверки YAML на большом отрендеренном релизе (много документов
+через ---, как в выводе helm template).
+
+Прежний способ: yaml.safe_load всего текста на чистом Python - на
+нескольких документах падает с ошибкой, а для проверки всего релиза
+пришлось бы строить дерево объектов всех документов сразу
+(list(yaml.safe_load_all)). Новый: validate_yaml_stream - CSafeLoader
+(libyaml), документы по одному, память - на один документ.
+
+Запуск из каталога devops-service:
+    python -m benchmarks.yaml_stream
+"""
+import time
+import tracemalloc
+import yaml
+from services.yaml_stream import SafeLoader, validate_yaml_stream
+
+DOCUMENT = """---
+apiVersion: apps/v1
+kind: Deployment
+metadata:
+  name: prod-portal-%(i)d
+  labels:
+    app.kubernetes.io/name: portal-%(i)d
+    app.kubernetes.io/instance: prod
+spec:
+  replicas: 3
+  template:
+    spec:
+      containers:
+        - name: portal
+          image: "registry.local/portal:1.4.2"
+          env:
+            - name: DATABASE_URL
+              value: "postgres://portal.db.svc.cluster.local:5432/portal"
+            - name: CACHE_TTL
+              value: "300"
+          ports:
+            - containerPort: 8080
+          resources:
+            limits: {cpu: 500m, memory: 512Mi}
+"""
+
+
+def old_validate(content: str) -> bool:
+    """Прежний validate_file для .yaml"""
+    try:
+        yaml.safe_load(content)
+        return True
+    except yaml.YAMLError:
+        return False
+
+
+def measure(func):
+    """Время (мс) и пик памяти Python-объектов (МБ) одного вызова"""
+    started = time.perf_counter()
+    func()
+    elapsed = (time.perf_counter() - started) * 1000
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main():
+    print(f"загрузчик: {SafeLoader.__module__}.{SafeLoader.__name__}")
+    for documents in (1000, 4000):
+        content = "".join(DOCUMENT % {"i": i} for i in range(documents))
+        print(f"--- релиз: {documents} документов, {len(content) / 1024 / 1024:.1f} МБ ---")
+        print(f"прежний safe_load: valid={old_validate(content)} (несколько документов не поддерживаются)")
+        rows = (
+            ("все документы сразу, чистый Python", lambda: list(yaml.safe_load_all(content))),
+            ("все документы сразу, libyaml", lambda: list(yaml.load_all(content, Loader=SafeLoader))),
+            ("validate_yaml_stream", lambda: validate_yaml_stream(content)),
+        )
+        for name, func in rows:
+            elapsed, peak = measure(func)
+            print(f"{name:<36} {elapsed:8.0f} мс, пик памяти {peak:6.1f} МБ")
+        broken = content.replace("replicas: 3", "replicas: [3", 3)
+        errors = validate_yaml_stream(broken)["errors"]
+        print(f"релиз с 3 ошибками: найдено {len(errors)}, строки {[e['line'] for e in errors]}")
+
+
+if __name__ == "__main__":
+    main()
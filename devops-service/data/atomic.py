@@ -0,0 +1,117 @@
+import json
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict
+import yaml
+
+try:
+    import fcntl
+except ImportError:  # Windows - межпроцессная блокировка недоступна
+    fcntl = None
+
+# Блокировки записи внутри процесса (по абсолютному пути файла)
+_thread_locks: Dict[str, threading.RLock] = {}
+_thread_locks_guard = threading.Lock()
+# Глубина вложенности file_lock для пути (меняется только владельцем RLock)
+_lock_depth: Dict[str, int] = {}
+
+
+def _thread_lock(path: str) -> threading.RLock:
+    with _thread_locks_guard:
+        lock = _thread_locks.get(path)
+        if lock is None:
+            lock = _thread_locks[path] = threading.RLock()
+        return lock
+
+
+@contextmanager
+def file_lock(path: str):
+    """
+    Эксклюзивная блокировка записи в файл (один писатель).
+
+    Внутри процесса - RLock, между процессами - flock на соседнем
+    файле <path>.lock (на Windows только блокировка внутри процесса).
+    Повторный вход из того же потока не блокируется.
+    """
+    path = os.path.abspath(path)
+    with _thread_lock(path):
+        depth = _lock_depth.get(path, 0)
+        if depth or fcntl is None:
+            _lock_depth[path] = depth + 1
+            try:
+                yield
+            finally:
+                _lock_depth[path] = depth
+            return
+        with open(f"{path}.lock", "a") as lock_file:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            _lock_depth[path] = 1
+            try:
+                yield
+            finally:
+                _lock_depth[path] = 0
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+def _fsync_dir(dir_path: str):
+    """Сбрасывает на диск запись каталога (переименование файла)"""
+    try:
+        fd = os.open(dir_path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def atomic_write_text(path: str, text: str, fsync_dir: bool = True):
+    """
+    Атомарная запись текста в файл.
+
+    Пишем во временный файл в том же каталоге, делаем fsync и заменяем
+    целевой файл через os.replace. Читатель видит либо старую, либо новую
+    версию целиком; сбой посреди записи не портит существующий файл.
+    """
+    dir_path = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=dir_path, prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        # mkstemp создает файл с правами 0600 - сохраняем права исходного файла
+        try:
+            mode = os.stat(path).st_mode & 0o777
+        except FileNotFoundError:
+            mode = 0o644
+        os.chmod(tmp_path, mode)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+    if fsync_dir:
+        _fsync_dir(dir_path)
+
+
+def atomic_dump_json(path: str, data: Any, fsync_dir: bool = True, **json_kwargs):
+    """Атомарно сохраняет данные в JSON файл под блокировкой записи"""
+    json_kwargs.setdefault("ensure_ascii", False)
+    json_kwargs.setdefault("indent", 2)
+    text = json.dumps(data, **json_kwargs)
+    with file_lock(path):
+        atomic_write_text(path, text, fsync_dir)
+
+
+def atomic_dump_yaml(path: str, data: Any, fsync_dir: bool = True):
+    """Атомарно сохраняет данные в YAML файл под блокировкой записи"""
+    text = yaml.dump(data, default_flow_style=False, allow_unicode=True)
+    with file_lock(path):
+        atomic_write_text(path, text, fsync_dir)
@@ -0,0 +1,162 @@
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from data.atomic import atomic_dump_json, atomic_write_text, file_lock
+
+
+class ChatLog:
+    """
+    Журнал чата пользователя в формате JSONL (одно сообщение - одна строка).
+
+    Новое сообщение дописывается в конец файла, поэтому стоимость записи
+    не зависит от длины истории. Последние сообщения читаются с конца файла
+    блоками, без разбора всей истории. Старые файлы <username>.json
+    ({"messages": [...]}) читаются как раньше и конвертируются при первой записи.
+    Рядом с журналом хранится краткое содержание старых сообщений (<username>.summary).
+    """
+
+    # Размер блока при чтении с конца файла
+    TAIL_BLOCK_SIZE = 8192
+
+    def __init__(self, chat_dir: str, compact_every: int = 500, max_messages: Optional[int] = None):
+        self.chat_dir = Path(chat_dir)
+        self.chat_dir.mkdir(parents=True, exist_ok=True)
+        # Сжатие журнала раз в compact_every добавлений (удаляет битые строки,
+        # при заданном max_messages оставляет только последние сообщения)
+        self.compact_every = compact_every
+        self.max_messages = max_messages
+        self._appends_since_compact: Dict[str, int] = {}
+
+    def _log_path(self, username: str) -> Path:
+        return self.chat_dir / f"{username}.jsonl"
+
+    def _legacy_path(self, username: str) -> Path:
+        return self.chat_dir / f"{username}.json"
+
+    def _summary_path(self, username: str) -> Path:
+        return self.chat_dir / f"{username}.summary"
+
+    @staticmethod
+    def _parse_lines(lines: List[bytes]) -> List[Dict[str, Any]]:
+        """Разбирает строки журнала, пропуская поврежденные (например, недописанные при сбое)"""
+        messages = []
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                messages.append(json.loads(line))
+            except ValueError:
+                continue
+        return messages
+
+    @staticmethod
+    def _dump_lines(messages: List[Dict[str, Any]]) -> str:
+        return "".join(json.dumps(message, ensure_ascii=False) + "\n" for message in messages)
+
+    def _load_legacy(self, username: str) -> List[Dict[str, Any]]:
+        legacy_path = self._legacy_path(username)
+        if not legacy_path.exists():
+            return []
+        with open(legacy_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return data.get("messages", []) if isinstance(data, dict) else []
+
+    def _migrate_legacy(self, username: str):
+        """Конвертирует старый JSON-файл истории в JSONL (вызывается под блокировкой)"""
+        legacy_path = self._legacy_path(username)
+        if self._log_path(username).exists() or not legacy_path.exists():
+            return
+        atomic_write_text(str(self._log_path(username)), self._dump_lines(self._load_legacy(username)))
+        legacy_path.unlink()
+
+    def read_all(self, username: str) -> List[Dict[str, Any]]:
+        """Вся история чата"""
+        log_path = self._log_path(username)
+        if not log_path.exists():
+            return self._load_legacy(username)
+        with open(log_path, 'rb') as f:
+            return self._parse_lines(f.read().splitlines())
+
+    def tail(self, username: str, limit: int) -> List[Dict[str, Any]]:
+        """Последние limit сообщений, файл читается с конца"""
+        if limit <= 0:
+            return []
+        log_path = self._log_path(username)
+        if not log_path.exists():
+            return self._load_legacy(username)[-limit:]
+
+        with open(log_path, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            pos = f.tell()
+            data = b""
+            # Читаем блоки, пока не наберем limit полных строк (+1 на возможный обрезанный край)
+            while pos > 0 and data.count(b"\n") <= limit:
+                size = min(self.TAIL_BLOCK_SIZE, pos)
+                pos -= size
+                f.seek(pos)
+                data = f.read(size) + data
+
+        lines = data.splitlines()
+        if pos > 0:
+            # Первая строка может быть обрезана границей блока
+            lines = lines[1:]
+        return self._parse_lines(lines)[-limit:]
+
+    def append(self, username: str, message: Dict[str, Any]):
+        """Дописывает сообщение в конец журнала"""
+        log_path = self._log_path(username)
+        line = json.dumps(message, ensure_ascii=False) + "\n"
+        with file_lock(str(log_path)):
+            self._migrate_legacy(username)
+            with open(log_path, 'a+b') as f:
+                # Если последняя запись недописана (сбой), начинаем с новой строки
+                if f.tell() > 0:
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b"\n":
+                        line = "\n" + line
+                f.write(line.encode('utf-8'))
+                f.flush()
+                os.fsync(f.fileno())
+
+            appends = self._appends_since_compact.get(username, 0) + 1
+            self._appends_since_compact[username] = appends
+            if self.compact_every and appends >= self.compact_every:
+                self.compact(username)
+
+    def rewrite(self, username: str, messages: List[Dict[str, Any]]):
+        """Полностью перезаписывает историю"""
+        log_path = self._log_path(username)
+        with file_lock(str(log_path)):
+            atomic_write_text(str(log_path), self._dump_lines(messages))
+            legacy_path = self._legacy_path(username)
+            if legacy_path.exists():
+                legacy_path.unlink()
+
+    def compact(self, username: str):
+        """Сжимает журнал: удаляет поврежденные строки и лишние старые сообщения"""
+        log_path = self._log_path(username)
+        with file_lock(str(log_path)):
+            messages = self.read_all(username)
+            if self.max_messages:
+                messages = messages[-self.max_messages:]
+            atomic_write_text(str(log_path), self._dump_lines(messages))
+            self._appends_since_compact[username] = 0
+
+    def load_summary(self, username: str) -> Optional[Dict[str, Any]]:
+        """Краткое содержание старых сообщений или None"""
+        summary_path = self._summary_path(username)
+        if not summary_path.exists():
+            return None
+        with open(summary_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def save_summary(self, username: str, summary: Dict[str, Any]):
+        """Сохраняет краткое содержание старых сообщений"""
+        atomic_dump_json(str(self._summary_path(username)), summary)
+
+    def usernames(self) -> List[str]:
+        """Пользователи, у которых есть история (в любом формате)"""
+        names = {path.stem for path in self.chat_dir.glob("*.jsonl")}
+        names.update(path.stem for path in self.chat_dir.glob("*.json"))
+        return sorted(names)
@@ -1,29 +1,33 @@
-import json
-import yaml
 import os
 from pathlib import Path
 from typing import Dict, Any, List, Optional
+from data import events
+from data.atomic import file_lock
+from data.chat_log import ChatLog
+from data.storage import FileStorage, StorageBackend, create_backend
 
 class DataManager:
-    def __init__(self, data_dir: str = "data"):
+    def __init__(self, data_dir: str = "data", backend: Optional[StorageBackend] = None):
         self.data_dir = Path(data_dir)
         self.data_dir.mkdir(exist_ok=True)
         
-        # Создаем поддиректории для разных типов данных
-        (self.data_dir / "as_fp").mkdir(exist_ok=True)
-        (self.data_dir / "settings").mkdir(exist_ok=True)
-        (self.data_dir / "deployments").mkdir(exist_ok=True)
-        (self.data_dir / "infrastructure").mkdir(exist_ok=True)
-        (self.data_dir / "ai_chat").mkdir(exist_ok=True)
-        (self.data_dir / "news").mkdir(exist_ok=True)
-        (self.data_dir / "problems").mkdir(exist_ok=True)
+        # Хранилище: файлы data/<subdir>/ или SQLite (см. DATA_BACKEND)
+        self.backend = backend or create_backend(data_dir)
+        
+        # История чата в файловом хранилище - журнал JSONL с дозаписью
+        self.chat_log = None
+        if isinstance(self.backend, FileStorage):
+            max_messages = os.getenv("CHAT_HISTORY_MAX_MESSAGES")
+            self.chat_log = ChatLog(
+                str(self.data_dir / "ai_chat"),
+                max_messages=int(max_messages) if max_messages else None
+            )
     
     def save_json(self, filename: str, data: Dict[str, Any], subdir: str = "") -> bool:
         """Сохранение данных в JSON файл"""
         try:
-            file_path = self.data_dir / subdir / f"{filename}.json"
-            with open(file_path, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+            self.backend.save(subdir, filename, data, "json")
+            events.publish(subdir, filename)
             return True
         except Exception as e:
             print(f"Ошибка сохранения JSON: {e}")
@@ -32,11 +36,7 @@ class DataManager:
     def load_json(self, filename: str, subdir: str = "") -> Optional[Dict[str, Any]]:
         """Загрузка данных из JSON файла"""
         try:
-            file_path = self.data_dir / subdir / f"{filename}.json"
-            if file_path.exists():
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            return None
+            return self.backend.load(subdir, filename, "json")
         except Exception as e:
             print(f"Ошибка загрузки JSON: {e}")
             return None
@@ -44,9 +44,8 @@ class DataManager:
     def save_yaml(self, filename: str, data: Dict[str, Any], subdir: str = "") -> bool:
         """Сохранение данных в YAML файл"""
         try:
-            file_path = self.data_dir / subdir / f"{filename}.yaml"
-            with open(file_path, 'w', encoding='utf-8') as f:
-                yaml.dump(data, f, default_flow_style=False, allow_unicode=True)
+            self.backend.save(subdir, filename, data, "yaml")
+            events.publish(subdir, filename)
             return True
         except Exception as e:
             print(f"Ошибка сохранения YAML: {e}")
@@ -55,11 +54,7 @@ class DataManager:
     def load_yaml(self, filename: str, subdir: str = "") -> Optional[Dict[str, Any]]:
         """Загрузка данных из YAML файла"""
         try:
-            file_path = self.data_dir / subdir / f"{filename}.yaml"
-            if file_path.exists():
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    return yaml.safe_load(f)
-            return None
+            return self.backend.load(subdir, filename, "yaml")
         except Exception as e:
             print(f"Ошибка загрузки YAML: {e}")
             return None
@@ -67,22 +62,48 @@ class DataManager:
     def list_files(self, subdir: str = "", extension: str = "json") -> List[str]:
         """Получение списка файлов в директории"""
         try:
-            dir_path = self.data_dir / subdir
-            if dir_path.exists():
-                return [f.stem for f in dir_path.glob(f"*.{extension}")]
-            return []
+            return self.backend.list_names(subdir, extension)
         except Exception as e:
             print(f"Ошибка получения списка файлов: {e}")
             return []
     
+    def load_all(self, subdir: str = "", extension: str = "json") -> List[Dict[str, Any]]:
+        """Загрузка всех записей директории одним обращением к хранилищу"""
+        try:
+            return [
+                {"name": name, "data": data}
+                for name, data in self.backend.load_all(subdir, extension)
+                if data
+            ]
+        except Exception as e:
+            print(f"Ошибка загрузки списка записей: {e}")
+            return []
+    
+    def load_page(self, subdir: str, page: int = 1, per_page: int = 50, extension: str = "json") -> Dict[str, Any]:
+        """Страница записей директории (по имени) и данные для пагинации"""
+        page = max(page, 1)
+        try:
+            records, total = self.backend.load_page(subdir, (page - 1) * per_page, per_page, extension)
+        except Exception as e:
+            print(f"Ошибка загрузки страницы записей: {e}")
+            records, total = [], 0
+        return {
+            "items": [{"name": name, "data": data} for name, data in records if data],
+            "total": total,
+            "page": page,
+            "per_page": per_page,
+            "pages": (total + per_page - 1) // per_page,
+            "has_prev": page > 1,
+            "has_next": page * per_page < total
+        }
+    
     def delete_file(self, filename: str, subdir: str = "", extension: str = "json") -> bool:
         """Удаление файла"""
         try:
-            file_path = self.data_dir / subdir / f"{filename}.{extension}"
-            if file_path.exists():
-                file_path.unlink()
-                return True
-            return False
+            deleted = self.backend.delete(subdir, filename, extension)
+            if deleted:
+                events.publish(subdir, filename)
+            return deleted
         except Exception as e:
             print(f"Ошибка удаления файла: {e}")
             return False
@@ -140,22 +161,79 @@ class DataManager:
     
     def save_chat_history(self, username: str, messages: List[Dict[str, Any]]) -> bool:
         """Сохранение истории чата пользователя"""
-        return self.save_json(username, {"messages": messages}, "ai_chat")
+        if self.chat_log is None:
+            return self.save_json(username, {"messages": messages}, "ai_chat")
+        try:
+            self.chat_log.rewrite(username, messages)
+            return True
+        except Exception as e:
+            print(f"Ошибка сохранения истории чата: {e}")
+            return False
     
     def load_chat_history(self, username: str) -> List[Dict[str, Any]]:
         """Загрузка истории чата пользователя"""
-        data = self.load_json(username, "ai_chat")
-        if data and "messages" in data:
-            return data["messages"]
-        return []
+        if self.chat_log is None:
+            data = self.load_json(username, "ai_chat")
+            if data and "messages" in data:
+                return data["messages"]
+            return []
+        try:
+            return self.chat_log.read_all(username)
+        except Exception as e:
+            print(f"Ошибка загрузки истории чата: {e}")
+            return []
+    
+    def load_recent_chat_messages(self, username: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """Загрузка последних сообщений чата (читается только конец журнала)"""
+        if self.chat_log is None:
+            return self.load_chat_history(username)[-limit:]
+        try:
+            return self.chat_log.tail(username, limit)
+        except Exception as e:
+            print(f"Ошибка загрузки истории чата: {e}")
+            return []
+    
+    def save_chat_summary(self, username: str, summary: Dict[str, Any]) -> bool:
+        """Сохранение краткого содержания старых сообщений чата"""
+        if self.chat_log is None:
+            return self.save_json(f"{username}.summary", summary, "ai_chat")
+        try:
+            self.chat_log.save_summary(username, summary)
+            return True
+        except Exception as e:
+            print(f"Ошибка сохранения краткого содержания чата: {e}")
+            return False
+    
+    def load_chat_summary(self, username: str) -> Optional[Dict[str, Any]]:
+        """Загрузка краткого содержания старых сообщений чата"""
+        if self.chat_log is None:
+            return self.load_json(f"{username}.summary", "ai_chat")
+        try:
+            return self.chat_log.load_summary(username)
+        except Exception as e:
+            print(f"Ошибка загрузки краткого содержания чата: {e}")
+            return None
     
     def add_chat_message(self, username: str, role: str, content: str) -> bool:
         """Добавление сообщения в историю чата"""
         from datetime import datetime
-        history = self.load_chat_history(username)
-        history.append({
+        message = {
             "role": role,
             "content": content,
             "timestamp": datetime.now().isoformat()
-        })
-        return self.save_chat_history(username, history) 
\ No newline at end of file
+        }
+        if self.chat_log is None:
+            # Чтение-изменение-запись под файловой блокировкой: сообщения из
+            # разных воркеров не затирают друг друга
+            lock_dir = self.data_dir / "ai_chat"
+            lock_dir.mkdir(exist_ok=True)
+            with file_lock(str(lock_dir / username)):
+                history = self.load_chat_history(username)
+                history.append(message)
+                return self.save_chat_history(username, history)
+        try:
+            self.chat_log.append(username, message)
+            return True
+        except Exception as e:
+            print(f"Ошибка сохранения сообщения чата: {e}")
+            return False
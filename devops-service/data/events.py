@@ -0,0 +1,153 @@
+import os
+import threading
+import time
+from typing import Callable, List, Optional, Tuple
+
+# Подписчик получает (коллекция, имя записи); имя None - изменилась вся коллекция
+Listener = Callable[[str, Optional[str]], None]
+
+_listeners: List[Listener] = []
+_lock = threading.Lock()
+_version = 0
+
+# Общий журнал изменений для нескольких процессов (воркеров uvicorn): каждая
+# запись дописывается строкой "<pid>\t<коллекция>\t<имя>", остальные процессы
+# читают новые строки и оповещают своих подписчиков. Первая строка журнала -
+# уникальный заголовок, по нему читатели замечают замену файла при ротации.
+# Без DATA_EVENTS_LOG изменения видны только внутри процесса.
+_journal_path: Optional[str] = os.getenv("DATA_EVENTS_LOG") or None
+_journal_offset: Optional[int] = None
+_journal_header: Optional[bytes] = None
+_journal_lock = threading.Lock()
+JOURNAL_MAX_BYTES = 1024 * 1024
+
+
+def subscribe(listener: Listener):
+    """Подписывает на изменения данных (DataManager, NewsManager)"""
+    with _lock:
+        if listener not in _listeners:
+            _listeners.append(listener)
+
+
+def unsubscribe(listener: Listener):
+    """Отписывает от изменений данных"""
+    with _lock:
+        if listener in _listeners:
+            _listeners.remove(listener)
+
+
+def _dispatch(collection: str, name: Optional[str]):
+    global _version
+    with _lock:
+        _version += 1
+        listeners = list(_listeners)
+    for listener in listeners:
+        try:
+            listener(collection, name)
+        except Exception as e:
+            print(f"Ошибка обработчика изменений данных: {e}")
+
+
+def _append_journal(collection: str, name: Optional[str]):
+    """Дописывает изменение в общий журнал (переполненный журнал заменяется новым файлом)"""
+    from data.atomic import atomic_write_text, file_lock
+
+    line = f"{os.getpid()}\t{collection}\t{name or ''}\n".encode("utf-8")
+    try:
+        with file_lock(_journal_path):
+            try:
+                size = os.stat(_journal_path).st_size
+            except FileNotFoundError:
+                size = 0
+            if size == 0 or size + len(line) > JOURNAL_MAX_BYTES:
+                # Новый файл с новым заголовком - читатели заметят замену
+                atomic_write_text(_journal_path, f"#{time.time_ns()}-{os.getpid()}\n", fsync_dir=False)
+            with open(_journal_path, "ab") as f:
+                f.write(line)
+    except OSError as e:
+        print(f"Ошибка записи журнала изменений данных: {e}")
+
+
+def publish(collection: str, name: Optional[str] = None, shared: bool = True):
+    """
+    Сообщает об изменении записи. Вызывается из пути записи, поэтому
+    подписчики должны быть быстрыми (например, только помечать запись устаревшей).
+    shared=False - изменение не передается другим процессам (например, перечитывание
+    файла, которое они обнаружат сами).
+    """
+    _dispatch(collection, name)
+    if _journal_path and shared:
+        _append_journal(collection, name)
+
+
+def _read_journal(offset: int, size: int) -> Tuple[Optional[bytes], bytes]:
+    """Заголовок журнала и байты [offset, size)"""
+    try:
+        with open(_journal_path, "rb") as f:
+            header = f.readline()
+            f.seek(offset)
+            return header or None, f.read(max(size - offset, 0))
+    except FileNotFoundError:
+        return None, b""
+
+
+def poll():
+    """
+    Применяет изменения, записанные другими процессами в общий журнал.
+    Вызывается на пути чтения (индекс контекста, кэш ответов); без новых
+    записей стоит одного os.stat.
+    """
+    global _journal_offset, _journal_header
+    if not _journal_path:
+        return
+    try:
+        size = os.stat(_journal_path).st_size
+    except FileNotFoundError:
+        size = 0
+    with _journal_lock:
+        if _journal_offset is None:
+            # Изменения до запуска процесса уже учтены при загрузке данных
+            _journal_offset = size
+            _journal_header = _read_journal(size, size)[0] if size else None
+            return
+        if size == _journal_offset:
+            return
+        changes = []
+        header, chunk = _read_journal(_journal_offset, size)
+        if header is None:
+            return
+        if header != _journal_header:
+            if _journal_header is not None:
+                # Журнал заменен новым - неизвестно, что пропущено, обновляем все
+                changes.append((None, None))
+            _journal_header = header
+            _journal_offset = len(header)
+            chunk = _read_journal(_journal_offset, size)[1]
+        # Последняя строка может быть дописана не до конца - оставляем ее на потом
+        complete = chunk[:chunk.rfind(b"\n") + 1]
+        _journal_offset += len(complete)
+        pid = str(os.getpid())
+        for line in complete.decode("utf-8", "replace").splitlines():
+            parts = line.split("\t")
+            if len(parts) != 3 or parts[0] == pid:
+                continue
+            changes.append((parts[1], parts[2] or None))
+    for collection, name in changes:
+        if collection is None:
+            _dispatch_all()
+        else:
+            _dispatch(collection, name)
+
+
+def _dispatch_all():
+    """Оповещает об изменении всех коллекций"""
+    from data.storage import COLLECTIONS
+
+    for collection in COLLECTIONS:
+        _dispatch(collection, None)
+
+
+def data_version() -> int:
+    """Счетчик изменений данных (растет при каждой записи, с учетом других процессов)"""
+    poll()
+    return _version
@@ -0,0 +1,68 @@
+"""
+Импорт существующего дерева data/ в SQLite-хранилище.
+
+Запуск из каталога devops-service:
+    python -m data.migrate --data-dir data --db data/portal.db
+
+После импорта включите хранилище переменной окружения DATA_BACKEND=sqlite.
+Новости (data/news/news.json, NewsStore) и пользователи (data/users/users.json)
+остаются в файлах при любом DATA_BACKEND и не импортируются.
+"""
+import argparse
+import os
+from data.chat_log import ChatLog
+from data.storage import COLLECTIONS, FileStorage, SQLiteStorage
+
+# Коллекции, которые читаются не через DataManager (см. data/news_store.py)
+FILE_ONLY_COLLECTIONS = ("news",)
+
+
+def migrate(data_dir: str, db_path: str) -> int:
+    """Копирует JSON/YAML записи коллекций DataManager из файлового хранилища в SQLite"""
+    source = FileStorage(data_dir)
+    target = SQLiteStorage(db_path)
+    total = 0
+    for collection in COLLECTIONS:
+        if collection in FILE_ONLY_COLLECTIONS:
+            continue
+        imported = 0
+        for fmt in ("json", "yaml"):
+            for name in source.list_names(collection, fmt):
+                try:
+                    data = source.load(collection, name, fmt)
+                except Exception as e:
+                    print(f"Пропущен {collection}/{name}.{fmt}: {e}")
+                    continue
+                if data is None:
+                    continue
+                target.save(collection, name, data, fmt)
+                imported += 1
+        print(f"{collection}: {imported} записей")
+        total += imported
+
+    # Журналы чата в формате JSONL сохраняются как {"messages": [...]},
+    # краткое содержание старых сообщений - как <username>.summary
+    chat_log = ChatLog(os.path.join(data_dir, "ai_chat"))
+    for username in chat_log.usernames():
+        if (chat_log.chat_dir / f"{username}.jsonl").exists():
+            target.save("ai_chat", username, {"messages": chat_log.read_all(username)})
+            total += 1
+        summary = chat_log.load_summary(username)
+        if summary:
+            target.save("ai_chat", f"{username}.summary", summary)
+            total += 1
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Импорт data/ в SQLite")
+    parser.add_argument("--data-dir", default="data", help="Каталог с файлами данных")
+    parser.add_argument("--db", default="data/portal.db", help="Путь к базе SQLite")
+    args = parser.parse_args()
+
+    total = migrate(args.data_dir, args.db)
+    print(f"Импортировано записей: {total}")
+
+
+if __name__ == "__main__":
+    main()
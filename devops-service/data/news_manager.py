@@ -1,8 +1,8 @@
-import json
 import os
 from datetime import datetime
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 from auth.models import News, NewsCreate, NewsUpdate
+from data.news_store import NewsStore, timeline_key
 import uuid
 
 class NewsManager:
@@ -10,6 +10,8 @@ class NewsManager:
         self.data_dir = data_dir
         self.news_file = os.path.join(data_dir, "news.json")
         self._ensure_data_dir()
+        # Общий для процесса кэш новостей (write-through в news.json)
+        self.store = NewsStore.for_file(self.news_file)
         self._ensure_news_file()
     
     def _ensure_data_dir(self):
@@ -18,21 +20,7 @@ class NewsManager:
     
     def _ensure_news_file(self):
         """Создает файл новостей, если он не существует"""
-        if not os.path.exists(self.news_file):
-            self._save_news({})
-    
-    def _load_news(self) -> Dict[str, Any]:
-        """Загружает все новости из файла"""
-        try:
-            with open(self.news_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
-            return {}
-    
-    def _save_news(self, news_data: Dict[str, Any]):
-        """Сохраняет новости в файл"""
-        with open(self.news_file, 'w', encoding='utf-8') as f:
-            json.dump(news_data, f, ensure_ascii=False, indent=2, default=str)
+        self.store.ensure_file()
     
     def create_news(self, news_data: NewsCreate) -> News:
         """Создает новую новость"""
@@ -49,29 +37,14 @@ class NewsManager:
             updated_at=None
         )
         
-        # Загружаем существующие новости
-        all_news = self._load_news()
-        
-        # Добавляем новую новость
-        all_news[news_id] = news.model_dump()
-        
-        # Сохраняем обратно
-        self._save_news(all_news)
+        # Добавляем новость в кэш и сохраняем на диск
+        self.store.put(news)
         
         return news
     
     def get_news(self, news_id: str) -> Optional[News]:
         """Получает новость по ID"""
-        all_news = self._load_news()
-        if news_id in all_news:
-            news_data = all_news[news_id]
-            # Преобразуем строки дат обратно в datetime
-            if isinstance(news_data.get('created_at'), str):
-                news_data['created_at'] = datetime.fromisoformat(news_data['created_at'].replace('Z', '+00:00'))
-            if news_data.get('updated_at') and isinstance(news_data['updated_at'], str):
-                news_data['updated_at'] = datetime.fromisoformat(news_data['updated_at'].replace('Z', '+00:00'))
-            return News(**news_data)
-        return None
+        return self.store.get(news_id)
     
     def get_all_news(self, 
                      page: int = 1, 
@@ -79,52 +52,55 @@ class NewsManager:
                      search: Optional[str] = None,
                      label_filter: Optional[str] = None,
                      date_from: Optional[str] = None,
-                     date_to: Optional[str] = None) -> Dict[str, Any]:
-        """Получает все новости с пагинацией и фильтрацией"""
-        all_news = self._load_news()
-        
-        # Преобразуем в список News объектов
-        news_list = []
-        for news_id, news_data in all_news.items():
-            # Преобразуем строки дат обратно в datetime
-            if isinstance(news_data.get('created_at'), str):
-                news_data['created_at'] = datetime.fromisoformat(news_data['created_at'].replace('Z', '+00:00'))
-            if news_data.get('updated_at') and isinstance(news_data['updated_at'], str):
-                news_data['updated_at'] = datetime.fromisoformat(news_data['updated_at'].replace('Z', '+00:00'))
-            news_list.append(News(**news_data))
+                     date_to: Optional[str] = None,
+                     created_before: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Получает все новости с пагинацией и фильтрацией
+        
+        Помимо номера страницы поддерживается курсор created_before
+        (keyset-пагинация) вида "<дата>|<id>" - ключ последней показанной
+        новости: возвращаются новости, идущие строго после нее в порядке
+        (created_at, id) по убыванию, без пропуска новостей с той же датой.
+        """
+        date_from_dt = self._parse_date(date_from)
+        date_to_dt = self._parse_date(date_to)
+        created_before_dt, before_id = self._parse_cursor(created_before)
+        
+        # Курсор заменяет смещение по номеру страницы
+        offset = 0 if created_before_dt else (page - 1) * per_page
         
-        # Фильтрация
         if search:
-            search_lower = search.lower()
-            news_list = [news for news in news_list 
-                        if search_lower in news.title.lower() 
-                        or search_lower in news.content.lower()]
-        
-        if label_filter:
-            news_list = [news for news in news_list if news.label == label_filter]
-        
-        if date_from:
-            try:
-                date_from_dt = datetime.fromisoformat(date_from)
+            # Полнотекстовый поиск по индексу, результаты упорядочены по релевантности
+            news_list = self.store.search(search)
+            if label_filter:
+                news_list = [news for news in news_list if news.label == label_filter]
+            if date_from_dt:
                 news_list = [news for news in news_list if news.created_at >= date_from_dt]
-            except ValueError:
-                pass
-        
-        if date_to:
-            try:
-                date_to_dt = datetime.fromisoformat(date_to)
+            if date_to_dt:
                 news_list = [news for news in news_list if news.created_at <= date_to_dt]
-            except ValueError:
-                pass
-        
-        # Сортировка по дате создания (новые сначала)
-        news_list.sort(key=lambda x: x.created_at, reverse=True)
-        
-        # Пагинация
-        total = len(news_list)
-        start = (page - 1) * per_page
-        end = start + per_page
-        paginated_news = news_list[start:end]
+            total = len(news_list)
+            if created_before_dt:
+                cursor = (timeline_key(created_before_dt), before_id)
+                news_list = [news for news in news_list if (timeline_key(news.created_at), news.id) < cursor]
+            paginated_news = news_list[offset:offset + per_page]
+            has_next = offset + per_page < len(news_list)
+        else:
+            # Страница по отсортированным индексам (новые сначала)
+            paginated_news, total, has_next = self.store.page(
+                offset=offset,
+                limit=per_page,
+                label=label_filter,
+                date_from=date_from_dt,
+                date_to=date_to_dt,
+                created_before=created_before_dt,
+                before_id=before_id
+            )
+        
+        # Курсор для следующей страницы (только для сортировки по дате)
+        next_cursor = None
+        if has_next and paginated_news and not search:
+            last = paginated_news[-1]
+            next_cursor = f"{last.created_at.isoformat()}|{last.id}"
         
         return {
             "news": paginated_news,
@@ -133,48 +109,48 @@ class NewsManager:
             "per_page": per_page,
             "pages": (total + per_page - 1) // per_page,
             "has_prev": page > 1,
-            "has_next": end < total
+            "has_next": has_next,
+            "next_cursor": next_cursor
         }
     
+    @classmethod
+    def _parse_cursor(cls, value: Optional[str]) -> Tuple[Optional[datetime], str]:
+        """Разбирает курсор "<дата>|<id>" (курсор только из даты тоже допустим)"""
+        if not value:
+            return None, ""
+        date_part, _, news_id = value.partition("|")
+        return cls._parse_date(date_part), news_id
+    
+    @staticmethod
+    def _parse_date(value: Optional[str]) -> Optional[datetime]:
+        """Разбирает дату фильтра, некорректные значения игнорируются"""
+        if not value:
+            return None
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            return None
+    
     def update_news(self, news_id: str, news_data: NewsUpdate) -> Optional[News]:
         """Обновляет новость"""
-        all_news = self._load_news()
-        if news_id not in all_news:
-            return None
-        
-        # Загружаем существующую новость
         existing_news = self.get_news(news_id)
         if not existing_news:
             return None
         
-        # Обновляем поля
+        # Обновляем поля на копии, чтобы не менять объект в кэше до сохранения
         update_data = news_data.dict(exclude_unset=True)
-        for field, value in update_data.items():
-            setattr(existing_news, field, value)
-        
-        # Обновляем время изменения
-        existing_news.updated_at = datetime.now()
+        update_data["updated_at"] = datetime.now()
+        updated_news = existing_news.model_copy(update=update_data)
         
         # Сохраняем обратно
-        all_news[news_id] = existing_news.model_dump()
-        self._save_news(all_news)
+        self.store.put(updated_news)
         
-        return existing_news
+        return updated_news
     
     def delete_news(self, news_id: str) -> bool:
         """Удаляет новость"""
-        all_news = self._load_news()
-        if news_id in all_news:
-            del all_news[news_id]
-            self._save_news(all_news)
-            return True
-        return False
+        return self.store.delete(news_id)
     
     def get_labels(self) -> List[str]:
         """Получает список всех уникальных лейблов"""
-        all_news = self._load_news()
-        labels = set()
-        for news_data in all_news.values():
-            if 'label' in news_data:
-                labels.add(news_data['label'])
-        return sorted(list(labels)) 
\ No newline at end of file
+        return self.store.labels()
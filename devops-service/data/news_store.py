@@ -0,0 +1,235 @@
+import json
+import os
+import threading
+from bisect import bisect_left, bisect_right, insort
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from auth.models import News
+from data import events
+from data.atomic import atomic_dump_json, file_lock
+from data.search_index import InvertedIndex
+
+
+def news_from_dict(news_data: Dict) -> News:
+    """Преобразует словарь из news.json в объект News"""
+    news_data = dict(news_data)
+    # Преобразуем строки дат обратно в datetime
+    if isinstance(news_data.get('created_at'), str):
+        news_data['created_at'] = datetime.fromisoformat(news_data['created_at'].replace('Z', '+00:00'))
+    if news_data.get('updated_at') and isinstance(news_data['updated_at'], str):
+        news_data['updated_at'] = datetime.fromisoformat(news_data['updated_at'].replace('Z', '+00:00'))
+    return News(**news_data)
+
+
+def timeline_key(created_at: datetime) -> float:
+    """Ключ сортировки по дате (сравнимый для дат с часовым поясом и без)"""
+    return created_at.timestamp()
+
+
+# Верхняя граница для id при поиске по (timestamp, id) в bisect
+_MAX_ID = "\U0010ffff"
+
+
+class NewsStore:
+    """
+    Процессный кэш новостей поверх news.json.
+
+    Хранит типизированные объекты News в памяти (модель неизменяемая,
+    поэтому get/values/page отдают их без копирования), изменения сразу
+    записывает на диск (write-through). Если файл изменили снаружи
+    (другой процесс, ручное редактирование), кэш перечитывается по mtime.
+    Один экземпляр на файл - все NewsManager разделяют общее состояние.
+    Вместе с кэшем поддерживаются вторичные индексы: полнотекстовый,
+    лейбл -> хронология и общая хронология, отсортированная по created_at,
+    поэтому страница списка затрагивает только возвращаемые новости.
+    """
+
+    _instances: Dict[str, "NewsStore"] = {}
+    _instances_lock = threading.Lock()
+
+    @classmethod
+    def for_file(cls, news_file: str) -> "NewsStore":
+        """Возвращает общий для процесса кэш для указанного файла"""
+        key = os.path.abspath(news_file)
+        with cls._instances_lock:
+            store = cls._instances.get(key)
+            if store is None:
+                store = cls(key)
+                cls._instances[key] = store
+            return store
+
+    def __init__(self, news_file: str):
+        self.news_file = news_file
+        self._lock = threading.RLock()
+        self._items: Dict[str, News] = {}
+        self._index = InvertedIndex()
+        # Отсортированные по возрастанию списки (timestamp, id)
+        self._timeline: List[Tuple[float, str]] = []
+        self._label_timelines: Dict[str, List[Tuple[float, str]]] = {}
+        self._signature: Optional[Tuple[int, int]] = None
+
+    def _file_signature(self) -> Optional[Tuple[int, int]]:
+        """Подпись файла (mtime, размер) для обнаружения внешних изменений"""
+        try:
+            stat = os.stat(self.news_file)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _reload(self):
+        """Перечитывает файл новостей целиком"""
+        try:
+            with open(self.news_file, 'r', encoding='utf-8') as f:
+                raw = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            raw = {}
+
+        items = {}
+        for news_id, news_data in raw.items():
+            try:
+                items[news_id] = news_from_dict(news_data)
+            except Exception as e:
+                print(f"Ошибка загрузки новости {news_id}: {e}")
+
+        self._items = items
+        self._index.rebuild((news.id, news.title, news.content) for news in items.values())
+        self._timeline = []
+        self._label_timelines = {}
+        for news in items.values():
+            entry = (timeline_key(news.created_at), news.id)
+            self._timeline.append(entry)
+            self._label_timelines.setdefault(news.label, []).append(entry)
+        self._timeline.sort()
+        for timeline in self._label_timelines.values():
+            timeline.sort()
+        # Другие процессы обнаружат изменение файла сами (по mtime)
+        events.publish("news", shared=False)
+
+    def _refresh(self):
+        """Перечитывает кэш, если файл изменился с момента последней загрузки"""
+        signature = self._file_signature()
+        if signature != self._signature:
+            self._reload()
+            self._signature = signature
+
+    def _flush(self):
+        """Записывает текущее состояние на диск"""
+        data = {news_id: news.model_dump() for news_id, news in self._items.items()}
+        atomic_dump_json(self.news_file, data, default=str)
+        self._signature = self._file_signature()
+
+    def ensure_file(self):
+        """Создает пустой файл новостей, если он не существует"""
+        with self._lock, file_lock(self.news_file):
+            if not os.path.exists(self.news_file):
+                self._items = {}
+                self._index.clear()
+                self._timeline = []
+                self._label_timelines = {}
+                self._flush()
+
+    def invalidate(self):
+        """Сбрасывает кэш, следующее обращение перечитает файл"""
+        with self._lock:
+            self._signature = None
+
+    def get(self, news_id: str) -> Optional[News]:
+        with self._lock:
+            self._refresh()
+            return self._items.get(news_id)
+
+    def values(self) -> List[News]:
+        with self._lock:
+            self._refresh()
+            return list(self._items.values())
+
+    def labels(self) -> List[str]:
+        with self._lock:
+            self._refresh()
+            return sorted(self._label_timelines)
+
+    def search(self, query: str) -> List[News]:
+        """Полнотекстовый поиск, новости упорядочены по релевантности (BM25)"""
+        with self._lock:
+            self._refresh()
+            return [self._items[news_id] for news_id, _ in self._index.search(query)]
+
+    def page(self,
+             offset: int,
+             limit: int,
+             label: Optional[str] = None,
+             date_from: Optional[datetime] = None,
+             date_to: Optional[datetime] = None,
+             created_before: Optional[datetime] = None,
+             before_id: str = "") -> Tuple[List[News], int, bool]:
+        """
+        Страница новостей (новые сначала) по вторичным индексам.
+
+        Границы диапазона дат и курсора (created_before, before_id) находятся
+        бинарным поиском, поэтому стоимость не зависит от количества новостей.
+        Курсор - ключ последней показанной новости: новости с той же датой,
+        но меньшим id, попадают на следующую страницу.
+        Возвращает (новости страницы, всего по фильтрам, есть ли следующая).
+        """
+        with self._lock:
+            self._refresh()
+            timeline = self._timeline if label is None else self._label_timelines.get(label, [])
+
+            lo = 0 if date_from is None else bisect_left(timeline, (timeline_key(date_from), ""))
+            hi = len(timeline) if date_to is None else bisect_right(timeline, (timeline_key(date_to), _MAX_ID))
+            total = max(hi - lo, 0)
+
+            if created_before is not None:
+                hi = min(hi, bisect_left(timeline, (timeline_key(created_before), before_id)))
+
+            # Идем от новых к старым: индексы hi-1-offset ... вниз
+            end = hi - offset
+            start = max(end - limit, lo)
+            items = [self._items[news_id] for _, news_id in reversed(timeline[start:max(end, start)])]
+            return items, total, start > lo
+
+    def put(self, news: News):
+        """Добавляет или заменяет новость и сохраняет на диск"""
+        # Блокировка файла охватывает чтение-изменение-запись целиком
+        with self._lock, file_lock(self.news_file):
+            self._refresh()
+            previous = self._items.get(news.id)
+            if previous is not None:
+                self._unlink(previous)
+            self._items[news.id] = news
+            self._index.add(news.id, news.title, news.content)
+            entry = (timeline_key(news.created_at), news.id)
+            insort(self._timeline, entry)
+            insort(self._label_timelines.setdefault(news.label, []), entry)
+            self._flush()
+        events.publish("news", news.id)
+
+    def delete(self, news_id: str) -> bool:
+        """Удаляет новость и сохраняет на диск"""
+        with self._lock, file_lock(self.news_file):
+            self._refresh()
+            previous = self._items.pop(news_id, None)
+            if previous is None:
+                return False
+            self._unlink(previous)
+            self._flush()
+        events.publish("news", news_id)
+        return True
+
+    def _unlink(self, news: News):
+        """Удаляет новость из вторичных индексов"""
+        self._index.remove(news.id)
+        entry = (timeline_key(news.created_at), news.id)
+        _remove_sorted(self._timeline, entry)
+        label_timeline = self._label_timelines.get(news.label)
+        if label_timeline is not None:
+            _remove_sorted(label_timeline, entry)
+            if not label_timeline:
+                del self._label_timelines[news.label]
+
+
+def _remove_sorted(items: List[Tuple[float, str]], entry: Tuple[float, str]):
+    """Удаляет элемент из отсортированного списка"""
+    pos = bisect_left(items, entry)
+    if pos < len(items) and items[pos] == entry:
+        del items[pos]
@@ -0,0 +1,342 @@
+import math
+import re
+from bisect import bisect_left, insort
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# Слово - последовательность букв/цифр (кириллица и латиница)
+TOKEN_RE = re.compile(r"[0-9a-zа-яё]+")
+CYRILLIC_RE = re.compile(r"[а-яё]")
+
+# --- Стеммер для русского языка (упрощенный Snowball) ---
+
+RU_VOWELS = "аеиоуыэюя"
+
+RU_PERFECTIVE_GERUND_1 = ("вшись", "вши", "в")
+RU_PERFECTIVE_GERUND_2 = ("ившись", "ывшись", "ивши", "ывши", "ив", "ыв")
+RU_REFLEXIVE = ("ся", "сь")
+RU_ADJECTIVE = (
+    "ими", "ыми", "его", "ого", "ему", "ому", "ее", "ие", "ые", "ое", "ей", "ий",
+    "ый", "ой", "ем", "им", "ым", "ом", "их", "ых", "ую", "юю", "ая", "яя", "ою", "ею",
+)
+RU_PARTICIPLE_1 = ("ем", "нн", "вш", "ющ", "щ")
+RU_PARTICIPLE_2 = ("ивш", "ывш", "ующ")
+RU_VERB_1 = (
+    "ете", "йте", "ешь", "нно", "ла", "на", "ли", "ем", "ло", "но", "ет", "ют",
+    "ны", "ть", "й", "л", "н",
+)
+RU_VERB_2 = (
+    "ейте", "уйте", "ила", "ыла", "ена", "ите", "или", "ыли", "ило", "ыло", "ено",
+    "ует", "уют", "ены", "ить", "ыть", "ишь", "ей", "уй", "ил", "ыл", "им", "ым",
+    "ен", "ят", "ит", "ыт", "ую", "ю",
+)
+RU_NOUN = (
+    "иями", "ями", "ами", "ией", "иям", "ием", "иях", "ев", "ов", "ие", "ье", "еи",
+    "ии", "ей", "ой", "ий", "ям", "ем", "ам", "ом", "ах", "ях", "ию", "ью", "ия",
+    "ья", "а", "е", "и", "й", "о", "у", "ы", "ь", "ю", "я",
+)
+RU_SUPERLATIVE = ("ейше", "ейш")
+RU_DERIVATIONAL = ("ость", "ост")
+
+
+def _ru_regions(word: str) -> Tuple[int, int]:
+    """Возвращает начало областей RV и R2 для слова"""
+    rv = len(word)
+    for i, ch in enumerate(word):
+        if ch in RU_VOWELS:
+            rv = i + 1
+            break
+
+    def next_region(start: int) -> int:
+        for i in range(start + 1, len(word)):
+            if word[i] not in RU_VOWELS and word[i - 1] in RU_VOWELS:
+                return i + 1
+        return len(word)
+
+    r1 = next_region(0)
+    r2 = next_region(r1)
+    return rv, r2
+
+
+def _strip_suffix(word: str, start: int, group_1: Tuple[str, ...] = (),
+                  group_2: Tuple[str, ...] = ()) -> Optional[str]:
+    """
+    Отрезает самое длинное окончание в области word[start:].
+    Окончания group_1 допускаются только после "а"/"я".
+    """
+    region = word[start:]
+    candidates = [(s, True) for s in group_1] + [(s, False) for s in group_2]
+    candidates.sort(key=lambda item: len(item[0]), reverse=True)
+    for suffix, needs_a in candidates:
+        if not region.endswith(suffix):
+            continue
+        if needs_a:
+            pos = len(word) - len(suffix) - 1
+            if pos < start or word[pos] not in "ая":
+                continue
+        return word[:len(word) - len(suffix)]
+    return None
+
+
+def stem_russian(word: str) -> str:
+    """Стемминг русского слова"""
+    word = word.replace("ё", "е")
+    rv, r2 = _ru_regions(word)
+    if rv >= len(word):
+        return word
+
+    # Шаг 1
+    stripped = _strip_suffix(word, rv, RU_PERFECTIVE_GERUND_1, RU_PERFECTIVE_GERUND_2)
+    if stripped is not None:
+        word = stripped
+    else:
+        word = _strip_suffix(word, rv, group_2=RU_REFLEXIVE) or word
+        adjective = _strip_suffix(word, rv, group_2=RU_ADJECTIVE)
+        if adjective is not None:
+            word = _strip_suffix(adjective, rv, RU_PARTICIPLE_1, RU_PARTICIPLE_2) or adjective
+        else:
+            stripped = _strip_suffix(word, rv, RU_VERB_1, RU_VERB_2)
+            if stripped is None:
+                stripped = _strip_suffix(word, rv, group_2=RU_NOUN)
+            if stripped is not None:
+                word = stripped
+
+    # Шаг 2
+    if word[rv:].endswith("и"):
+        word = word[:-1]
+
+    # Шаг 3
+    if r2 < len(word):
+        word = _strip_suffix(word, r2, group_2=RU_DERIVATIONAL) or word
+
+    # Шаг 4
+    if word[rv:].endswith("нн"):
+        word = word[:-1]
+    else:
+        stripped = _strip_suffix(word, rv, group_2=RU_SUPERLATIVE)
+        if stripped is not None:
+            word = stripped
+            if word[rv:].endswith("нн"):
+                word = word[:-1]
+        elif word[rv:].endswith("ь"):
+            word = word[:-1]
+
+    return word
+
+
+# --- Стеммер для английского языка (упрощенный Porter, шаги 1a/1b и частые суффиксы) ---
+
+EN_VOWELS = "aeiouy"
+EN_SUFFIXES = ("ational", "ization", "fulness", "iveness", "ation",
+               "ness", "ment", "able", "ible", "ful", "ly")
+
+
+def _en_has_vowel(stem: str) -> bool:
+    return any(ch in EN_VOWELS for ch in stem)
+
+
+def stem_english(word: str) -> str:
+    """Стемминг английского слова"""
+    if len(word) <= 3:
+        return word
+
+    # Шаг 1a: множественное число
+    if word.endswith("sses"):
+        word = word[:-2]
+    elif word.endswith("ies"):
+        word = word[:-2]
+    elif word.endswith("s") and not word.endswith("ss") and not word.endswith("us"):
+        word = word[:-1]
+
+    # Шаг 1b: -ed, -ing
+    for suffix in ("eed", "ed", "ing"):
+        if word.endswith(suffix):
+            stem = word[:-len(suffix)]
+            if suffix == "eed":
+                word = word[:-1] if len(stem) > 1 else word
+            elif _en_has_vowel(stem) and len(stem) > 2:
+                word = stem
+                if len(word) > 2 and word[-1] == word[-2] and word[-1] not in "lsz":
+                    word = word[:-1]
+            break
+
+    # Частые словообразовательные суффиксы
+    for suffix in EN_SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            word = word[:-len(suffix)]
+            break
+
+    if word.endswith("y") and len(word) > 3 and word[-2] not in EN_VOWELS:
+        word = word[:-1] + "i"
+    return word
+
+
+@lru_cache(maxsize=100_000)
+def stem(token: str) -> str:
+    """Выбирает стеммер по алфавиту токена"""
+    if token.isdigit():
+        return token
+    if CYRILLIC_RE.search(token):
+        return stem_russian(token)
+    return stem_english(token)
+
+
+def tokenize(text: str) -> List[str]:
+    """Разбивает текст на нормализованные (стеммированные) токены"""
+    if not text:
+        return []
+    return [stem(token) for token in TOKEN_RE.findall(text.lower())]
+
+
+class InvertedIndex:
+    """
+    Инвертированный индекс (токен -> документы) с ранжированием BM25.
+
+    Обновляется инкрементально: add() заменяет документ, remove() удаляет.
+    Поиск обходит только списки документов для токенов запроса,
+    поэтому его стоимость не растет с размером всего архива.
+    Токены запроса дополнительно сопоставляются по префиксу
+    (через отсортированный словарь), чтобы компенсировать неточности стемминга.
+    Короткие токены ("dep", "k8s") ищутся как подстрока слов - через индекс
+    n-грамм словаря, без перебора всего словаря на каждый запрос.
+    """
+
+    # Вес совпадения по префиксу относительно точного совпадения
+    PREFIX_WEIGHT = 0.5
+    # Минимальная длина токена для поиска по префиксу и лимит расширений
+    PREFIX_MIN_LEN = 4
+    PREFIX_MAX_TERMS = 50
+    # Минимальная длина n-граммы для поиска коротких токенов по подстроке
+    GRAM_MIN_LEN = 2
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75, title_weight: int = 2):
+        self.k1 = k1
+        self.b = b
+        self.title_weight = title_weight
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._vocab: List[str] = []
+        self._grams: Dict[str, Set[str]] = {}
+        self._doc_terms: Dict[str, Counter] = {}
+        self._doc_len: Dict[str, int] = {}
+        self._total_len = 0
+
+    def __len__(self) -> int:
+        return len(self._doc_len)
+
+    def clear(self):
+        self._postings = {}
+        self._vocab = []
+        self._grams = {}
+        self._doc_terms = {}
+        self._doc_len = {}
+        self._total_len = 0
+
+    def add(self, doc_id: str, title: str = "", content: str = ""):
+        """Индексирует документ (повторный вызов заменяет старую версию)"""
+        for term in self._add(doc_id, title, content):
+            insort(self._vocab, term)
+            self._add_grams(term)
+
+    def _add(self, doc_id: str, title: str, content: str) -> List[str]:
+        """Индексирует документ, возвращает токены, впервые появившиеся в индексе"""
+        self.remove(doc_id)
+
+        terms = Counter(tokenize(content))
+        for term in tokenize(title):
+            terms[term] += self.title_weight
+
+        doc_len = sum(terms.values())
+        self._doc_terms[doc_id] = terms
+        self._doc_len[doc_id] = doc_len
+        self._total_len += doc_len
+        new_terms = []
+        for term, tf in terms.items():
+            posting = self._postings.get(term)
+            if posting is None:
+                posting = self._postings[term] = {}
+                new_terms.append(term)
+            posting[doc_id] = tf
+        return new_terms
+
+    def remove(self, doc_id: str):
+        """Удаляет документ из индекса"""
+        terms = self._doc_terms.pop(doc_id, None)
+        if terms is None:
+            return
+        self._total_len -= self._doc_len.pop(doc_id)
+        for term in terms:
+            posting = self._postings.get(term)
+            if posting is None:
+                continue
+            posting.pop(doc_id, None)
+            if not posting:
+                del self._postings[term]
+                pos = bisect_left(self._vocab, term)
+                if pos < len(self._vocab) and self._vocab[pos] == term:
+                    del self._vocab[pos]
+                self._remove_grams(term)
+
+    def _term_grams(self, term: str) -> Set[str]:
+        """Подстроки токена длиной от GRAM_MIN_LEN до PREFIX_MIN_LEN - 1"""
+        return {term[i:i + n] for n in range(self.GRAM_MIN_LEN, self.PREFIX_MIN_LEN)
+                for i in range(len(term) - n + 1)}
+
+    def _add_grams(self, term: str):
+        for gram in self._term_grams(term):
+            self._grams.setdefault(gram, set()).add(term)
+
+    def _remove_grams(self, term: str):
+        for gram in self._term_grams(term):
+            terms = self._grams.get(gram)
+            if terms is None:
+                continue
+            terms.discard(term)
+            if not terms:
+                del self._grams[gram]
+
+    def _expand(self, term: str) -> List[Tuple[str, float]]:
+        """Точное совпадение токена и токены словаря, начинающиеся с него"""
+        expanded = [(term, 1.0)] if term in self._postings else []
+        if len(term) < self.PREFIX_MIN_LEN:
+            # Короткий токен - все слова словаря, содержащие его как подстроку
+            return expanded + [(candidate, self.PREFIX_WEIGHT)
+                               for candidate in sorted(self._grams.get(term, ())) if candidate != term]
+        pos = bisect_left(self._vocab, term)
+        while pos < len(self._vocab) and len(expanded) < self.PREFIX_MAX_TERMS:
+            candidate = self._vocab[pos]
+            if not candidate.startswith(term):
+                break
+            if candidate != term:
+                expanded.append((candidate, self.PREFIX_WEIGHT))
+            pos += 1
+        return expanded
+
+    def search(self, query: str, limit: Optional[int] = None) -> List[Tuple[str, float]]:
+        """Ищет документы по запросу, возвращает пары (doc_id, score) по убыванию релевантности"""
+        doc_count = len(self._doc_len)
+        if not doc_count:
+            return []
+
+        avg_len = self._total_len / doc_count or 1.0
+        scores: Dict[str, float] = {}
+        for query_term in set(tokenize(query)):
+            for term, weight in self._expand(query_term):
+                posting = self._postings[term]
+                df = len(posting)
+                idf = weight * math.log(1 + (doc_count - df + 0.5) / (df + 0.5))
+                for doc_id, tf in posting.items():
+                    norm = self.k1 * (1 - self.b + self.b * self._doc_len[doc_id] / avg_len)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        return ranked[:limit] if limit else ranked
+
+    def rebuild(self, documents: Iterable[Tuple[str, str, str]]):
+        """Перестраивает индекс из (doc_id, title, content)"""
+        self.clear()
+        for doc_id, title, content in documents:
+            self._add(doc_id, title, content)
+        self._vocab = sorted(self._postings)
+        for term in self._vocab:
+            self._add_grams(term)
@@ -0,0 +1,225 @@
+import json
+import os
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from datetime import datetime
+from pathlib import Path
+from typing import Any, List, Optional, Tuple
+import yaml
+from data.atomic import atomic_dump_json, atomic_dump_yaml
+
+# Поддиректории (коллекции) данных портала
+COLLECTIONS = ("as_fp", "settings", "deployments", "infrastructure", "ai_chat", "news", "problems")
+
+
+class StorageBackend(ABC):
+    """
+    Интерфейс хранилища для DataManager.
+
+    Запись идентифицируется коллекцией (бывшая поддиректория), именем
+    и форматом ("json" или "yaml"). Ошибки пробрасываются наружу,
+    их обработкой занимается DataManager.
+    """
+
+    @abstractmethod
+    def save(self, collection: str, name: str, data: Any, fmt: str = "json") -> None:
+        """Сохраняет запись"""
+
+    @abstractmethod
+    def load(self, collection: str, name: str, fmt: str = "json") -> Optional[Any]:
+        """Загружает запись, None если ее нет"""
+
+    @abstractmethod
+    def list_names(self, collection: str, fmt: str = "json") -> List[str]:
+        """Список имен записей коллекции"""
+
+    @abstractmethod
+    def load_all(self, collection: str, fmt: str = "json") -> List[Tuple[str, Any]]:
+        """Все записи коллекции в виде (имя, данные), отсортированные по имени"""
+
+    @abstractmethod
+    def load_page(self, collection: str, offset: int, limit: int, fmt: str = "json") -> Tuple[List[Tuple[str, Any]], int]:
+        """Записи коллекции с offset по имени (не больше limit) и общее число записей"""
+
+    @abstractmethod
+    def delete(self, collection: str, name: str, fmt: str = "json") -> bool:
+        """Удаляет запись, False если ее не было"""
+
+
+class FileStorage(StorageBackend):
+    """Хранилище в файлах: data/<коллекция>/<имя>.json|yaml"""
+
+    def __init__(self, data_dir: str = "data"):
+        self.data_dir = Path(data_dir)
+        self.data_dir.mkdir(exist_ok=True)
+
+        # Создаем поддиректории для разных типов данных
+        for collection in COLLECTIONS:
+            (self.data_dir / collection).mkdir(exist_ok=True)
+
+    def _path(self, collection: str, name: str, fmt: str) -> Path:
+        return self.data_dir / collection / f"{name}.{fmt}"
+
+    def save(self, collection: str, name: str, data: Any, fmt: str = "json") -> None:
+        # Атомарная запись: читатель никогда не увидит наполовину записанный файл
+        if fmt == "yaml":
+            atomic_dump_yaml(str(self._path(collection, name, fmt)), data)
+        else:
+            atomic_dump_json(str(self._path(collection, name, fmt)), data)
+
+    def load(self, collection: str, name: str, fmt: str = "json") -> Optional[Any]:
+        file_path = self._path(collection, name, fmt)
+        if not file_path.exists():
+            return None
+        with open(file_path, 'r', encoding='utf-8') as f:
+            if fmt == "yaml":
+                return yaml.safe_load(f)
+            return json.load(f)
+
+    def list_names(self, collection: str, fmt: str = "json") -> List[str]:
+        dir_path = self.data_dir / collection
+        if not dir_path.exists():
+            return []
+        return [f.stem for f in dir_path.glob(f"*.{fmt}")]
+
+    def _load_names(self, collection: str, names: List[str], fmt: str) -> List[Tuple[str, Any]]:
+        records = []
+        for name in names:
+            try:
+                data = self.load(collection, name, fmt)
+            except Exception as e:
+                # Один поврежденный файл не должен ломать весь список
+                print(f"Ошибка загрузки {collection}/{name}.{fmt}: {e}")
+                continue
+            if data is not None:
+                records.append((name, data))
+        return records
+
+    def load_all(self, collection: str, fmt: str = "json") -> List[Tuple[str, Any]]:
+        return self._load_names(collection, sorted(self.list_names(collection, fmt)), fmt)
+
+    def load_page(self, collection: str, offset: int, limit: int, fmt: str = "json") -> Tuple[List[Tuple[str, Any]], int]:
+        # Читаются только файлы страницы, список имен - из каталога
+        names = sorted(self.list_names(collection, fmt))
+        return self._load_names(collection, names[offset:offset + limit], fmt), len(names)
+
+    def delete(self, collection: str, name: str, fmt: str = "json") -> bool:
+        file_path = self._path(collection, name, fmt)
+        if not file_path.exists():
+            return False
+        file_path.unlink()
+        return True
+
+
+class SQLiteStorage(StorageBackend):
+    """
+    Хранилище во встроенной SQLite (режим WAL).
+
+    Все коллекции лежат в одной таблице records, данные - в JSON-колонке.
+    Список записей коллекции (или его страница) читается одним запросом.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS records (
+            collection TEXT NOT NULL,
+            name TEXT NOT NULL,
+            format TEXT NOT NULL DEFAULT 'json',
+            data JSON NOT NULL,
+            created_at TEXT NOT NULL,
+            updated_at TEXT NOT NULL,
+            PRIMARY KEY (collection, format, name)
+        );
+        CREATE INDEX IF NOT EXISTS idx_records_name ON records (name);
+        CREATE INDEX IF NOT EXISTS idx_records_collection_updated ON records (collection, updated_at);
+        CREATE INDEX IF NOT EXISTS idx_records_created ON records (created_at);
+    """
+
+    def __init__(self, db_path: str = "data/portal.db"):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        # Отдельное соединение на поток (uvicorn выполняет sync-код в пуле потоков)
+        self._local = threading.local()
+        conn = self._connection()
+        conn.executescript(self.SCHEMA)
+        conn.commit()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def save(self, collection: str, name: str, data: Any, fmt: str = "json") -> None:
+        now = datetime.now().isoformat()
+        conn = self._connection()
+        with conn:
+            conn.execute(
+                """
+                INSERT INTO records (collection, name, format, data, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (collection, format, name)
+                DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at
+                """,
+                (collection, name, fmt, json.dumps(data, ensure_ascii=False, default=str), now, now)
+            )
+
+    def load(self, collection: str, name: str, fmt: str = "json") -> Optional[Any]:
+        row = self._connection().execute(
+            "SELECT data FROM records WHERE collection = ? AND format = ? AND name = ?",
+            (collection, fmt, name)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def list_names(self, collection: str, fmt: str = "json") -> List[str]:
+        rows = self._connection().execute(
+            "SELECT name FROM records WHERE collection = ? AND format = ? ORDER BY name",
+            (collection, fmt)
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def load_all(self, collection: str, fmt: str = "json") -> List[Tuple[str, Any]]:
+        rows = self._connection().execute(
+            "SELECT name, data FROM records WHERE collection = ? AND format = ? ORDER BY name",
+            (collection, fmt)
+        ).fetchall()
+        return [(name, json.loads(data)) for name, data in rows]
+
+    def load_page(self, collection: str, offset: int, limit: int, fmt: str = "json") -> Tuple[List[Tuple[str, Any]], int]:
+        # Сортировка и выборка страницы - в SQLite, по первичному ключу (collection, format, name)
+        conn = self._connection()
+        total = conn.execute(
+            "SELECT COUNT(*) FROM records WHERE collection = ? AND format = ?",
+            (collection, fmt)
+        ).fetchone()[0]
+        rows = conn.execute(
+            "SELECT name, data FROM records WHERE collection = ? AND format = ? ORDER BY name LIMIT ? OFFSET ?",
+            (collection, fmt, limit, offset)
+        ).fetchall()
+        return [(name, json.loads(data)) for name, data in rows], total
+
+    def delete(self, collection: str, name: str, fmt: str = "json") -> bool:
+        conn = self._connection()
+        with conn:
+            cursor = conn.execute(
+                "DELETE FROM records WHERE collection = ? AND format = ? AND name = ?",
+                (collection, fmt, name)
+            )
+        return cursor.rowcount > 0
+
+
+def create_backend(data_dir: str = "data") -> StorageBackend:
+    """
+    Создает хранилище по переменным окружения:
+    DATA_BACKEND=file (по умолчанию) или sqlite,
+    DATA_SQLITE_PATH - путь к базе (по умолчанию <data_dir>/portal.db).
+    """
+    backend = os.getenv("DATA_BACKEND", "file").lower()
+    if backend == "sqlite":
+        db_path = os.getenv("DATA_SQLITE_PATH", os.path.join(data_dir, "portal.db"))
+        Path(data_dir).mkdir(exist_ok=True)
+        return SQLiteStorage(db_path)
+    return FileStorage(data_dir)
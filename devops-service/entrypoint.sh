@@ -1,3 +1,3 @@
 #!/bin/bash
 set -e
-python main.py
\ No newline at end of file
+exec python serve.py
\ No newline at end of file
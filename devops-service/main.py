@@ -3,15 +3,14 @@ from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from fastapi.responses import HTMLResponse, RedirectResponse
 from fastapi.security import HTTPBearer
+from contextlib import asynccontextmanager
 import uvicorn
 import os
 from pathlib import Path
 
-from auth.auth import get_current_user, create_access_token
+from auth.auth import AuthRequired, auth_required_handler, get_current_user, create_access_token
 from auth.models import User, UserLogin
 from auth.utils import verify_password, get_password_hash
-from data.data_manager import DataManager
-from data.news_manager import NewsManager
 from routes import (
     main,
     auth,
@@ -23,14 +22,23 @@ from routes import (
     news,
     problems
     )
+from services.container import install
 
-app = FastAPI(title="DevOps Service Portal", version="1.0.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Запуск и остановка общих ресурсов приложения"""
+    # Один экземпляр менеджеров данных, LLMService и валидатора на процесс
+    # (роуты получают их через Depends, см. services/container.py)
+    services = install(app)
+    await services.startup()
+    yield
+    await services.shutdown()
 
-templates = Jinja2Templates(directory="templates")
+app = FastAPI(title="DevOps Service Portal", version="1.0.0", lifespan=lifespan)
+# Неавторизованный запрос к странице: форма входа или перенаправление на /login
+app.add_exception_handler(AuthRequired, auth_required_handler)
 
-# Инициализация менеджера данных
-data_manager = DataManager()
-news_manager = NewsManager()
+templates = Jinja2Templates(directory="templates")
 
 # Подключение роутов
 app.include_router(main.router)
@@ -1,11 +1,17 @@
-from fastapi import APIRouter, Request, HTTPException, status
-from fastapi.responses import HTMLResponse, JSONResponse
+import asyncio
+import json
+from fastapi import APIRouter, Request, Depends
+from fastapi.responses import HTMLResponse, JSONResponse, Response, StreamingResponse
 from fastapi.templating import Jinja2Templates
 from pydantic import BaseModel
+from starlette.background import BackgroundTask
 from typing import List, Optional
-from auth.auth import get_current_user_from_request
+from auth.auth import api_user, page_user
 from data.data_manager import DataManager
-from services.llm_service import LLMService
+from services.container import get_data_manager, get_llm_service
+from services.llm_scheduler import SchedulerRejected, Ticket
+from services.llm_service import LLMError, LLMService
+from services.metrics import metrics
 
 router = APIRouter()
 
@@ -13,60 +19,99 @@ templates = Jinja2Templates(
     directory=["./templates/ai-chat", "./templates/main"]
 )
 
-data_manager = DataManager()
-llm_service = LLMService()
-
 class ChatMessage(BaseModel):
     message: str
 
 class ChatHistoryResponse(BaseModel):
     messages: List[dict]
 
+class ClientDisconnected(Exception):
+    """Клиент закрыл соединение, не дождавшись ответа"""
+
+# Как часто проверять, не отключился ли клиент (секунды)
+DISCONNECT_POLL_INTERVAL = 0.5
+
+def _release_unused_ticket(task: asyncio.Task):
+    """Освобождает слот, если он был получен уже после отмены ожидания"""
+    if not task.cancelled() and task.exception() is None and isinstance(task.result(), Ticket):
+        task.result().release()
+
+async def run_while_connected(request: Request, awaitable):
+    """Выполняет awaitable, отменяя его, если клиент отключился (ClientDisconnected)"""
+    task = asyncio.ensure_future(awaitable)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_INTERVAL)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                if task.done():
+                    return task.result()
+                task.cancel()
+                task.add_done_callback(_release_unused_ticket)
+                metrics.inc("llm_client_disconnects")
+                raise ClientDisconnected()
+    except asyncio.CancelledError:
+        task.cancel()
+        raise
+
+def rejected_response(e: SchedulerRejected, payload: dict) -> JSONResponse:
+    """Ответ 429/503 с заголовком Retry-After"""
+    return JSONResponse(payload, status_code=e.status_code, headers={"Retry-After": str(e.retry_after)})
+
 @router.get("/ai-chat", response_class=HTMLResponse)
-async def ai_chat_page(request: Request):
+async def ai_chat_page(request: Request, current_user: dict = Depends(page_user)):
     """Страница чата с ИИ"""
-    current_user = await get_current_user_from_request(request)
-    if not current_user:
-        return templates.TemplateResponse("login.html", {"request": request})
-    
     return templates.TemplateResponse("ai_chat.html", {"request": request, "user": current_user})
 
 @router.post("/ai-chat/message")
-async def ai_chat_message(request: Request, chat_message: ChatMessage):
+async def ai_chat_message(
+    request: Request,
+    chat_message: ChatMessage,
+    current_user: dict = Depends(api_user),
+    data_manager: DataManager = Depends(get_data_manager),
+    llm_service: LLMService = Depends(get_llm_service)
+):
     """API endpoint для отправки сообщения в чат"""
-    current_user = await get_current_user_from_request(request)
-    if not current_user:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Необходима авторизация"
-        )
-    
     username = current_user["username"]
     user_message = chat_message.message
     
-    # Сохраняем сообщение пользователя
-    data_manager.add_chat_message(username, "user", user_message)
-    
-    # Загружаем историю чата
-    chat_history = data_manager.load_chat_history(username)
+    # Загружаем последние сообщения (с конца журнала, без чтения всей истории)
+    # и краткое содержание более старых
+    chat_history = data_manager.load_recent_chat_messages(username, llm_service.history_messages)
+    summary = (data_manager.load_chat_summary(username) or {}).get("summary")
     
     # Формируем историю для LLM
     history_for_llm = [
         {"role": msg["role"], "content": msg["content"]}
-        for msg in chat_history[-10:]  # Последние 10 сообщений
+        for msg in chat_history
     ]
     
-    # Генерируем ответ
+    # Генерируем ответ (запрос отменяется, если клиент отключился)
     try:
-        ai_response = await llm_service.generate_response(user_message, history_for_llm)
+        ai_response = await run_while_connected(
+            request, llm_service.generate_response(user_message, history_for_llm, summary, username)
+        )
         
-        # Сохраняем ответ ИИ
+        # Сохраняем вопрос и ответ ИИ и обновляем краткое содержание в фоне;
+        # ошибки и отказы в историю не попадают
+        data_manager.add_chat_message(username, "user", user_message)
         data_manager.add_chat_message(username, "assistant", ai_response)
+        llm_service.schedule_summary(username)
         
         return JSONResponse({
             "response": ai_response,
             "status": "success"
         })
+    except ClientDisconnected:
+        return Response(status_code=499)
+    except SchedulerRejected as e:
+        return rejected_response(e, {"response": e.detail, "status": "error"})
+    except LLMError as e:
+        return JSONResponse(
+            {"response": str(e), "status": "error"},
+            status_code=503
+        )
     except Exception as e:
         error_message = f"Ошибка при генерации ответа: {str(e)}"
         return JSONResponse(
@@ -74,25 +119,88 @@ async def ai_chat_message(request: Request, chat_message: ChatMessage):
             status_code=500
         )
 
+@router.post("/ai-chat/stream")
+async def ai_chat_stream(
+    request: Request,
+    chat_message: ChatMessage,
+    current_user: dict = Depends(api_user),
+    data_manager: DataManager = Depends(get_data_manager),
+    llm_service: LLMService = Depends(get_llm_service)
+):
+    """
+    Потоковый API чата (Server-Sent Events).
+    
+    События: "token" - очередной фрагмент ответа, "error" - ошибка,
+    "done" - ответ завершен (в data - полный текст).
+    Итоговый ответ сохраняется в историю один раз, после завершения потока.
+    Если очередь к LLM занята или модель еще прогревается - 429/503 с Retry-After
+    до начала потока.
+    """
+    username = current_user["username"]
+    user_message = chat_message.message
+    
+    # Берем последние сообщения и краткое содержание для контекста
+    history_for_llm = [
+        {"role": msg["role"], "content": msg["content"]}
+        for msg in data_manager.load_recent_chat_messages(username, llm_service.history_messages)
+    ]
+    summary = (data_manager.load_chat_summary(username) or {}).get("summary")
+    
+    # Ждем слот в очереди к LLM (ожидание отменяется при отключении клиента)
+    try:
+        llm_service.lifecycle.check_ready()
+        ticket = await run_while_connected(request, llm_service.scheduler.acquire(username))
+    except ClientDisconnected:
+        return Response(status_code=499)
+    except SchedulerRejected as e:
+        return rejected_response(e, {"detail": e.detail})
+    
+    def sse(event: str, payload: dict) -> str:
+        return f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+    
+    async def event_stream():
+        parts = []
+        try:
+            async for event in llm_service.stream_response(user_message, history_for_llm, summary):
+                if event["type"] == "token":
+                    parts.append(event["content"])
+                    yield sse("token", {"content": event["content"]})
+                else:
+                    yield sse("error", {"content": event["content"]})
+            yield sse("done", {"response": "".join(parts)})
+        finally:
+            ticket.release()
+            # Сохраняем вопрос и собранный ответ (в том числе частичный, если клиент отключился)
+            if parts:
+                data_manager.add_chat_message(username, "user", user_message)
+                data_manager.add_chat_message(username, "assistant", "".join(parts))
+                llm_service.schedule_summary(username)
+    
+    # Отключение клиента отменяет поток (и запрос к Ollama); слот освобождается
+    # и тогда, когда поток не успел начаться
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=BackgroundTask(ticket.release)
+    )
+
 @router.get("/ai-chat/history", response_class=HTMLResponse)
-async def ai_chat_history(request: Request):
+async def ai_chat_history(
+    request: Request,
+    current_user: dict = Depends(page_user),
+    data_manager: DataManager = Depends(get_data_manager)
+):
     """История чата с ИИ"""
-    current_user = await get_current_user_from_request(request)
-    if not current_user:
-        return templates.TemplateResponse("login.html", {"request": request})
-    
     chat_history = data_manager.load_chat_history(current_user["username"])
     return templates.TemplateResponse("ai_chat_history.html", {"request": request, "user": current_user, "chat_history": chat_history})
 
 @router.get("/ai-chat/history/api")
-async def ai_chat_history_api(request: Request):
+async def ai_chat_history_api(
+    request: Request,
+    current_user: dict = Depends(api_user),
+    data_manager: DataManager = Depends(get_data_manager)
+):
     """API endpoint для получения истории чата"""
-    current_user = await get_current_user_from_request(request)
-    if not current_user:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Необходима авторизация"
-        )
-    
     chat_history = data_manager.load_chat_history(current_user["username"])
     return JSONResponse({"messages": chat_history}) 
\ No newline at end of file
@@ -1,10 +1,11 @@
 from fastapi import APIRouter, Request, HTTPException, status, Depends
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse
 from fastapi.templating import Jinja2Templates
 from fastapi.security import HTTPBearer
 from auth.models import UserLogin, UserCreate, Token
-from auth.auth import authenticate_user, get_current_user, create_access_token, get_current_user_from_request
-from auth.utils import get_password_hash, load_users, save_users
+from auth.auth import authenticate_user, get_current_user, create_access_token, page_user
+from auth.throttle import LoginThrottled, login_throttle
+from auth.utils import get_password_hash_async, load_users, user_store
 import json
 
 router = APIRouter()
@@ -13,6 +14,16 @@ templates = Jinja2Templates(
     directory=["./templates/auth", "./templates/main"]
 )
 
+def client_ip(request: Request) -> str:
+    """
+    Адрес клиента. За nginx uvicorn подставляет его из X-Forwarded-For,
+    если адрес прокси указан в FORWARDED_ALLOW_IPS (см. serve.py)
+    """
+    return request.client.host if request.client else "unknown"
+
+def throttled_response(e: LoginThrottled) -> JSONResponse:
+    return JSONResponse({"detail": e.detail}, status_code=e.status_code, headers={"Retry-After": str(e.retry_after)})
+
 @router.get("/login", response_class=HTMLResponse)
 async def login_page(request: Request):
     """Страница входа"""
@@ -21,14 +32,22 @@ async def login_page(request: Request):
 @router.post("/login")
 async def login(request: Request, user_credentials: UserLogin):
     """API для входа пользователя"""
-    user = await authenticate_user(user_credentials.username, user_credentials.password)
+    # Лимит попыток проверяется до bcrypt, чтобы перебор не занимал потоки хеширования
+    ip = client_ip(request)
+    try:
+        login_throttle.check(ip, user_credentials.username)
+        user = await authenticate_user(user_credentials.username, user_credentials.password)
+    except LoginThrottled as e:
+        return throttled_response(e)
     if not user:
+        login_throttle.record_failure(ip, user_credentials.username)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
+    login_throttle.record_success(ip, user_credentials.username)
     access_token = create_access_token(data={"sub": user["username"]})
     
     # Создаем ответ с cookie
@@ -49,17 +68,22 @@ async def register_page(request: Request):
     return templates.TemplateResponse("register.html", {"request": request})
 
 @router.post("/register")
-async def register(user_data: UserCreate):
+async def register(request: Request, user_data: UserCreate):
     """API для регистрации пользователя"""
-    users = load_users()
-    
-    if user_data.username in users:
+    try:
+        login_throttle.check(client_ip(request))
+    except LoginThrottled as e:
+        return throttled_response(e)
+    if user_data.username in load_users():
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Username already registered"
         )
     
-    hashed_password = get_password_hash(user_data.password)
+    try:
+        hashed_password = await get_password_hash_async(user_data.password)
+    except LoginThrottled as e:
+        return throttled_response(e)
     user_dict = {
         "username": user_data.username,
         "hashed_password": hashed_password,
@@ -68,8 +92,13 @@ async def register(user_data: UserCreate):
         "full_name": user_data.full_name
     }
     
-    users[user_data.username] = user_dict
-    save_users(users)
+    # Пока считался хеш, могли зарегистрироваться другие пользователи (в том
+    # числе в других воркерах) - имя проверяется еще раз под блокировкой файла
+    if not user_store.add(user_data.username, user_dict):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Username already registered"
+        )
     
     return {"message": "User created successfully"}
 
@@ -81,16 +110,12 @@ async def logout():
     return response
 
 @router.get("/profile", response_class=HTMLResponse)
-async def profile_page(request: Request):
+async def profile_page(request: Request, current_user: dict = Depends(page_user)):
     """Страница профиля"""
-    current_user = await get_current_user_from_request(request)
-    if not current_user:
-        return templates.TemplateResponse("login.html", {"request": request})
-    
     return templates.TemplateResponse("profile.html", {"request": request, "user": current_user})
 
 @router.get("/profile/edit", response_class=HTMLResponse)
-async def profile_edit_page(request: Request, current_user: dict = Depends(get_current_user_from_request)):
+async def profile_edit_page(request: Request, current_user: dict = Depends(page_user)):
     """Страница редактирования профиля"""
     return templates.TemplateResponse("profile_edit.html", {
         "request": request,
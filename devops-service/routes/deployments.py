@@ -1,46 +1,41 @@
-from fastapi import APIRouter, Request, HTTPException, status
+from fastapi import APIRouter, Request, Depends
 from fastapi.responses import HTMLResponse
 from fastapi.templating import Jinja2Templates
-from auth.auth import get_current_user_from_request
+from auth.auth import page_user
 from data.data_manager import DataManager
+from services.container import get_data_manager
 
-router = APIRouter()
+# Все страницы раздела - только для авторизованных (иначе форма входа)
+router = APIRouter(dependencies=[Depends(page_user)])
 templates = Jinja2Templates(
     directory=["./templates/autodeploy", "./templates/main"]
 )
-data_manager = DataManager()
 
 @router.get("/deployments", response_class=HTMLResponse)
-async def deployments_page(request: Request):
+async def deployments_page(
+    request: Request,
+    current_user: dict = Depends(page_user),
+    page: int = 1,
+    data_manager: DataManager = Depends(get_data_manager)
+):
     """Страница автономных внедрений"""
-    current_user = await get_current_user_from_request(request)
-    if not current_user:
-        return templates.TemplateResponse("login.html", {"request": request})
-    
-    deployments_list = data_manager.list_files("deployments")
-    deployments_data = []
-    for name in deployments_list:
-        data = data_manager.load_deployment_data(name)
-        if data:
-            deployments_data.append({"name": name, "data": data})
-    return templates.TemplateResponse("deployments.html", {"request": request, "user": current_user, "deployments_list": deployments_data})
+    # С хранилища читается только текущая страница
+    deployments_data = data_manager.load_page("deployments", page)
+    return templates.TemplateResponse("deployments.html", {"request": request, "user": current_user, "deployments_list": deployments_data["items"], "pagination": deployments_data})
 
 @router.get("/deployments/{name}", response_class=HTMLResponse)
-async def deployment_detail(request: Request, name: str):
-    current_user = await get_current_user_from_request(request)
-    if not current_user:
-        return templates.TemplateResponse("login.html", {"request": request})
-    
+async def deployment_detail(
+    request: Request,
+    name: str,
+    current_user: dict = Depends(page_user),
+    data_manager: DataManager = Depends(get_data_manager)
+):
     data = data_manager.load_deployment_data(name)
     return templates.TemplateResponse("deployment_detail.html", {"request": request, "user": current_user, "deployment": data, "name": name})
 
 @router.get("/deployments/create", response_class=HTMLResponse)
-async def deployment_create_page(request: Request):
+async def deployment_create_page(request: Request, current_user: dict = Depends(page_user)):
     """Страница создания нового внедрения"""
-    current_user = await get_current_user_from_request(request)
-    if not current_user:
-        return templates.TemplateResponse("login.html", {"request": request})
-    
     return templates.TemplateResponse("deployment_create.html", {
         "request": request,
         "user": current_user
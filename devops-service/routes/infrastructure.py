@@ -1,46 +1,41 @@
-from fastapi import APIRouter, Request, HTTPException, status
+from fastapi import APIRouter, Request, Depends
 from fastapi.responses import HTMLResponse
 from fastapi.templating import Jinja2Templates
-from auth.auth import get_current_user_from_request
+from auth.auth import page_user
 from data.data_manager import DataManager
+from services.container import get_data_manager
 
-router = APIRouter()
+# Все страницы раздела - только для авторизованных (иначе форма входа)
+router = APIRouter(dependencies=[Depends(page_user)])
 templates = Jinja2Templates(
     directory=["./templates/infrawork", "./templates/main"]
 )
-data_manager = DataManager()
 
 @router.get("/infrastructure", response_class=HTMLResponse)
-async def infrastructure_page(request: Request):
+async def infrastructure_page(
+    request: Request,
+    current_user: dict = Depends(page_user),
+    page: int = 1,
+    data_manager: DataManager = Depends(get_data_manager)
+):
     """Страница инфраструктурных работ"""
-    current_user = await get_current_user_from_request(request)
-    if not current_user:
-        return templates.TemplateResponse("login.html", {"request": request})
-    
-    infrastructure_list = data_manager.list_files("infrastructure")
-    infrastructure_data = []
-    for name in infrastructure_list:
-        data = data_manager.load_infrastructure_data(name)
-        if data:
-            infrastructure_data.append({"name": name, "data": data})
-    return templates.TemplateResponse("infrastructure.html", {"request": request, "user": current_user, "infrastructure_list": infrastructure_data})
+    # С хранилища читается только текущая страница
+    infrastructure_data = data_manager.load_page("infrastructure", page)
+    return templates.TemplateResponse("infrastructure.html", {"request": request, "user": current_user, "infrastructure_list": infrastructure_data["items"], "pagination": infrastructure_data})
 
 @router.get("/infrastructure/{name}", response_class=HTMLResponse)
-async def infrastructure_detail(request: Request, name: str):
-    current_user = await get_current_user_from_request(request)
-    if not current_user:
-        return templates.TemplateResponse("login.html", {"request": request})
-    
+async def infrastructure_detail(
+    request: Request,
+    name: str,
+    current_user: dict = Depends(page_user),
+    data_manager: DataManager = Depends(get_data_manager)
+):
     data = data_manager.load_infrastructure_data(name)
     return templates.TemplateResponse("infrastructure_detail.html", {"request": request, "user": current_user, "infrastructure": data, "name": name})
 
 @router.get("/infrastructure/create", response_class=HTMLResponse)
-async def infrastructure_create_page(request: Request):
+async def infrastructure_create_page(request: Request, current_user: dict = Depends(page_user)):
     """Страница создания новой инфраструктурной работы"""
-    current_user = await get_current_user_from_request(request)
-    if not current_user:
-        return templates.TemplateResponse("login.html", {"request": request})
-    
     return templates.TemplateResponse("infrastructure_create.html", {
         "request": request,
         "user": current_user
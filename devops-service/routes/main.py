@@ -1,7 +1,10 @@
 from fastapi import APIRouter, Request, Depends
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse
 from fastapi.templating import Jinja2Templates
-from auth.auth import get_current_user_from_request
+from auth.auth import api_user, page_user
+from services.container import get_llm_service
+from services.llm_service import LLMService
+from services.metrics import metrics
 
 router = APIRouter()
 # Основные шаблоны + авторизация
@@ -10,10 +13,30 @@ templates = Jinja2Templates(directory=["./templates/main", "./templates/auth"])
 ai_chat_templates = Jinja2Templates(directory=["./templates/ai-chat", "./templates/main"])
 
 @router.get("/", response_class=HTMLResponse)
-async def home_page(request: Request):
+async def home_page(request: Request, current_user: dict = Depends(page_user)):
     """Главная страница - чат с ИИ"""
-    current_user = await get_current_user_from_request(request)
-    if not current_user:
-        return templates.TemplateResponse("login.html", {"request": request})
-    
-    return ai_chat_templates.TemplateResponse("ai_chat.html", {"request": request, "user": current_user})
\ No newline at end of file
+    return ai_chat_templates.TemplateResponse("ai_chat.html", {"request": request, "user": current_user})
+
+@router.get("/metrics")
+async def metrics_endpoint(current_user: dict = Depends(api_user)):
+    """Метрики приложения (задержки LLM, время до первого токена и др.), только для авторизованных"""
+    return JSONResponse(metrics.snapshot())
+
+@router.get("/health")
+async def health_endpoint(llm_service: LLMService = Depends(get_llm_service)):
+    """
+    Готовность сервиса: 200, когда модель прогрета хотя бы на одном экземпляре
+    Ollama, иначе 503 (модель загружается или Ollama недоступен). Публичный
+    эндпоинт - без адресов экземпляров и текстов ошибок (они в /health/details)
+    """
+    health = llm_service.lifecycle.status()
+    ready = health["status"] == "ok"
+    return JSONResponse({"status": health["status"], "ready": ready}, status_code=200 if ready else 503)
+
+@router.get("/health/details")
+async def health_details_endpoint(
+    current_user: dict = Depends(api_user),
+    llm_service: LLMService = Depends(get_llm_service)
+):
+    """Состояние каждого экземпляра Ollama и прогрева моделей (только для авторизованных)"""
+    return JSONResponse(llm_service.lifecycle.status())
@@ -1,17 +1,22 @@
-from fastapi import APIRouter, Request, HTTPException, status, Form, Query
+from fastapi import APIRouter, Request, HTTPException, status, Form, Query, Depends
 from fastapi.responses import HTMLResponse, RedirectResponse
 from fastapi.templating import Jinja2Templates
-from auth.auth import get_current_user_from_request
+from auth.auth import Permission, api_user, redirect_user
 from auth.permissions import can_manage_news, can_view_news, can_edit_news, can_delete_news
 from data.news_manager import NewsManager
 from auth.models import NewsCreate, NewsUpdate
+from services.container import get_news_manager
 from typing import Optional
 
 router = APIRouter()
 templates = Jinja2Templates(
     directory=["./templates/news", "./templates/main"]
 )
-news_manager = NewsManager()
+
+# Права на страницы новостей (без авторизации - перенаправление на /login) и API (401)
+view_news_page = Permission(can_view_news, "Недостаточно прав для просмотра новостей", auth=redirect_user)
+manage_news_page = Permission(can_manage_news, "Недостаточно прав для создания новостей", auth=redirect_user)
+manage_news_api = Permission(can_manage_news, "Недостаточно прав для создания новостей", auth=api_user)
 
 @router.get("/news", response_class=HTMLResponse)
 async def news_page(
@@ -20,17 +25,12 @@ async def news_page(
     search: Optional[str] = Query(None),
     label: Optional[str] = Query(None),
     date_from: Optional[str] = Query(None),
-    date_to: Optional[str] = Query(None)
+    date_to: Optional[str] = Query(None),
+    created_before: Optional[str] = Query(None),
+    current_user: dict = Depends(view_news_page),
+    news_manager: NewsManager = Depends(get_news_manager)
 ):
     """Страница новостей с фильтрацией и пагинацией"""
-    current_user = await get_current_user_from_request(request)
-    if not current_user:
-        return RedirectResponse(url="/login", status_code=302)
-    
-    # Проверяем права на просмотр новостей
-    if not can_view_news(current_user):
-        raise HTTPException(status_code=403, detail="Недостаточно прав для просмотра новостей")
-    
     # Получаем новости с фильтрацией и пагинацией
     result = news_manager.get_all_news(
         page=page,
@@ -38,7 +38,8 @@ async def news_page(
         search=search,
         label_filter=label,
         date_from=date_from,
-        date_to=date_to
+        date_to=date_to,
+        created_before=created_before
     )
     
     # Получаем список всех лейблов для фильтра
@@ -53,7 +54,8 @@ async def news_page(
             "pages": result["pages"],
             "has_prev": result["has_prev"],
             "has_next": result["has_next"],
-            "total": result["total"]
+            "total": result["total"],
+            "next_cursor": result["next_cursor"]
         },
         "filters": {
             "search": search,
@@ -67,16 +69,12 @@ async def news_page(
 
 
 @router.get("/news/create", response_class=HTMLResponse)
-async def news_create_page(request: Request):
+async def news_create_page(
+    request: Request,
+    current_user: dict = Depends(manage_news_page),
+    news_manager: NewsManager = Depends(get_news_manager)
+):
     """Страница создания новости"""
-    current_user = await get_current_user_from_request(request)
-    if not current_user:
-        return RedirectResponse(url="/login", status_code=302)
-    
-    # Проверяем права на создание новостей
-    if not can_manage_news(current_user):
-        raise HTTPException(status_code=403, detail="Недостаточно прав для создания новостей")
-    
     labels = news_manager.get_labels()
     
     return templates.TemplateResponse("news_create.html", {
@@ -90,17 +88,11 @@ async def create_news(
     request: Request,
     title: str = Form(...),
     content: str = Form(...),
-    label: str = Form(...)
+    label: str = Form(...),
+    current_user: dict = Depends(manage_news_api),
+    news_manager: NewsManager = Depends(get_news_manager)
 ):
     """API для создания новости"""
-    current_user = await get_current_user_from_request(request)
-    if not current_user:
-        raise HTTPException(status_code=401, detail="Необходима авторизация")
-    
-    # Проверяем права на создание новостей
-    if not can_manage_news(current_user):
-        raise HTTPException(status_code=403, detail="Недостаточно прав для создания новостей")
-    
     news_data = NewsCreate(
         title=title,
         content=content,
@@ -113,12 +105,13 @@ async def create_news(
     return RedirectResponse(url=f"/news/{news.id}", status_code=302)
 
 @router.get("/news/{news_id}", response_class=HTMLResponse)
-async def news_detail(request: Request, news_id: str):
+async def news_detail(
+    request: Request,
+    news_id: str,
+    current_user: dict = Depends(redirect_user),
+    news_manager: NewsManager = Depends(get_news_manager)
+):
     """Детальная страница новости"""
-    current_user = await get_current_user_from_request(request)
-    if not current_user:
-        return RedirectResponse(url="/login", status_code=302)
-    
     news = news_manager.get_news(news_id)
     if not news:
         raise HTTPException(status_code=404, detail="Новость не найдена")
@@ -130,12 +123,13 @@ async def news_detail(request: Request, news_id: str):
     })
 
 @router.get("/news/{news_id}/edit", response_class=HTMLResponse)
-async def news_edit_page(request: Request, news_id: str):
+async def news_edit_page(
+    request: Request,
+    news_id: str,
+    current_user: dict = Depends(redirect_user),
+    news_manager: NewsManager = Depends(get_news_manager)
+):
     """Страница редактирования новости"""
-    current_user = await get_current_user_from_request(request)
-    if not current_user:
-        return RedirectResponse(url="/login", status_code=302)
-    
     news = news_manager.get_news(news_id)
     if not news:
         raise HTTPException(status_code=404, detail="Новость не найдена")
@@ -159,13 +153,11 @@ async def edit_news(
     news_id: str,
     title: str = Form(...),
     content: str = Form(...),
-    label: str = Form(...)
+    label: str = Form(...),
+    current_user: dict = Depends(api_user),
+    news_manager: NewsManager = Depends(get_news_manager)
 ):
     """API для редактирования новости"""
-    current_user = await get_current_user_from_request(request)
-    if not current_user:
-        raise HTTPException(status_code=401, detail="Необходима авторизация")
-    
     news = news_manager.get_news(news_id)
     if not news:
         raise HTTPException(status_code=404, detail="Новость не найдена")
@@ -187,12 +179,13 @@ async def edit_news(
     return RedirectResponse(url=f"/news/{updated_news.id}", status_code=302)
 
 @router.post("/news/{news_id}/delete")
-async def delete_news(request: Request, news_id: str):
+async def delete_news(
+    request: Request,
+    news_id: str,
+    current_user: dict = Depends(api_user),
+    news_manager: NewsManager = Depends(get_news_manager)
+):
     """API для удаления новости"""
-    current_user = await get_current_user_from_request(request)
-    if not current_user:
-        raise HTTPException(status_code=401, detail="Необходима авторизация")
-    
     news = news_manager.get_news(news_id)
     if not news:
         raise HTTPException(status_code=404, detail="Новость не найдена")
@@ -1,28 +1,20 @@
-from fastapi import APIRouter, Request, HTTPException, status, UploadFile, File
+from fastapi import APIRouter, Request, HTTPException, status, UploadFile, File, Depends
 from fastapi.responses import HTMLResponse, JSONResponse
 from fastapi.templating import Jinja2Templates
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
-from typing import Optional, Dict, Any
-from jinja2 import Environment, Template
-from auth.auth import get_current_user_from_request
+from typing import Optional, Dict, Any, List
+from auth.auth import api_user, page_user
 from data.data_manager import DataManager
+from services.chart_validator import ChartError, ChartRejected, ChartValidator
+from services.container import get_chart_validator, get_data_manager, get_renderer, get_validator
+from services.template_renderer import RenderRejected, TemplateRenderer
 from services.template_validator import TemplateValidator
 
 router = APIRouter()
 templates = Jinja2Templates(
     directory=["./templates/check-settings", "./templates/main"]
 )
-data_manager = DataManager()
-# Инициализируем валидатор лениво, чтобы не блокировать запуск
-validator = None
-
-def get_validator():
-    """Ленивая инициализация TemplateValidator"""
-    global validator
-    if validator is None:
-        validator = TemplateValidator()
-    return validator
-
 class ValidateRequest(BaseModel):
     content: str
     filename: Optional[str] = None
@@ -33,24 +25,15 @@ class RenderRequest(BaseModel):
     variables: Dict[str, Any] = {}
 
 @router.get("/settings", response_class=HTMLResponse)
-async def settings_page(request: Request):
+async def settings_page(
+    request: Request,
+    current_user: dict = Depends(page_user),
+    data_manager: DataManager = Depends(get_data_manager)
+):
     """Страница проверки настроек"""
     try:
-        current_user = await get_current_user_from_request(request)
-        if not current_user:
-            return templates.TemplateResponse("login.html", {"request": request})
-        
         # settings_list больше не используется в новом шаблоне, но оставляем для совместимости
-        settings_list = data_manager.list_files("settings")
-        settings_data = []
-        for name in settings_list:
-            try:
-                data = data_manager.load_settings(name)
-                if data:
-                    settings_data.append({"name": name, "data": data})
-            except Exception as e:
-                print(f"Ошибка загрузки настроек {name}: {e}")
-                continue
+        settings_data = data_manager.load_all("settings")
         
         return templates.TemplateResponse("settings.html", {
             "request": request, 
@@ -67,57 +50,52 @@ async def settings_page(request: Request):
         )
 
 @router.get("/settings/{name}", response_class=HTMLResponse)
-async def settings_detail(request: Request, name: str):
-    current_user = await get_current_user_from_request(request)
-    if not current_user:
-        return templates.TemplateResponse("login.html", {"request": request})
-    
+async def settings_detail(
+    request: Request,
+    name: str,
+    current_user: dict = Depends(page_user),
+    data_manager: DataManager = Depends(get_data_manager)
+):
     data = data_manager.load_settings(name)
     return templates.TemplateResponse("settings_detail.html", {"request": request, "user": current_user, "settings": data, "name": name})
 
 @router.get("/settings/create", response_class=HTMLResponse)
-async def settings_create_page(request: Request):
+async def settings_create_page(request: Request, current_user: dict = Depends(page_user)):
     """Страница создания новых настроек"""
-    current_user = await get_current_user_from_request(request)
-    if not current_user:
-        return templates.TemplateResponse("login.html", {"request": request})
-    
     return templates.TemplateResponse("settings_create.html", {
         "request": request,
         "user": current_user
     })
 
 @router.post("/settings/validate")
-async def validate_template(request: Request, validate_req: ValidateRequest):
+async def validate_template(
+    request: Request,
+    validate_req: ValidateRequest,
+    current_user: dict = Depends(api_user),
+    val: TemplateValidator = Depends(get_validator)
+):
     """API endpoint для валидации шаблона"""
-    current_user = await get_current_user_from_request(request)
-    if not current_user:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Необходима авторизация"
-        )
-    
     try:
         content = validate_req.content
         filename = validate_req.filename or "template"
         template_type = validate_req.template_type
         
-        val = get_validator()
+        # Разбор больших шаблонов занимает секунды - выполняется вне цикла событий
         if template_type == "jinja":
-            result = val.validate_jinja(content)
+            result = await run_in_threadpool(val.validate_jinja, content)
             return JSONResponse({
                 "type": "jinja",
                 "validation": result
             })
         elif template_type == "helm":
-            result = val.validate_helm(content)
+            result = await run_in_threadpool(val.validate_helm, content)
             return JSONResponse({
                 "type": "helm",
                 "validation": result
             })
         else:
             # Автоматическое определение типа
-            result = val.validate_file(filename, content)
+            result = await run_in_threadpool(val.validate_file, filename, content)
             return JSONResponse(result)
     
     except Exception as e:
@@ -136,16 +114,11 @@ async def validate_template(request: Request, validate_req: ValidateRequest):
 @router.post("/settings/validate-upload")
 async def validate_uploaded_file(
     request: Request,
-    file: UploadFile = File(...)
+    file: UploadFile = File(...),
+    current_user: dict = Depends(api_user),
+    val: TemplateValidator = Depends(get_validator)
 ):
     """API endpoint для валидации загруженного файла"""
-    current_user = await get_current_user_from_request(request)
-    if not current_user:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Необходима авторизация"
-        )
-    
     try:
         # Читаем содержимое файла
         content = await file.read()
@@ -153,8 +126,7 @@ async def validate_uploaded_file(
         filename = file.filename or "uploaded_file"
         
         # Валидируем файл
-        val = get_validator()
-        result = val.validate_file(filename, content_str)
+        result = await run_in_threadpool(val.validate_file, filename, content_str)
         
         return JSONResponse(result)
     
@@ -183,29 +155,98 @@ async def validate_uploaded_file(
             status_code=500
         )
 
+@router.post("/settings/validate-chart")
+async def validate_chart(
+    request: Request,
+    files: List[UploadFile] = File(...),
+    current_user: dict = Depends(api_user),
+    charts: ChartValidator = Depends(get_chart_validator)
+):
+    """
+    API endpoint для проверки Helm-чарта целиком.
+    
+    Принимает архив чарта (.tgz/.tar/.zip) или несколько файлов чарта.
+    Архив распаковывается в память, файлы проверяются параллельно, ссылки
+    .Values.* сверяются с values.yaml (services/chart_validator.py). Ответ -
+    сводный отчет; архив не читается или превышает лимиты - 400, очередь
+    проверки заполнена - 503 с Retry-After.
+    """
+    try:
+        uploads = [(file.filename or "uploaded_file", file.file) for file in files]
+        # Место в очереди занимается до распаковки архива в память
+        report = await charts.validate_uploads(uploads)
+        return JSONResponse(report)
+    
+    except ChartError as e:
+        return JSONResponse(
+            {
+                "type": "error",
+                "validation": {
+                    "valid": False,
+                    "errors": [{"message": str(e)}],
+                    "warnings": []
+                }
+            },
+            status_code=400
+        )
+    except ChartRejected as e:
+        return JSONResponse(
+            {
+                "type": "error",
+                "validation": {
+                    "valid": False,
+                    "errors": [{"message": e.detail}],
+                    "warnings": []
+                }
+            },
+            status_code=503,
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    except Exception as e:
+        return JSONResponse(
+            {
+                "type": "error",
+                "validation": {
+                    "valid": False,
+                    "errors": [{"message": f"Ошибка обработки чарта: {str(e)}"}],
+                    "warnings": []
+                }
+            },
+            status_code=500
+        )
+
 @router.post("/settings/render")
-async def render_template_endpoint(request: Request, render_req: RenderRequest):
-    """API endpoint для рендеринга шаблона с переменными"""
-    current_user = await get_current_user_from_request(request)
-    if not current_user:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Необходима авторизация"
+async def render_template_endpoint(
+    request: Request,
+    render_req: RenderRequest,
+    current_user: dict = Depends(api_user),
+    renderer: TemplateRenderer = Depends(get_renderer)
+):
+    """
+    API endpoint для рендеринга шаблона с переменными.
+    
+    Рендеринг идет в пуле процессов в песочнице с лимитами времени и размера
+    результата (services/template_renderer.py): ошибка шаблона или превышение
+    лимита - 400, очередь рендеринга заполнена - 503 с Retry-After.
+    """
+    try:
+        result = await renderer.render(render_req.template, render_req.variables or {})
+    except RenderRejected as e:
+        return JSONResponse(
+            {"rendered": None, "status": "error", "error": e.detail},
+            status_code=503,
+            headers={"Retry-After": str(e.retry_after)}
         )
     
     try:
-        template_content = render_req.template
-        variables = render_req.variables or {}
-        
-        # Создаем Jinja2 окружение
-        jinja_env = Environment()
-        
-        # Рендерим шаблон
-        template = jinja_env.from_string(template_content)
-        rendered = template.render(**variables)
+        if "error" in result:
+            return JSONResponse(
+                {"rendered": None, "status": "error", "error": result["error"]},
+                status_code=400
+            )
         
         return JSONResponse({
-            "rendered": rendered,
+            "rendered": result["rendered"],
             "status": "success"
         })
     
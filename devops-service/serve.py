@@ -0,0 +1,73 @@
+"""
+Запуск приложения в production-режиме: uvicorn без перезагрузки по
+изменению файлов, с корректным завершением.
+
+По умолчанию один воркер: планировщик запросов к LLM, ограничение попыток
+входа и прогрев моделей работают внутри процесса, и с N воркерами их
+лимиты умножаются на N, а модели прогреваются N раз. Несколько воркеров
+(--workers / WEB_CONCURRENCY) - только с лимитами, уменьшенными в N раз.
+
+Для разработки по-прежнему используется `python main.py` (один процесс, --reload).
+
+Запуск из каталога devops-service:
+    python serve.py
+"""
+import argparse
+import importlib.util
+import os
+import uvicorn
+
+
+def _installed(module: str) -> bool:
+    return importlib.util.find_spec(module) is not None
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Запуск DevOps Service (production)")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument(
+        "--workers", type=int,
+        default=int(os.getenv("WEB_CONCURRENCY", "1")),
+        help="число процессов-воркеров (WEB_CONCURRENCY, по умолчанию 1; лимиты действуют на воркер)"
+    )
+    parser.add_argument(
+        "--graceful-timeout", type=int, default=int(os.getenv("GRACEFUL_TIMEOUT", "30")),
+        help="сколько секунд ждать завершения текущих запросов при остановке"
+    )
+    parser.add_argument(
+        "--forwarded-allow-ips", default=os.getenv("FORWARDED_ALLOW_IPS", "127.0.0.1"),
+        help="адреса прокси (nginx), которым доверяется X-Forwarded-For"
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    workers = max(1, args.workers)
+    if workers > 1:
+        print(
+            f"Запуск с {workers} воркерами: LLM_MAX_CONCURRENCY, LOGIN_IP_LIMIT, LOGIN_USER_LIMIT "
+            f"и прогрев моделей действуют в каждом воркере отдельно"
+        )
+        # Воркеры сообщают друг другу об изменениях данных через общий журнал
+        # (кэши ответов ИИ и индекс контекста), см. data/events.py
+        os.environ.setdefault("DATA_EVENTS_LOG", os.path.join("data", "events.log"))
+
+    uvicorn.run(
+        "main:app",
+        host=args.host,
+        port=args.port,
+        workers=workers,
+        reload=False,
+        # uvloop и httptools входят в uvicorn[standard]; без них - стандартные реализации
+        loop="uvloop" if _installed("uvloop") else "asyncio",
+        http="httptools" if _installed("httptools") else "auto",
+        proxy_headers=True,
+        forwarded_allow_ips=args.forwarded_allow_ips,
+        timeout_graceful_shutdown=args.graceful_timeout,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,428 @@
+import asyncio
+import multiprocessing
+import os
+import posixpath
+import re
+import tarfile
+import time
+import zipfile
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, BinaryIO, Dict, List, Optional, Set, Tuple
+import yaml
+from services.helm_lint import HelmLinter, LintRule
+from services.metrics import metrics
+from services.template_validator import TemplateValidator
+from services.yaml_stream import load_yaml
+
+ARCHIVE_SUFFIXES = (".tgz", ".tar.gz", ".tar", ".zip")
+# Файлы чарта, которые проверяются (остальные - в списке пропущенных)
+CHART_FILE_SUFFIXES = (".yaml", ".yml", ".tpl", ".txt", ".j2", ".jinja", ".jinja2")
+# Ссылка на значение: .Values.a.b.c
+VALUES_REF_RE = re.compile(r"\.Values((?:\.[A-Za-z_][A-Za-z0-9_]*)+)")
+
+# Файл чарта: (путь в архиве или имя загруженного файла, содержимое)
+ChartFile = Tuple[str, str]
+
+
+class ChartError(Exception):
+    """Архив не читается или превышает лимиты (HTTP 400)"""
+
+
+class ChartRejected(Exception):
+    """Очередь проверки чартов заполнена (HTTP 503 с Retry-After)"""
+
+    def __init__(self, detail: str, retry_after: int = 2):
+        super().__init__(detail)
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+# --- Код процесса-воркера ---------------------------------------------------
+
+_worker_validator: Optional[TemplateValidator] = None
+
+
+def _init_worker(rules: List[LintRule], max_findings: int):
+    """Валидатор воркера с теми же правилами Helm, что и в процессе приложения"""
+    global _worker_validator
+    # Кэш результатов - в процессе приложения, здесь не нужен
+    _worker_validator = TemplateValidator(cache_size=0, linter=HelmLinter(rules, max_findings))
+
+
+def _validate_file(filename: str, content: str) -> Dict[str, Any]:
+    """Проверка одного файла в процессе-воркере"""
+    return _worker_validator.validate_file(filename, content)
+
+
+# --- Распаковка -------------------------------------------------------------
+
+def is_archive(filename: str) -> bool:
+    return filename.lower().endswith(ARCHIVE_SUFFIXES)
+
+
+class _Collector:
+    """Собирает текстовые файлы чарта в память с лимитами на число файлов и объем"""
+
+    def __init__(self, max_files: int, max_bytes: int):
+        self.max_files = max_files
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.entries = 0
+        # Путь -> содержимое; _uploads - номер загрузки, из которой взят путь
+        self.files: Dict[str, str] = {}
+        self._uploads: Dict[str, int] = {}
+        self.skipped: List[Dict[str, str]] = []
+
+    def add(self, name: str, stream: BinaryIO, upload: int = 1):
+        name = posixpath.normpath(name.replace("\\", "/").lstrip("/"))
+        self.entries += 1
+        if self.entries > self.max_files:
+            raise ChartError(f"В чарте больше {self.max_files} файлов")
+        if name.startswith("..") or not name.lower().endswith(CHART_FILE_SUFFIXES):
+            self.skipped.append({"filename": name, "reason": "Тип файла не проверяется"})
+            return
+        # Читаем не больше оставшегося лимита: архив-бомба не распакуется в память целиком
+        remaining = self.max_bytes - self.total_bytes
+        data = stream.read(remaining + 1)
+        if len(data) > remaining:
+            raise ChartError(f"Файлы чарта больше {self.max_bytes // (1024 * 1024)} МБ после распаковки")
+        self.total_bytes += len(data)
+        if self._uploads.get(name, upload) != upload:
+            # Одноименный файл из другой загрузки получает ее номер, чтобы результаты
+            # проверки не перезаписывали друг друга (повтор внутри архива заменяет файл, как в tar)
+            name = posixpath.join(f"#{upload}", name)
+        try:
+            self.files[name] = data.decode("utf-8")
+            self._uploads[name] = upload
+        except UnicodeDecodeError:
+            self.skipped.append({"filename": name, "reason": "Файл не является текстовым (UTF-8)"})
+
+    def add_archive(self, filename: str, fileobj: BinaryIO, upload: int = 1):
+        """Распаковка .tgz/.tar/.zip потоком, без записи на диск"""
+        try:
+            if filename.lower().endswith(".zip"):
+                with zipfile.ZipFile(fileobj) as archive:
+                    for info in archive.infolist():
+                        if not info.is_dir():
+                            with archive.open(info) as stream:
+                                self.add(info.filename, stream, upload)
+            else:
+                # Потоковый режим tar: архив читается один раз, последовательно
+                with tarfile.open(fileobj=fileobj, mode="r|*") as archive:
+                    for member in archive:
+                        if member.isfile():
+                            self.add(member.name, archive.extractfile(member), upload)
+        except (tarfile.TarError, zipfile.BadZipFile, EOFError, OSError) as e:
+            raise ChartError(f"Не удалось распаковать архив {filename}: {e}") from e
+
+
+# --- Проверка .Values -------------------------------------------------------
+
+def _resolve(values: Any, path: List[str]) -> bool:
+    for key in path:
+        if not isinstance(values, dict) or key not in values:
+            return False
+        values = values[key]
+    return True
+
+
+def _chart_root(path: str, roots: List[str]) -> str:
+    """Каталог ближайшего Chart.yaml (подчарты - в charts/<имя>/)"""
+    for root in roots:
+        if not root or path.startswith(root + "/"):
+            return root
+    return ""
+
+
+def _relative(path: str, root: str) -> str:
+    return path[len(root) + 1:] if root else path
+
+
+# --- Проверка чарта ---------------------------------------------------------
+
+class ChartValidator:
+    """
+    Проверка чарта целиком: архив .tgz/.zip или несколько загруженных файлов.
+
+    Файлы распаковываются в память (без записи на диск) с лимитами на число
+    файлов (max_files) и объем после распаковки (max_bytes), проверяются
+    параллельно в пуле процессов (workers) через TemplateValidator.validate_file;
+    уже проверенное содержимое берется из кэша валидатора. Ссылки .Values.*
+    в шаблонах сверяются с values.yaml своего чарта (подчарты - со своим).
+    Результат - один сводный отчет.
+    """
+
+    def __init__(self, validator: TemplateValidator, workers: int = 2, queue_limit: int = 4,
+                 timeout: float = 60.0, max_files: int = 500, max_bytes: int = 20 * 1024 * 1024):
+        self.validator = validator
+        self.workers = max(1, workers)
+        self.queue_limit = queue_limit
+        self.timeout = timeout
+        self.max_files = max_files
+        self.max_bytes = max_bytes
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._linter_version: Optional[int] = None
+        self._pending = 0
+        # Проверки, использующие пул, и пулы с зависшим воркером: такой пул
+        # больше не получает задач и останавливается, когда проверки в нем
+        # завершатся (остальные запросы не получают BrokenProcessPool)
+        self._users: Dict[ProcessPoolExecutor, int] = {}
+        self._retired: Set[ProcessPoolExecutor] = set()
+
+    @classmethod
+    def from_env(cls, validator: TemplateValidator) -> "ChartValidator":
+        return cls(
+            validator,
+            workers=int(os.getenv("CHART_VALIDATE_WORKERS", str(min(4, os.cpu_count() or 1)))),
+            queue_limit=int(os.getenv("CHART_VALIDATE_QUEUE", "4")),
+            timeout=float(os.getenv("CHART_VALIDATE_TIMEOUT", "60")),
+            max_files=int(os.getenv("CHART_MAX_FILES", "500")),
+            max_bytes=int(os.getenv("CHART_MAX_MB", "20")) * 1024 * 1024
+        )
+
+    def extract(self, uploads: List[Tuple[str, BinaryIO]]) -> Tuple[List[ChartFile], List[Dict[str, str]]]:
+        """
+        Файлы чарта из загрузок (архивы распаковываются) и список пропущенных.
+        Блокирующее чтение - вызывается в пуле потоков.
+        """
+        collector = _Collector(self.max_files, self.max_bytes)
+        for upload, (filename, fileobj) in enumerate(uploads, 1):
+            if is_archive(filename):
+                collector.add_archive(filename, fileobj, upload)
+            else:
+                collector.add(filename, fileobj, upload)
+        if not collector.files:
+            raise ChartError("В загрузке нет файлов чарта для проверки")
+        return list(collector.files.items()), collector.skipped
+
+    def _pool(self) -> ProcessPoolExecutor:
+        linter = self.validator.linter
+        if self._executor is not None and self._linter_version != linter.version:
+            # Добавлены правила Helm: воркеры перезапускаются с новым набором
+            self._executor.shutdown(wait=False)
+            self._executor = None
+        if self._executor is None:
+            self._linter_version = linter.version
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(linter.rules, linter.max_findings)
+            )
+        return self._executor
+
+    def _acquire(self) -> ProcessPoolExecutor:
+        executor = self._pool()
+        self._users[executor] = self._users.get(executor, 0) + 1
+        return executor
+
+    def _release(self, executor: ProcessPoolExecutor, retire: bool = False):
+        """
+        Завершение проверки в пуле; retire - воркер завис или упал: пул
+        больше не используется и останавливается после последней проверки в нем
+        """
+        if retire:
+            self._retired.add(executor)
+            if self._executor is executor:
+                self._executor = None
+        self._users[executor] -= 1
+        if self._users[executor] > 0:
+            return
+        del self._users[executor]
+        if executor in self._retired:
+            self._retired.discard(executor)
+            for process in list(getattr(executor, "_processes", {}).values()):
+                process.terminate()
+            executor.shutdown(wait=False)
+
+    async def _validate_files(self, files: List[Tuple[str, str, str]]) -> Dict[str, Dict[str, Any]]:
+        """Проверка файлов (путь, имя для валидатора, содержимое) в пуле процессов; результат по пути"""
+        results: Dict[str, Dict[str, Any]] = {}
+        futures: Dict[asyncio.Future, Tuple[str, str]] = {}
+        loop = asyncio.get_running_loop()
+        executor = None
+        for path, name, content in files:
+            key = self.validator.file_cache_key(name, content)
+            cached = self.validator.cache.get(key)
+            if cached is not None:
+                results[path] = cached
+                continue
+            if executor is None:
+                executor = self._acquire()
+            futures[loop.run_in_executor(executor, _validate_file, name, content)] = (path, key)
+        if not futures:
+            return results
+
+        retire = False
+        try:
+            _, not_done = await asyncio.wait(futures, timeout=self.timeout)
+            for future, (path, key) in futures.items():
+                if future in not_done:
+                    retire = True
+                    error = "Превышено время проверки файла"
+                elif isinstance(future.exception(), BrokenProcessPool):
+                    retire = True
+                    error = "Проверка файла прервана: воркер завершился аварийно"
+                elif future.exception() is not None:
+                    error = f"Ошибка валидации: {future.exception()}"
+                else:
+                    results[path] = future.result()
+                    self.validator.cache.put(key, results[path])
+                    continue
+                results[path] = {
+                    "type": "error",
+                    "validation": {"valid": False, "errors": [{"message": error}], "warnings": []}
+                }
+        finally:
+            for future in futures:
+                future.cancel()
+            self._release(executor, retire)
+        return results
+
+    @contextmanager
+    def _slot(self):
+        """Место в очереди проверки чартов (ChartRejected, если очередь заполнена)"""
+        if self._pending >= self.queue_limit:
+            metrics.inc("chart_validate_rejected")
+            raise ChartRejected("Сервер занят проверкой чартов. Попробуйте через несколько секунд")
+        self._pending += 1
+        try:
+            yield
+        finally:
+            self._pending -= 1
+
+    async def validate_uploads(self, uploads: List[Tuple[str, BinaryIO]]) -> Dict[str, Any]:
+        """
+        Распаковка и проверка загруженного чарта. Место в очереди занимается
+        до распаковки: одновременно в памяти не больше queue_limit чартов
+        """
+        with self._slot():
+            files, skipped = await asyncio.get_running_loop().run_in_executor(None, self.extract, uploads)
+            return await self._timed_validate(files, skipped)
+
+    async def validate(self, files: List[ChartFile], skipped: Optional[List[Dict[str, str]]] = None) -> Dict[str, Any]:
+        """Сводный отчет по чарту (ChartRejected, если очередь заполнена)"""
+        with self._slot():
+            return await self._timed_validate(files, list(skipped or []))
+
+    async def _timed_validate(self, files: List[ChartFile], skipped: List[Dict[str, str]]) -> Dict[str, Any]:
+        started = time.perf_counter()
+        try:
+            report = await self._validate(files, skipped)
+        finally:
+            metrics.observe("chart_validate_seconds", time.perf_counter() - started)
+        metrics.inc("chart_validate_files", len(files))
+        return report
+
+    async def _validate(self, files: List[ChartFile], skipped: List[Dict[str, str]]) -> Dict[str, Any]:
+        # Корни чартов - каталоги с Chart.yaml, самые глубокие (подчарты) первыми
+        roots = sorted(
+            {posixpath.dirname(path) for path, _ in files if posixpath.basename(path) == "Chart.yaml"},
+            key=len, reverse=True
+        )
+        if "" not in roots:
+            roots.append("")
+        by_root: Dict[str, List[ChartFile]] = {}
+        for path, content in files:
+            by_root.setdefault(_chart_root(path, roots), []).append((path, content))
+
+        results = await self._validate_files([
+            (path, _relative(path, _chart_root(path, roots)), content) for path, content in files
+        ])
+
+        report_files = []
+        for path, _ in sorted(files):
+            result = results[path]
+            if result["type"] == "unknown":
+                # Например, NOTES.txt без директив шаблона
+                skipped.append({"filename": path, "reason": "Тип файла не определен"})
+                continue
+            report_files.append({"filename": path, "type": result["type"], "validation": result["validation"]})
+
+        charts, missing, unused = [], [], []
+        for root in sorted(by_root):
+            chart_files = dict(by_root[root])
+            chart_info = self._chart_info(root, chart_files)
+            charts.append(chart_info)
+            if not chart_info["values_file"]:
+                continue
+            values = self._load_values(chart_files[posixpath.join(root, "values.yaml")])
+            if values is None:
+                continue
+            referenced = set()
+            for path, content in sorted(chart_files.items()):
+                if _relative(path, root) in ("values.yaml", "Chart.yaml"):
+                    continue
+                seen = set()
+                for match in VALUES_REF_RE.finditer(content):
+                    reference = match.group(1)[1:].split(".")
+                    referenced.add(reference[0])
+                    if _resolve(values, reference) or (path, match.group(0)) in seen:
+                        continue
+                    seen.add((path, match.group(0)))
+                    missing.append({
+                        "file": path,
+                        "line": content.count("\n", 0, match.start()) + 1,
+                        "reference": match.group(0)
+                    })
+            # Значения подчартов (ключ - имя каталога в charts/) и global используются не в шаблонах этого чарта
+            subcharts = {posixpath.basename(sub) for sub in roots if sub and posixpath.dirname(posixpath.dirname(sub)) == root}
+            if isinstance(values, dict):
+                unused.extend(
+                    {"chart": root or ".", "key": key}
+                    for key in values if key not in referenced and key not in subcharts and key != "global"
+                )
+
+        errors = sum(len(f["validation"].get("errors", [])) for f in report_files)
+        warnings = sum(len(f["validation"].get("warnings", [])) for f in report_files)
+        invalid = sum(1 for f in report_files if not f["validation"].get("valid", False))
+        return {
+            "type": "chart",
+            "valid": invalid == 0,
+            "charts": charts,
+            "files": report_files,
+            "values_check": {"missing": missing, "unused": unused},
+            "skipped": skipped,
+            "summary": {
+                "files": len(report_files),
+                "valid": len(report_files) - invalid,
+                "invalid": invalid,
+                "errors": errors,
+                "warnings": warnings,
+                "missing_values": len(missing),
+                "skipped": len(skipped)
+            }
+        }
+
+    @staticmethod
+    def _load_values(content: str) -> Optional[Any]:
+        try:
+            return load_yaml(content) or {}
+        except yaml.YAMLError:
+            # Ошибка уже есть в отчете по values.yaml
+            return None
+
+    @staticmethod
+    def _chart_info(root: str, chart_files: Dict[str, str]) -> Dict[str, Any]:
+        info = {
+            "path": root or ".",
+            "name": None,
+            "version": None,
+            "values_file": posixpath.join(root, "values.yaml") in chart_files
+        }
+        chart_yaml = chart_files.get(posixpath.join(root, "Chart.yaml"))
+        if chart_yaml is not None:
+            try:
+                meta = load_yaml(chart_yaml)
+            except yaml.YAMLError:
+                meta = None
+            if isinstance(meta, dict):
+                info["name"], info["version"] = meta.get("name"), meta.get("version")
+        return info
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
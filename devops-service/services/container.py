@@ -0,0 +1,74 @@
+from typing import Optional
+from fastapi import FastAPI, Request
+from data.data_manager import DataManager
+from data.news_manager import NewsManager
+from services.chart_validator import ChartValidator
+from services.llm_service import LLMService
+from services.template_renderer import TemplateRenderer
+from services.template_validator import TemplateValidator
+
+
+class ServiceContainer:
+    """
+    Единственные на процесс экземпляры сервисов приложения.
+
+    Создается в lifespan FastAPI (main.py) и хранится в app.state.services;
+    роуты получают сервисы через зависимости get_data_manager, get_news_manager,
+    get_llm_service, get_validator, get_chart_validator и get_renderer. Все сервисы работают с одними и теми же
+    менеджерами данных, поэтому их кэши общие.
+    """
+
+    def __init__(self, data_dir: str = "data"):
+        self.data_manager = DataManager(data_dir)
+        self.news_manager = NewsManager(f"{data_dir}/news")
+        self.llm_service = LLMService(data_manager=self.data_manager, news_manager=self.news_manager)
+        self.validator = TemplateValidator()
+        # Проверка чартов целиком в пуле процессов (общий кэш результатов с validator)
+        self.chart_validator = ChartValidator.from_env(self.validator)
+        # Пул процессов для рендеринга пользовательских шаблонов (создается при первом рендеринге)
+        self.renderer = TemplateRenderer.from_env()
+
+    async def startup(self):
+        # Пул соединений к Ollama и прогрев моделей
+        await self.llm_service.startup()
+
+    async def shutdown(self):
+        await self.llm_service.shutdown()
+        self.renderer.shutdown()
+        self.chart_validator.shutdown()
+
+
+def install(app: FastAPI, container: Optional[ServiceContainer] = None) -> ServiceContainer:
+    """Регистрирует контейнер в приложении (app.state.services)"""
+    app.state.services = container or ServiceContainer()
+    return app.state.services
+
+
+# Зависимости FastAPI: data_manager: DataManager = Depends(get_data_manager) и т.д.
+
+def get_services(request: Request) -> ServiceContainer:
+    return request.app.state.services
+
+
+def get_data_manager(request: Request) -> DataManager:
+    return request.app.state.services.data_manager
+
+
+def get_news_manager(request: Request) -> NewsManager:
+    return request.app.state.services.news_manager
+
+
+def get_llm_service(request: Request) -> LLMService:
+    return request.app.state.services.llm_service
+
+
+def get_validator(request: Request) -> TemplateValidator:
+    return request.app.state.services.validator
+
+
+def get_chart_validator(request: Request) -> ChartValidator:
+    return request.app.state.services.chart_validator
+
+
+def get_renderer(request: Request) -> TemplateRenderer:
+    return request.app.state.services.renderer
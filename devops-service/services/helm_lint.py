@@ -0,0 +1,161 @@
+import os
+import re
+from typing import Any, Dict, Iterable, List, Optional
+import yaml
+
+HELM_FUNCTIONS = [
+    'include', 'required', 'tpl', 'default', 'empty', 'coalesce',
+    'toYaml', 'toJson', 'b64enc', 'b64dec', 'indent', 'nindent'
+]
+
+SEVERITIES = ("error", "warning")
+
+
+class LintRule:
+    """
+    Правило проверки Helm-шаблона: регулярное выражение и сообщение.
+
+    В сообщении {0} - найденный текст, {1}, {2}... - группы выражения.
+    Флаги задаются внутри выражения только локально: (?i:...).
+    Находка с severity="error" делает шаблон невалидным.
+    """
+
+    def __init__(self, name: str, pattern: str, message: str, severity: str = "warning"):
+        if severity not in SEVERITIES:
+            raise ValueError(f"Неизвестная важность правила {name}: {severity}")
+        self.name = name
+        self.pattern = re.compile(pattern)
+        self.message = message
+        self.severity = severity
+
+    def format(self, match: "re.Match") -> str:
+        try:
+            return self.message.format(match.group(0), *match.groups())
+        except (IndexError, KeyError):
+            return self.message
+
+    def __reduce__(self):
+        # Передается в процессы-воркеры проверки чартов
+        return (LintRule, (self.name, self.pattern.pattern, self.message, self.severity))
+
+
+DEFAULT_RULES = [
+    LintRule(
+        "values-access",
+        r'\.Values(?:\s+\.|\.(?![A-Za-z_]))',
+        "Неправильное использование .Values (должно быть .Values.field)"
+    ),
+    LintRule(
+        "release-access",
+        r'\.Release(?:\s+\.|\.(?![A-Za-z_]))',
+        "Неправильное использование .Release (должно быть .Release.field)"
+    ),
+    LintRule(
+        "function-call",
+        r'\{\{\s*(' + '|'.join(HELM_FUNCTIONS) + r')\s*[^(]',
+        "Возможно неправильное использование функции {1} (проверьте синтаксис)"
+    ),
+]
+
+
+class HelmLinter:
+    """
+    Проверка Helm-шаблона набором правил за один проход по тексту.
+
+    Выражения всех правил объединены в одно: сканер находит ближайшую
+    позицию, где может сработать какое-либо правило, и только там правила
+    проверяются по отдельности. Номер строки считается по ходу прохода,
+    поэтому у каждой находки есть строка и столбец. Находок не больше
+    max_findings - многомегабайтный манифест не раздувает ответ; если до
+    лимита не встретилось ни одной ошибки (severity="error"), проход
+    продолжается только по правилам-ошибкам и добавляет первую найденную,
+    чтобы лимит не делал невалидный шаблон валидным.
+
+    Дополнительные правила: register(LintRule(...)) или YAML-файл
+    в HELM_LINT_RULES (список {name, pattern, message, severity}).
+    """
+
+    def __init__(self, rules: Optional[Iterable[LintRule]] = None, max_findings: int = 200):
+        self.rules: List[LintRule] = []
+        self.max_findings = max_findings
+        # Меняется при добавлении правил: входит в ключ кэша результатов валидации
+        self.version = 0
+        self._scanner: Optional["re.Pattern"] = None
+        self._error_rules: List[LintRule] = []
+        self._error_scanner: Optional["re.Pattern"] = None
+        for rule in DEFAULT_RULES if rules is None else rules:
+            self.register(rule)
+
+    @classmethod
+    def from_env(cls) -> "HelmLinter":
+        linter = cls(max_findings=int(os.getenv("HELM_LINT_MAX_FINDINGS", "200")))
+        rules_file = os.getenv("HELM_LINT_RULES")
+        if rules_file:
+            linter.load_rules(rules_file)
+        return linter
+
+    def register(self, rule: LintRule):
+        """Добавляет правило (с тем же именем - заменяет)"""
+        self.rules = [existing for existing in self.rules if existing.name != rule.name] + [rule]
+        self._scanner = self._combine(self.rules)
+        self._error_rules = [r for r in self.rules if r.severity == "error"]
+        self._error_scanner = self._combine(self._error_rules)
+        self.version += 1
+
+    @staticmethod
+    def _combine(rules: List[LintRule]) -> Optional["re.Pattern"]:
+        return re.compile("|".join(f"(?:{r.pattern.pattern})" for r in rules)) if rules else None
+
+    def load_rules(self, path: str):
+        """Правила из YAML-файла; ошибки в файле печатаются и не мешают запуску"""
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                specs = yaml.safe_load(f) or []
+            for spec in specs:
+                self.register(LintRule(
+                    spec["name"], spec["pattern"], spec["message"], spec.get("severity", "warning")
+                ))
+        except (OSError, yaml.YAMLError, KeyError, TypeError, ValueError, re.error) as e:
+            print(f"Ошибка загрузки правил проверки Helm из {path}: {e}")
+
+    def lint(self, content: str) -> List[Dict[str, Any]]:
+        """Находки: rule, severity, message, line, column (с 1), text"""
+        findings: List[Dict[str, Any]] = []
+        if self._scanner is None:
+            return findings
+        resume = self._scan(content, self._scanner, self.rules, 0, findings, self.max_findings)
+        if resume is not None and self._error_scanner is not None and \
+                not any(finding["severity"] == "error" for finding in findings):
+            # Лимит достигнут без ошибок: ищем первую ошибку в оставшемся тексте
+            self._scan(content, self._error_scanner, self._error_rules, resume, findings, len(findings) + 1)
+        return findings
+
+    @staticmethod
+    def _scan(content: str, scanner: "re.Pattern", rules: List[LintRule], start: int,
+              findings: List[Dict[str, Any]], limit: int) -> Optional[int]:
+        """
+        Дописывает находки правил rules с позиции start, пока их меньше limit.
+        Позиция, с которой продолжить, или None - текст пройден до конца
+        """
+        line, counted = 1, 0
+        candidate = scanner.search(content, start)
+        while candidate is not None:
+            pos = candidate.start()
+            if len(findings) >= limit:
+                return pos
+            line += content.count("\n", counted, pos)
+            counted = pos
+            column = pos - content.rfind("\n", 0, pos)
+            for rule in rules:
+                match = rule.pattern.match(content, pos)
+                if match is not None:
+                    findings.append({
+                        "rule": rule.name,
+                        "severity": rule.severity,
+                        "message": rule.format(match),
+                        "line": line,
+                        "column": column,
+                        "text": match.group(0)
+                    })
+            candidate = scanner.search(content, pos + 1)
+        return None
@@ -0,0 +1,328 @@
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional, Set
+import httpx
+from services.metrics import metrics
+
+
+class NoBackendAvailable(Exception):
+    """Все экземпляры Ollama недоступны (не отвечают или отключены автоматом)"""
+
+
+class Endpoint:
+    """Экземпляр Ollama: общий пул соединений и результат последней проверки /api/tags"""
+
+    def __init__(self, url: str):
+        self.url = url.rstrip("/")
+        self._client: Optional[httpx.AsyncClient] = None
+        # До первой проверки считаем экземпляр доступным
+        self.healthy = True
+        self.models: Optional[Set[str]] = None
+        self.last_probe = 0.0
+
+    def _create_client(self) -> httpx.AsyncClient:
+        """Создает пул соединений к Ollama с keep-alive"""
+        limits = httpx.Limits(
+            max_connections=int(os.getenv("OLLAMA_MAX_CONNECTIONS", "10")),
+            max_keepalive_connections=int(os.getenv("OLLAMA_MAX_KEEPALIVE", "5")),
+            keepalive_expiry=30.0
+        )
+        return httpx.AsyncClient(
+            base_url=self.url,
+            timeout=httpx.Timeout(60.0, connect=10.0),
+            limits=limits
+        )
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """HTTP-клиент экземпляра (создается лениво)"""
+        if self._client is None or self._client.is_closed:
+            self._client = self._create_client()
+        return self._client
+
+    def has_model(self, model: str) -> bool:
+        if self.models is None:
+            return True
+        return model in self.models or f"{model}:latest" in self.models
+
+    async def probe(self) -> bool:
+        """Проверяет экземпляр через /api/tags и запоминает список моделей"""
+        self.last_probe = time.time()
+        try:
+            response = await self.client.get("/api/tags", timeout=5.0)
+            response.raise_for_status()
+            self.models = {m.get("name", "") for m in response.json().get("models", [])}
+            self.healthy = True
+        except Exception:
+            self.healthy = False
+        return self.healthy
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+class Backend:
+    """
+    Модель на экземпляре Ollama с автоматом отключения (circuit breaker):
+    после failure_threshold ошибок подряд бэкенд исключается из маршрутизации
+    на cooldown секунд (OPEN), затем пропускает один пробный запрос (HALF_OPEN):
+    успех возвращает его в работу (CLOSED), ошибка - снова отключает.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, endpoint: Endpoint, model: str, capacity: int = 1, fallback: bool = False,
+                 failure_threshold: int = 3, cooldown: float = 30.0):
+        self.endpoint = endpoint
+        self.model = model
+        self.capacity = capacity
+        self.fallback = fallback
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.outstanding = 0
+        self.failures = 0
+        self.open_until = 0.0
+        # В полуоткрытом состоянии выполняется пробный запрос
+        self.probing = False
+        # Модель загружена в память экземпляра (выставляет ModelLifecycle)
+        self.warm = False
+
+    @property
+    def name(self) -> str:
+        return f"{self.endpoint.url}/{self.model}"
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        return self.endpoint.client
+
+    def state(self, now: float) -> str:
+        if not self.open_until:
+            return self.CLOSED
+        return self.OPEN if now < self.open_until else self.HALF_OPEN
+
+    def available(self, now: float) -> bool:
+        if not (self.endpoint.healthy and self.endpoint.has_model(self.model)):
+            return False
+        state = self.state(now)
+        return state == self.CLOSED or (state == self.HALF_OPEN and not self.probing)
+
+    @property
+    def saturated(self) -> bool:
+        return self.outstanding >= self.capacity
+
+    def record_success(self):
+        self.failures = 0
+        self.open_until = 0.0
+
+    def record_failure(self):
+        now = time.time()
+        self.failures += 1
+        metrics.inc("llm_backend_failures")
+        # В полуоткрытом состоянии одна ошибка пробного запроса снова отключает бэкенд
+        if self.failures >= self.failure_threshold or self.state(now) == self.HALF_OPEN:
+            self.open_until = now + self.cooldown
+            metrics.inc("llm_circuit_opened")
+            print(f"Бэкенд LLM {self.name} временно отключен после {self.failures} ошибок")
+
+
+class Lease:
+    """Бэкенд, выбранный для одного запроса"""
+
+    def __init__(self, backend: Backend, probe: bool = False):
+        self.backend = backend
+        self.failed = False
+        # Пробный запрос к бэкенду в полуоткрытом состоянии
+        self.probe = probe
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        return self.backend.client
+
+    @property
+    def model(self) -> str:
+        return self.backend.model
+
+    def fail(self):
+        """Отмечает ответ бэкенда как ошибку (например, HTTP 5xx)"""
+        self.failed = True
+
+
+class BackendPool:
+    """
+    Пул экземпляров Ollama.
+
+    Запрос уходит на доступный основной бэкенд с наименьшим числом
+    выполняющихся запросов. Если все основные заняты (outstanding >= capacity)
+    или недоступны, используется свободный резервный бэкенд (обычно меньшая
+    модель). Доступность экземпляров проверяется в фоне через /api/tags.
+    """
+
+    def __init__(self, primary: List[Backend], fallback: Optional[List[Backend]] = None,
+                 probe_interval: float = 15.0):
+        self.primary = primary
+        self.fallback = fallback or []
+        self.probe_interval = probe_interval
+        self._probe_task: Optional[asyncio.Task] = None
+
+    @classmethod
+    def from_env(cls, model: str, default_host: str) -> "BackendPool":
+        """
+        OLLAMA_HOSTS - экземпляры через запятую (по умолчанию default_host),
+        OLLAMA_FALLBACK_MODEL и OLLAMA_FALLBACK_HOSTS - резервная модель и ее экземпляры.
+        """
+        capacity = int(os.getenv("OLLAMA_NUM_PARALLEL", "1"))
+        failure_threshold = int(os.getenv("OLLAMA_FAILURE_THRESHOLD", "3"))
+        cooldown = float(os.getenv("OLLAMA_CIRCUIT_COOLDOWN", "30"))
+        endpoints: Dict[str, Endpoint] = {}
+
+        def backends(hosts: str, backend_model: str, fallback: bool) -> List[Backend]:
+            result = []
+            for url in (host.strip().rstrip("/") for host in hosts.split(",")):
+                if not url:
+                    continue
+                endpoint = endpoints.setdefault(url, Endpoint(url))
+                result.append(Backend(endpoint, backend_model, capacity, fallback, failure_threshold, cooldown))
+            return result
+
+        hosts = os.getenv("OLLAMA_HOSTS") or default_host
+        primary = backends(hosts, model, False)
+        fallback_model = os.getenv("OLLAMA_FALLBACK_MODEL", "")
+        fallback = []
+        if fallback_model and fallback_model != model:
+            fallback = backends(os.getenv("OLLAMA_FALLBACK_HOSTS") or hosts, fallback_model, True)
+        return cls(primary, fallback, probe_interval=float(os.getenv("OLLAMA_HEALTH_INTERVAL", "15")))
+
+    @property
+    def backends(self) -> List[Backend]:
+        return self.primary + self.fallback
+
+    @property
+    def endpoints(self) -> List[Endpoint]:
+        unique: Dict[str, Endpoint] = {}
+        for backend in self.backends:
+            unique.setdefault(backend.endpoint.url, backend.endpoint)
+        return list(unique.values())
+
+    @property
+    def capacity(self) -> int:
+        """Суммарное число параллельных запросов всех бэкендов"""
+        return sum(backend.capacity for backend in self.backends)
+
+    @staticmethod
+    def _prefer_warm(backends: List[Backend]) -> List[Backend]:
+        """Бэкенды с прогретой моделью, если такие есть (холодный отвечает после загрузки модели)"""
+        warm = [b for b in backends if b.warm]
+        return warm or backends
+
+    def choose(self, exclude: Optional[Set[str]] = None) -> Backend:
+        """Выбирает бэкенд для запроса (NoBackendAvailable, если подходящих нет)"""
+        now = time.time()
+        exclude = exclude or set()
+        primary = self._prefer_warm([b for b in self.primary if b.name not in exclude and b.available(now)])
+        fallback = self._prefer_warm([b for b in self.fallback if b.name not in exclude and b.available(now)])
+
+        best = min(primary, key=lambda b: b.outstanding) if primary else None
+        if best is not None and not best.saturated:
+            return best
+        free_fallback = [b for b in fallback if not b.saturated]
+        if free_fallback:
+            metrics.inc("llm_fallback_requests")
+            return min(free_fallback, key=lambda b: b.outstanding)
+        # Все заняты - ставим в очередь Ollama наименее загруженного
+        if best is not None:
+            return best
+        if fallback:
+            metrics.inc("llm_fallback_requests")
+            return min(fallback, key=lambda b: b.outstanding)
+        raise NoBackendAvailable("Нет доступных экземпляров Ollama")
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Клиент наименее загруженного доступного бэкенда (для вспомогательных запросов)"""
+        try:
+            return self.choose().client
+        except NoBackendAvailable:
+            return self.backends[0].client
+
+    def _update_gauges(self, backend: Backend):
+        metrics.set_gauge(f"llm_backend_outstanding:{backend.name}", backend.outstanding)
+
+    @asynccontextmanager
+    async def lease(self, exclude: Optional[Set[str]] = None):
+        """
+        Бэкенд на время запроса. Ошибки подключения и lease.fail() (HTTP 5xx)
+        засчитываются бэкенду как отказ, успешное завершение сбрасывает счетчик
+        ошибок. Прочие ошибки (таймаут чтения длинного ответа, отключение клиента)
+        состояние автомата не меняют.
+        """
+        backend = self.choose(exclude)
+        lease = Lease(backend, probe=backend.state(time.time()) == Backend.HALF_OPEN)
+        backend.probing = backend.probing or lease.probe
+        backend.outstanding += 1
+        self._update_gauges(backend)
+        try:
+            yield lease
+        except (httpx.ConnectError, httpx.ConnectTimeout):
+            backend.record_failure()
+            raise
+        else:
+            if lease.failed:
+                backend.record_failure()
+            else:
+                backend.record_success()
+        finally:
+            if lease.probe:
+                backend.probing = False
+            backend.outstanding -= 1
+            self._update_gauges(backend)
+
+    async def probe_all(self):
+        """Проверяет все экземпляры параллельно"""
+        await asyncio.gather(*(endpoint.probe() for endpoint in self.endpoints))
+        for endpoint in self.endpoints:
+            metrics.set_gauge(f"llm_backend_healthy:{endpoint.url}", 1 if endpoint.healthy else 0)
+
+    async def _probe_loop(self):
+        while True:
+            await self.probe_all()
+            await asyncio.sleep(self.probe_interval)
+
+    def start(self):
+        """Запускает фоновую проверку доступности экземпляров"""
+        if self._probe_task is None or self._probe_task.done():
+            self._probe_task = asyncio.create_task(self._probe_loop())
+
+    async def close(self):
+        """Останавливает проверку и закрывает соединения"""
+        if self._probe_task and not self._probe_task.done():
+            self._probe_task.cancel()
+            try:
+                await self._probe_task
+            except (asyncio.CancelledError, Exception):
+                pass
+        for endpoint in self.endpoints:
+            await endpoint.aclose()
+
+    def status(self) -> List[Dict[str, object]]:
+        """Состояние бэкендов (для /metrics и диагностики)"""
+        now = time.time()
+        return [
+            {
+                "url": backend.endpoint.url,
+                "model": backend.model,
+                "fallback": backend.fallback,
+                "healthy": backend.endpoint.healthy,
+                "circuit": backend.state(now),
+                "circuit_open": backend.state(now) == Backend.OPEN,
+                "warm": backend.warm,
+                "outstanding": backend.outstanding,
+                "capacity": backend.capacity,
+            }
+            for backend in self.backends
+        ]
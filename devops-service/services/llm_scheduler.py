@@ -0,0 +1,146 @@
+import asyncio
+import math
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Dict
+from services.metrics import metrics
+
+
+class SchedulerRejected(Exception):
+    """Запрос к LLM отклонен планировщиком (лимит пользователя или переполнение очереди)"""
+
+    def __init__(self, status_code: int, detail: str, retry_after: int):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class Ticket:
+    """Место в планировщике; release() можно вызывать повторно"""
+
+    def __init__(self, scheduler: "LLMScheduler", user: str):
+        self._scheduler = scheduler
+        self.user = user
+        self.running = False
+        self.released = False
+        self.started = time.perf_counter()
+
+    def release(self):
+        if not self.released:
+            self.released = True
+            self._scheduler._release(self)
+
+
+class LLMScheduler:
+    """
+    Планировщик запросов к Ollama.
+
+    Одновременно выполняется не более max_concurrency запросов (по числу
+    параллельных слотов всех экземпляров Ollama), у пользователя - не более
+    per_user запросов (в очереди и в работе). Очередь ожидания ограничена:
+    при превышении лимита пользователя - 429, при переполнении очереди или
+    слишком долгом ожидании - 503; в обоих случаях с оценкой Retry-After.
+    Ожидание в очереди отменяется вместе с запросом (отключение клиента).
+    """
+
+    def __init__(self, max_concurrency: int = 1, max_queue: int = 16, per_user: int = 1,
+                 queue_timeout: float = 60.0):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.per_user = per_user
+        self.queue_timeout = queue_timeout
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._user_counts: Dict[str, int] = {}
+        self._waiting = 0
+        self._running = 0
+        # Скользящая оценка длительности запроса (для Retry-After)
+        self._avg_service_time = 10.0
+
+    @classmethod
+    def from_env(cls, default_concurrency: int = 1) -> "LLMScheduler":
+        """Общий лимит - LLM_MAX_CONCURRENCY, по умолчанию суммарная емкость экземпляров Ollama"""
+        return cls(
+            max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", str(default_concurrency))),
+            max_queue=int(os.getenv("LLM_QUEUE_SIZE", "16")),
+            per_user=int(os.getenv("LLM_PER_USER_LIMIT", "1")),
+            queue_timeout=float(os.getenv("LLM_QUEUE_TIMEOUT", "60"))
+        )
+
+    def retry_after(self) -> int:
+        """Оценка времени (в секундах), через которое появится свободный слот"""
+        queued_rounds = (self._waiting + 1) / self.max_concurrency
+        return max(1, math.ceil(queued_rounds * self._avg_service_time))
+
+    def _update_gauges(self):
+        metrics.set_gauge("llm_queue_depth", self._waiting)
+        metrics.set_gauge("llm_in_flight", self._running)
+
+    async def acquire(self, user: str, wait: bool = True) -> Ticket:
+        """
+        Ждет свободный слот; при отказе - SchedulerRejected.
+        С wait=False (фоновые задачи) слот берется, только если он свободен сразу.
+        """
+        if not wait and self._semaphore.locked():
+            raise SchedulerRejected(503, "Нет свободного слота", self.retry_after())
+        if self._user_counts.get(user, 0) >= self.per_user:
+            metrics.inc("llm_rejected_user_limit")
+            raise SchedulerRejected(429, "Предыдущий запрос еще обрабатывается, дождитесь ответа", self.retry_after())
+        if self._waiting >= self.max_queue:
+            metrics.inc("llm_rejected_queue_full")
+            raise SchedulerRejected(503, "Сервис ИИ перегружен, попробуйте позже", self.retry_after())
+
+        ticket = Ticket(self, user)
+        self._user_counts[user] = self._user_counts.get(user, 0) + 1
+        self._waiting += 1
+        self._update_gauges()
+        # Захват семафора - отдельная задача под shield: wait_for (Python 3.8-3.11)
+        # при таймауте или отмене мог потерять слот, уже переданный ожидающему
+        acquiring = asyncio.ensure_future(self._semaphore.acquire())
+        try:
+            await asyncio.wait_for(asyncio.shield(acquiring), timeout=self.queue_timeout)
+        except BaseException as e:
+            # Таймаут ожидания или отмена запроса (клиент отключился)
+            acquiring.cancel()
+            acquiring.add_done_callback(self._return_permit)
+            self._waiting -= 1
+            ticket.release()
+            if isinstance(e, asyncio.TimeoutError):
+                metrics.inc("llm_rejected_queue_timeout")
+                raise SchedulerRejected(503, "Сервис ИИ перегружен, попробуйте позже", self.retry_after()) from None
+            raise
+        self._waiting -= 1
+        ticket.running = True
+        self._running += 1
+        metrics.observe("llm_queue_wait_seconds", time.perf_counter() - ticket.started)
+        ticket.started = time.perf_counter()
+        self._update_gauges()
+        return ticket
+
+    def _return_permit(self, acquiring: asyncio.Future):
+        """Возвращает слот, захваченный уже после отказа от ожидания"""
+        if not acquiring.cancelled() and acquiring.exception() is None:
+            self._semaphore.release()
+
+    def _release(self, ticket: Ticket):
+        if ticket.running:
+            self._running -= 1
+            self._semaphore.release()
+            elapsed = time.perf_counter() - ticket.started
+            self._avg_service_time = 0.8 * self._avg_service_time + 0.2 * elapsed
+        count = self._user_counts.get(ticket.user, 0) - 1
+        if count > 0:
+            self._user_counts[ticket.user] = count
+        else:
+            self._user_counts.pop(ticket.user, None)
+        self._update_gauges()
+
+    @asynccontextmanager
+    async def slot(self, user: str, wait: bool = True):
+        """Слот на время выполнения блока"""
+        ticket = await self.acquire(user, wait)
+        try:
+            yield ticket
+        finally:
+            ticket.release()
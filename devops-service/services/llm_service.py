@@ -1,348 +1,358 @@
+import asyncio
 import os
 import json
+import time
 import httpx
-from typing import List, Dict, Any, Optional
-from pathlib import Path
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, List, Dict, Any, Optional, Tuple
 from data.data_manager import DataManager
 from data.news_manager import NewsManager
+from services.llm_backends import BackendPool, NoBackendAvailable
+from services.llm_scheduler import LLMScheduler, SchedulerRejected
+from services.metrics import metrics
+from services.model_lifecycle import ModelLifecycle
+from services.prompt_builder import PromptBuilder, estimate_tokens, truncate_to_tokens
+from services.response_cache import create_response_cache
+from services.retrieval_index import SOURCES, RetrievalIndex
+from services.vector_index import create_vector_index
+
+
+class LLMError(Exception):
+    """Ошибка обращения к Ollama (текст пригоден для показа пользователю)"""
 
 
 class LLMService:
-    def __init__(self, ollama_host: str = None):
+    def __init__(
+        self,
+        ollama_host: str = None,
+        data_manager: Optional[DataManager] = None,
+        news_manager: Optional[NewsManager] = None
+    ):
         self.ollama_host = ollama_host or os.getenv("OLLAMA_HOST", "http://localhost:11434")
         # Используем более легкую модель для быстрой работы
         # Можно изменить на другую модель: llama3.2, mistral, qwen2.5 и т.д.
         self.model_name = os.getenv("OLLAMA_MODEL", "llama3.2:1b")
-        self.data_manager = DataManager()
-        self.news_manager = NewsManager()
-        self._model_checked = False
-        # Не проверяем модель при инициализации, чтобы не блокировать запуск приложения
+        # Менеджеры данных передает контейнер сервисов (services/container.py)
+        self.data_manager = data_manager or DataManager()
+        self.news_manager = news_manager or NewsManager()
+        # Экземпляры Ollama (OLLAMA_HOSTS) с балансировкой, проверкой доступности и резервной моделью
+        self.pool = BackendPool.from_env(self.model_name, self.ollama_host)
+        # Загрузка и прогрев моделей; keep_alive передается в каждом запросе, чтобы модель оставалась в памяти
+        self.lifecycle = ModelLifecycle.from_env(self.pool)
+        self.keep_alive = self.lifecycle.keep_alive
+        # Индекс данных для контекста, обновляется по событиям записи
+        self.retrieval = RetrievalIndex(self.data_manager, self.news_manager)
+        # Семантический индекс по эмбеддингам (если задан OLLAMA_EMBED_MODEL и есть numpy)
+        self.vectors = create_vector_index(lambda: self.client, self.keep_alive)
+        self.rag_top_k = int(os.getenv("RAG_TOP_K", "6"))
+        self._vector_task: Optional[asyncio.Task] = None
+        # Кэш ответов (LLM_CACHE_MAX_ENTRIES=0 отключает)
+        self.cache = create_response_cache(SOURCES)
+        # Бюджет токенов промпта: всего, на историю и на одну запись контекста
+        self.prompt_builder = PromptBuilder(
+            max_tokens=int(os.getenv("LLM_PROMPT_MAX_TOKENS", "1536")),
+            history_tokens=int(os.getenv("LLM_HISTORY_MAX_TOKENS", "384")),
+            record_tokens=int(os.getenv("LLM_RECORD_MAX_TOKENS", "200"))
+        )
+        # Сколько последних сообщений передается в промпт как есть (более старые - в кратком содержании)
+        self.history_messages = int(os.getenv("LLM_HISTORY_MESSAGES", "10"))
+        self.summary_batch = int(os.getenv("LLM_SUMMARY_BATCH", "6"))
+        self._summary_tasks: Dict[str, asyncio.Task] = {}
+        # Очередь запросов к Ollama: общий лимит, лимит на пользователя, ограниченное ожидание
+        self.scheduler = LLMScheduler.from_env(self.pool.capacity)
     
-    def _ensure_model_loaded(self):
-        """Проверяет и загружает модель, если необходимо (вызывается при первом использовании)"""
-        if self._model_checked:
-            return
-        
-        try:
-            response = httpx.get(f"{self.ollama_host}/api/tags", timeout=5.0)
-            if response.status_code == 200:
-                models = response.json().get("models", [])
-                model_names = [m.get("name", "") for m in models]
-                if self.model_name not in model_names:
-                    print(f"Модель {self.model_name} не найдена. Загружаю...")
-                    self._pull_model()
-            self._model_checked = True
-        except Exception as e:
-            print(f"Предупреждение: не удалось подключиться к Ollama: {e}")
-            print("Убедитесь, что Ollama запущен и доступен")
-            self._model_checked = True  # Помечаем как проверенную, чтобы не повторять попытки
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """HTTP-клиент наименее загруженного доступного экземпляра Ollama"""
+        return self.pool.client
     
-    def _pull_model(self):
-        """Загружает модель в Ollama"""
-        try:
-            response = httpx.post(
-                f"{self.ollama_host}/api/pull",
-                json={"name": self.model_name},
-                timeout=300.0  # Загрузка может занять время
-            )
-            if response.status_code == 200:
-                print(f"Модель {self.model_name} успешно загружена")
-        except Exception as e:
-            print(f"Ошибка загрузки модели: {e}")
+    async def startup(self):
+        """
+        Запускает проверку доступности экземпляров Ollama и прогрев моделей в фоне
+        (запуск приложения не ждет загрузки модели, чат открывается после прогрева)
+        """
+        self.pool.start()
+        self.lifecycle.start()
     
-    def _load_all_data(self) -> Dict[str, List[Dict[str, Any]]]:
-        """Загружает все данные системы для индексации"""
-        all_data = {
-            "news": [],
-            "problems": [],
-            "deployments": [],
-            "infrastructure": [],
-            "as_fp": [],
-            "settings": []
-        }
-        
-        # Загружаем новости
-        try:
-            news_data = self.news_manager.get_all_news(page=1, per_page=1000)
-            for news in news_data.get("news", []):
-                all_data["news"].append({
-                    "type": "news",
-                    "id": news.id,
-                    "title": news.title,
-                    "content": news.content,
-                    "label": news.label,
-                    "author": news.author,
-                    "created_at": str(news.created_at)
-                })
-        except Exception as e:
-            print(f"Ошибка загрузки новостей: {e}")
-        
-        # Загружаем проблемы
-        try:
-            problems = self.data_manager.load_problems_data("problems")
-            if problems:
-                for problem in problems:
-                    all_data["problems"].append({
-                        "type": "problem",
-                        "data": problem
-                    })
-        except Exception as e:
-            print(f"Ошибка загрузки проблем: {e}")
-        
-        # Загружаем внедрения
-        try:
-            deployment_files = self.data_manager.list_files("deployments")
-            for name in deployment_files:
-                deployment = self.data_manager.load_deployment(name)
-                if deployment:
-                    all_data["deployments"].append({
-                        "type": "deployment",
-                        "name": name,
-                        "data": deployment
-                    })
-        except Exception as e:
-            print(f"Ошибка загрузки внедрений: {e}")
+    async def shutdown(self):
+        """Останавливает фоновые задачи и закрывает пулы соединений"""
+        await self.lifecycle.stop()
+        for task in (self._vector_task, *self._summary_tasks.values()):
+            if task and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except (asyncio.CancelledError, Exception):
+                    pass
+        await self.pool.close()
+        self.retrieval.close()
+        if self.cache is not None:
+            self.cache.close()
+    
+    @asynccontextmanager
+    async def _chat_request(self, messages: List[Dict[str, str]], stream: bool):
+        """
+        Запрос к /api/chat через пул экземпляров; отдает (бэкенд, ответ) с непрочитанным телом.
         
-        # Загружаем инфраструктуру
+        При ошибке подключения или HTTP 5xx до начала ответа запрос повторяется
+        на следующем доступном бэкенде.
+        """
+        tried = set()
+        while True:
+            async with self.pool.lease(tried) as lease:
+                tried.add(lease.backend.name)
+                request = lease.client.build_request(
+                    "POST",
+                    "/api/chat",
+                    json={
+                        "model": lease.model,
+                        "messages": messages,
+                        "stream": stream,
+                        "keep_alive": self.keep_alive
+                    }
+                )
+                try:
+                    response = await lease.client.send(request, stream=True)
+                except (httpx.ConnectError, httpx.ConnectTimeout):
+                    if len(tried) >= len(self.pool.backends):
+                        raise
+                    lease.fail()
+                    metrics.inc("llm_failovers")
+                    continue
+                try:
+                    if response.status_code >= 500 and len(tried) < len(self.pool.backends):
+                        lease.fail()
+                        metrics.inc("llm_failovers")
+                        continue
+                    if response.status_code >= 500:
+                        lease.fail()
+                    yield lease, response
+                    return
+                finally:
+                    await response.aclose()
+    
+    def _connect_error_text(self) -> str:
+        hosts = ", ".join(endpoint.url for endpoint in self.pool.endpoints)
+        return "Не удалось подключиться к Ollama. Убедитесь, что сервис Ollama запущен и доступен по адресу " + hosts
+    
+    def _schedule_vector_sync(self):
+        """Пересчитывает эмбеддинги изменившихся записей в фоне"""
+        if self.vectors is None or (self._vector_task and not self._vector_task.done()):
+            return
+        self.retrieval.refresh()
+        generation = self.retrieval.generation
+        if generation == self.vectors.synced_generation:
+            return
+        self._vector_task = asyncio.create_task(self._sync_vectors(self.retrieval.documents(), generation))
+    
+    async def _sync_vectors(self, documents, generation: int):
         try:
-            infrastructure_files = self.data_manager.list_files("infrastructure")
-            for name in infrastructure_files:
-                infra = self.data_manager.load_infrastructure(name)
-                if infra:
-                    all_data["infrastructure"].append({
-                        "type": "infrastructure",
-                        "name": name,
-                        "data": infra
-                    })
+            await self.vectors.sync(documents, generation)
         except Exception as e:
-            print(f"Ошибка загрузки инфраструктуры: {e}")
+            print(f"Ошибка обновления векторного индекса: {e}")
+    
+    async def _retrieve(self, user_message: str) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Ищет данные для контекста: семантически (эмбеддинги), если индекс доступен,
+        иначе - по инвертированному индексу BM25.
+        """
+        if self.vectors is not None:
+            self._schedule_vector_sync()
+            try:
+                found = await self.vectors.search(user_message, top_k=self.rag_top_k)
+                if found:
+                    return self.retrieval.group_records([doc_id for doc_id, _ in found])
+            except Exception as e:
+                print(f"Ошибка семантического поиска, используется BM25: {e}")
+        return self.retrieval.search(user_message)
+    
+    async def _prepare(self, user_message: str, chat_history: List[Dict[str, str]] = None,
+                       summary: Optional[str] = None) -> Tuple[List[Dict[str, str]], Optional[str]]:
+        """Ищет контекст и собирает сообщения для LLM; возвращает (сообщения, ключ кэша ответов)"""
+        # Ищем релевантные данные в постоянных индексах (без загрузки всех данных)
+        relevant_data = await self._retrieve(user_message)
         
-        # Загружаем АС/ФП
-        try:
-            as_fp_files = self.data_manager.list_files("as_fp")
-            for name in as_fp_files:
-                as_fp = self.data_manager.load_as_fp_data(name)
-                if as_fp:
-                    all_data["as_fp"].append({
-                        "type": "as_fp",
-                        "name": name,
-                        "data": as_fp
-                    })
-        except Exception as e:
-            print(f"Ошибка загрузки АС/ФП: {e}")
+        # Контекст и история укладываются в бюджет токенов
+        messages, context = self.prompt_builder.build(user_message, relevant_data, chat_history, summary)
+        metrics.set_gauge("llm_prompt_tokens", sum(estimate_tokens(m["content"]) for m in messages))
         
-        # Загружаем настройки
+        # История и краткое содержание, попавшие в промпт (между системным сообщением и вопросом), входят в ключ
+        cache_key = None
+        if self.cache is not None:
+            cache_key = self.cache.make_key(self.model_name, user_message, context, messages[1:-1])
+        return messages, cache_key
+    
+    def _get_cached(self, cache_key: Optional[str], started: float) -> Optional[str]:
+        """Ответ из кэша (с учетом метрик попаданий/промахов)"""
+        if cache_key is None:
+            return None
+        cached = self.cache.get(cache_key)
+        if cached is None:
+            metrics.inc("llm_cache_misses")
+            return None
+        metrics.inc("llm_cache_hits")
+        metrics.observe("llm_cache_hit_seconds", time.perf_counter() - started)
+        return cached
+    
+    def schedule_summary(self, username: str):
+        """Обновляет краткое содержание старых сообщений пользователя в фоне"""
+        task = self._summary_tasks.get(username)
+        if task and not task.done():
+            return
+        self._summary_tasks[username] = asyncio.create_task(self._update_summary(username))
+    
+    async def _update_summary(self, username: str):
+        """
+        Дописывает в краткое содержание сообщения, вышедшие за окно последних
+        history_messages. Модель вызывается, когда таких сообщений набралось
+        не меньше summary_batch.
+        """
+        started = time.perf_counter()
         try:
-            settings_files = self.data_manager.list_files("settings")
-            for name in settings_files:
-                settings = self.data_manager.load_settings(name)
-                if settings:
-                    all_data["settings"].append({
-                        "type": "settings",
-                        "name": name,
-                        "data": settings
-                    })
+            stored = self.data_manager.load_chat_summary(username) or {}
+            recent = self.data_manager.load_recent_chat_messages(username, self.history_messages + self.summary_batch * 4)
+            older = recent[:-self.history_messages] if self.history_messages else recent
+            until = stored.get("until", "")
+            pending = [m for m in older if m.get("timestamp", "") > until]
+            # Не загружаем модель ради краткого содержания - обновим после прогрева
+            if len(pending) < self.summary_batch or not self.lifecycle.ready:
+                return
+            
+            dialog = "\n".join(
+                f"{m.get('role', 'user')}: {truncate_to_tokens(m.get('content', ''), 150)}"
+                for m in pending
+            )
+            prompt = f"""Предыдущее краткое содержание разговора:
+{stored.get("summary") or "(нет)"}
+
+Новые сообщения:
+{dialog}
+
+Составь обновленное краткое содержание всего разговора (не более 5 предложений): темы, факты и договоренности, важные для продолжения."""
+            async with self.scheduler.slot(f"summary:{username}", wait=False):
+                async with self._chat_request([{"role": "user", "content": prompt}], stream=False) as (_, response):
+                    await response.aread()
+            if response.status_code != 200:
+                return
+            summary = response.json().get("message", {}).get("content", "").strip()
+            if summary:
+                self.data_manager.save_chat_summary(username, {
+                    "summary": summary,
+                    "until": pending[-1].get("timestamp", ""),
+                })
+                metrics.observe("llm_summary_seconds", time.perf_counter() - started)
+        except SchedulerRejected:
+            # Очередь занята ответами пользователям - обновим при следующем сообщении
+            pass
         except Exception as e:
-            print(f"Ошибка загрузки настроек: {e}")
-        
-        return all_data
+            print(f"Ошибка обновления краткого содержания чата: {e}")
+        finally:
+            self._summary_tasks.pop(username, None)
     
-    def _format_context(self, data: Dict[str, List[Dict[str, Any]]]) -> str:
-        """Форматирует данные в текстовый контекст для LLM"""
-        context_parts = []
-        
-        if data.get("news"):
-            context_parts.append("=== НОВОСТИ ===")
-            for news in data["news"][:10]:  # Ограничиваем количество
-                context_parts.append(f"Заголовок: {news.get('title', '')}")
-                content = news.get('content', '')
-                # Обрезаем длинный контент
-                if len(content) > 500:
-                    content = content[:500] + "..."
-                context_parts.append(f"Содержание: {content}")
-                context_parts.append(f"Метка: {news.get('label', '')}")
-                context_parts.append("")
-        
-        if data.get("problems"):
-            context_parts.append("=== ПРОБЛЕМЫ ===")
-            for problem in data["problems"][:10]:
-                problem_data = problem.get("data", {})
-                problem_str = json.dumps(problem_data, ensure_ascii=False, indent=2)
-                if len(problem_str) > 500:
-                    problem_str = problem_str[:500] + "..."
-                context_parts.append(f"Проблема: {problem_str}")
-                context_parts.append("")
-        
-        if data.get("deployments"):
-            context_parts.append("=== ВНЕДРЕНИЯ ===")
-            for deployment in data["deployments"][:10]:
-                deployment_data = deployment.get("data", {})
-                deployment_str = json.dumps(deployment_data, ensure_ascii=False, indent=2)
-                if len(deployment_str) > 500:
-                    deployment_str = deployment_str[:500] + "..."
-                context_parts.append(f"Название: {deployment.get('name', '')}")
-                context_parts.append(f"Данные: {deployment_str}")
-                context_parts.append("")
+    async def generate_response(self, user_message: str, chat_history: List[Dict[str, str]] = None,
+                                summary: Optional[str] = None, user: str = "anonymous") -> str:
+        """
+        Генерирует ответ на вопрос пользователя с использованием контекста данных.
         
-        if data.get("infrastructure"):
-            context_parts.append("=== ИНФРАСТРУКТУРА ===")
-            for infra in data["infrastructure"][:10]:
-                infra_data = infra.get("data", {})
-                infra_str = json.dumps(infra_data, ensure_ascii=False, indent=2)
-                if len(infra_str) > 500:
-                    infra_str = infra_str[:500] + "..."
-                context_parts.append(f"Название: {infra.get('name', '')}")
-                context_parts.append(f"Данные: {infra_str}")
-                context_parts.append("")
-        
-        if data.get("as_fp"):
-            context_parts.append("=== АС/ФП ===")
-            for as_fp in data["as_fp"][:10]:
-                as_fp_data = as_fp.get("data", {})
-                as_fp_str = json.dumps(as_fp_data, ensure_ascii=False, indent=2)
-                if len(as_fp_str) > 500:
-                    as_fp_str = as_fp_str[:500] + "..."
-                context_parts.append(f"Название: {as_fp.get('name', '')}")
-                context_parts.append(f"Данные: {as_fp_str}")
-                context_parts.append("")
+        Поиск контекста (с эмбеддингом вопроса в Ollama) и запрос к модели выполняются
+        в слоте планировщика, запрос к модели - после прогрева (SchedulerRejected/ModelNotReady
+        при отказе); ошибки Ollama (недоступен, таймаут, ошибка HTTP) - LLMError.
+        """
+        started = time.perf_counter()
+        async with self.scheduler.slot(user):
+            messages, cache_key = await self._prepare(user_message, chat_history, summary)
+            cached = self._get_cached(cache_key, started)
+            if cached is not None:
+                return cached
+            
+            # Ответ из кэша доступен и до прогрева, запрос к модели - только после
+            self.lifecycle.check_ready()
+            # Отправляем запрос в Ollama через пул экземпляров
+            try:
+                async with self._chat_request(messages, stream=False) as (lease, response):
+                    await response.aread()
+            except NoBackendAvailable as e:
+                raise LLMError("Все экземпляры Ollama временно недоступны. Попробуйте позже.") from e
+            except (httpx.ConnectError, httpx.ConnectTimeout) as e:
+                raise LLMError(self._connect_error_text()) from e
+            except httpx.TimeoutException as e:
+                metrics.inc("llm_timeouts")
+                raise LLMError("Время ожидания ответа от LLM истекло. Попробуйте переформулировать вопрос или подождите немного.") from e
         
-        if not context_parts:
-            return "В системе пока нет данных для ответа на вопросы."
+        if response.status_code != 200:
+            error_text = response.text[:200] if response.text else f"HTTP {response.status_code}"
+            raise LLMError(f"Ошибка подключения к LLM (код {response.status_code}): {error_text}. Убедитесь, что Ollama запущен.")
+        content = response.json().get("message", {}).get("content", "")
+        if not content:
+            raise LLMError("Извините, не удалось получить ответ от LLM. Убедитесь, что Ollama запущен и модель загружена.")
         
-        return "\n".join(context_parts)
+        metrics.observe("llm_response_seconds", time.perf_counter() - started)
+        # Ответы резервной модели не кэшируем
+        if cache_key is not None and not lease.backend.fallback:
+            self.cache.put(cache_key, content)
+        return content
     
-    def _search_relevant_data(self, query: str, all_data: Dict[str, List[Dict[str, Any]]], limit: int = 5) -> Dict[str, List[Dict[str, Any]]]:
-        """Простой поиск релевантных данных по ключевым словам"""
-        query_lower = query.lower()
-        relevant_data = {
-            "news": [],
-            "problems": [],
-            "deployments": [],
-            "infrastructure": [],
-            "as_fp": [],
-            "settings": []
-        }
-        
-        # Поиск в новостях
-        for news in all_data.get("news", []):
-            title = news.get("title", "").lower()
-            content = news.get("content", "").lower()
-            if any(word in title or word in content for word in query_lower.split()):
-                relevant_data["news"].append(news)
-                if len(relevant_data["news"]) >= limit:
-                    break
-        
-        # Поиск в проблемах
-        for problem in all_data.get("problems", []):
-            problem_str = json.dumps(problem.get("data", {}), ensure_ascii=False).lower()
-            if any(word in problem_str for word in query_lower.split()):
-                relevant_data["problems"].append(problem)
-                if len(relevant_data["problems"]) >= limit:
-                    break
+    async def stream_response(self, user_message: str, chat_history: List[Dict[str, str]] = None,
+                              summary: Optional[str] = None) -> AsyncIterator[Dict[str, str]]:
+        """
+        Потоковая генерация ответа: отдает фрагменты по мере их генерации в Ollama.
         
-        # Поиск во внедрениях
-        for deployment in all_data.get("deployments", []):
-            deployment_str = json.dumps(deployment.get("data", {}), ensure_ascii=False).lower()
-            name = deployment.get("name", "").lower()
-            if any(word in name or word in deployment_str for word in query_lower.split()):
-                relevant_data["deployments"].append(deployment)
-                if len(relevant_data["deployments"]) >= limit:
-                    break
-        
-        # Поиск в инфраструктуре
-        for infra in all_data.get("infrastructure", []):
-            infra_str = json.dumps(infra.get("data", {}), ensure_ascii=False).lower()
-            name = infra.get("name", "").lower()
-            if any(word in name or word in infra_str for word in query_lower.split()):
-                relevant_data["infrastructure"].append(infra)
-                if len(relevant_data["infrastructure"]) >= limit:
-                    break
-        
-        # Поиск в АС/ФП
-        for as_fp in all_data.get("as_fp", []):
-            as_fp_str = json.dumps(as_fp.get("data", {}), ensure_ascii=False).lower()
-            name = as_fp.get("name", "").lower()
-            if any(word in name or word in as_fp_str for word in query_lower.split()):
-                relevant_data["as_fp"].append(as_fp)
-                if len(relevant_data["as_fp"]) >= limit:
-                    break
-        
-        return relevant_data
-    
-    async def generate_response(self, user_message: str, chat_history: List[Dict[str, str]] = None) -> str:
-        """Генерирует ответ на вопрос пользователя с использованием контекста данных"""
+        События: {"type": "token", "content": ...} для каждого фрагмента
+        и {"type": "error", "content": ...} при ошибке.
+        Время до первого фрагмента пишется в метрику llm_time_to_first_token_seconds.
+        """
+        started = time.perf_counter()
+        first_token = True
         try:
-            # Проверяем модель при первом использовании
-            self._ensure_model_loaded()
-            
-            # Загружаем все данные
-            all_data = self._load_all_data()
-            
-            # Ищем релевантные данные
-            relevant_data = self._search_relevant_data(user_message, all_data)
-            
-            # Форматируем контекст
-            context = self._format_context(relevant_data)
-            
-            # Формируем промпт
-            system_prompt = """Ты - помощник DevOps специалиста. Ты помогаешь отвечать на вопросы по данным системы DevOps Portal.
-Используй предоставленный контекст для ответа на вопросы. Если в контексте нет информации для ответа, скажи об этом честно.
-Отвечай на русском языке, кратко и по делу."""
+            messages, cache_key = await self._prepare(user_message, chat_history, summary)
+            cached = self._get_cached(cache_key, started)
+            if cached is not None:
+                yield {"type": "token", "content": cached}
+                return
+            parts = []
             
-            user_prompt = f"""Контекст из системы DevOps Portal:
-
-{context}
-
-Вопрос пользователя: {user_message}
-
-Ответь на вопрос пользователя, используя информацию из контекста. Если в контексте нет нужной информации, скажи об этом."""
-            
-            # Формируем историю сообщений
-            messages = [
-                {"role": "system", "content": system_prompt}
-            ]
-            
-            # Добавляем историю чата
-            if chat_history:
-                for msg in chat_history[-5:]:  # Берем последние 5 сообщений
-                    messages.append({
-                        "role": msg.get("role", "user"),
-                        "content": msg.get("content", "")
-                    })
-            
-            # Добавляем текущий вопрос
-            messages.append({"role": "user", "content": user_prompt})
-            
-            # Отправляем запрос в Ollama
-            async with httpx.AsyncClient(timeout=60.0) as client:
-                try:
-                    response = await client.post(
-                        f"{self.ollama_host}/api/chat",
-                        json={
-                            "model": self.model_name,
-                            "messages": messages,
-                            "stream": False
-                        }
-                    )
-                    
-                    if response.status_code == 200:
-                        result = response.json()
-                        content = result.get("message", {}).get("content", "")
-                        if content:
-                            return content
-                        else:
-                            return "Извините, не удалось получить ответ от LLM. Убедитесь, что Ollama запущен и модель загружена."
-                    else:
-                        error_text = response.text[:200] if response.text else f"HTTP {response.status_code}"
-                        return f"Ошибка подключения к LLM (код {response.status_code}): {error_text}. Убедитесь, что Ollama запущен."
-                except httpx.ConnectError:
-                    return "Не удалось подключиться к Ollama. Убедитесь, что сервис Ollama запущен и доступен по адресу " + self.ollama_host
-                except httpx.TimeoutException:
-                    return "Время ожидания ответа от LLM истекло. Попробуйте переформулировать вопрос или подождите немного."
+            # Таймаут на чтение - между фрагментами, а не на весь ответ
+            async with self._chat_request(messages, stream=True) as (lease, response):
+                if response.status_code != 200:
+                    error_text = (await response.aread()).decode("utf-8", "replace")[:200]
+                    yield {
+                        "type": "error",
+                        "content": f"Ошибка подключения к LLM (код {response.status_code}): {error_text}. Убедитесь, что Ollama запущен."
+                    }
+                    return
+                
+                # Ollama отдает NDJSON: одна JSON-строка на фрагмент
+                async for line in response.aiter_lines():
+                    if not line.strip():
+                        continue
+                    chunk = json.loads(line)
+                    if chunk.get("error"):
+                        yield {"type": "error", "content": f"Ошибка LLM: {chunk['error']}"}
+                        return
+                    content = chunk.get("message", {}).get("content", "")
+                    if content:
+                        if first_token:
+                            metrics.observe("llm_time_to_first_token_seconds", time.perf_counter() - started)
+                            first_token = False
+                        parts.append(content)
+                        yield {"type": "token", "content": content}
+                    if chunk.get("done"):
+                        # Кэшируем только полностью полученный ответ основной модели
+                        if cache_key is not None and parts and not lease.backend.fallback:
+                            self.cache.put(cache_key, "".join(parts))
+                        break
         
+            metrics.observe("llm_stream_seconds", time.perf_counter() - started)
+        except NoBackendAvailable:
+            yield {"type": "error", "content": "Все экземпляры Ollama временно недоступны. Попробуйте позже."}
+        except (httpx.ConnectError, httpx.ConnectTimeout):
+            yield {"type": "error", "content": self._connect_error_text()}
         except httpx.TimeoutException:
-            return "Извините, время ожидания ответа истекло. Попробуйте переформулировать вопрос."
+            yield {
+                "type": "error",
+                "content": "Время ожидания ответа от LLM истекло. Попробуйте переформулировать вопрос или подождите немного."
+            }
         except Exception as e:
-            print(f"Ошибка генерации ответа: {e}")
-            return f"Произошла ошибка при генерации ответа: {str(e)}"
+            print(f"Ошибка потоковой генерации ответа: {e}")
+            yield {"type": "error", "content": f"Произошла ошибка при генерации ответа: {str(e)}"}
 
@@ -0,0 +1,67 @@
+import threading
+from collections import deque
+from typing import Any, Deque, Dict
+
+
+class Metrics:
+    """
+    Простой реестр метрик процесса: счетчики, текущие значения и
+    распределения длительностей (по последним window наблюдениям).
+    """
+
+    def __init__(self, window: int = 1000):
+        self.window = window
+        self._lock = threading.Lock()
+        self._counters: Dict[str, float] = {}
+        self._gauges: Dict[str, float] = {}
+        self._timings: Dict[str, Deque[float]] = {}
+        self._timing_totals: Dict[str, int] = {}
+
+    def inc(self, name: str, value: float = 1):
+        """Увеличивает счетчик"""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def set_gauge(self, name: str, value: float):
+        """Устанавливает текущее значение"""
+        with self._lock:
+            self._gauges[name] = value
+
+    def observe(self, name: str, seconds: float):
+        """Добавляет наблюдение длительности (в секундах)"""
+        with self._lock:
+            values = self._timings.get(name)
+            if values is None:
+                values = self._timings[name] = deque(maxlen=self.window)
+            values.append(seconds)
+            self._timing_totals[name] = self._timing_totals.get(name, 0) + 1
+
+    @staticmethod
+    def _percentile(sorted_values, fraction: float) -> float:
+        index = min(int(len(sorted_values) * fraction), len(sorted_values) - 1)
+        return sorted_values[index]
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Текущее состояние всех метрик"""
+        with self._lock:
+            timings = {}
+            for name, values in self._timings.items():
+                if not values:
+                    continue
+                ordered = sorted(values)
+                timings[name] = {
+                    "count": self._timing_totals[name],
+                    "avg": sum(ordered) / len(ordered),
+                    "p50": self._percentile(ordered, 0.5),
+                    "p95": self._percentile(ordered, 0.95),
+                    "max": ordered[-1],
+                }
+            return {
+                "counters": dict(self._counters),
+                "gauges": dict(self._gauges),
+                "timings": timings,
+            }
+
+
+# Общий реестр метрик приложения
+metrics = Metrics()
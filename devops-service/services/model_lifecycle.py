@@ -0,0 +1,201 @@
+import asyncio
+import os
+import time
+from typing import Dict, List, Optional, Union
+import httpx
+from services.llm_backends import Backend, BackendPool
+from services.llm_scheduler import SchedulerRejected
+from services.metrics import metrics
+
+# Состояния модели на бэкенде
+COLD = "cold"
+PULLING = "pulling"
+LOADING = "loading"
+READY = "ready"
+ERROR = "error"
+
+
+class ModelNotReady(SchedulerRejected):
+    """Модель еще загружается (или Ollama недоступен) - чат временно закрыт"""
+
+    def __init__(self, detail: str, retry_after: int):
+        super().__init__(503, detail, retry_after)
+
+
+def parse_keep_alive(value: str) -> Union[str, int]:
+    """keep_alive для Ollama: длительность ("30m") или число секунд (-1 - не выгружать)"""
+    try:
+        return int(value)
+    except ValueError:
+        return value
+
+
+class ModelLifecycle:
+    """
+    Жизненный цикл моделей на экземплярах Ollama.
+
+    При запуске приложения в фоне загружает отсутствующие модели (/api/pull)
+    и поднимает их в память пустым запросом к /api/generate. Затем раз в
+    interval секунд проверяет /api/ps и снова прогревает выгруженные модели.
+    Бэкенд получает запросы чата, только когда его модель прогрета.
+    """
+
+    def __init__(self, pool: BackendPool, keep_alive: Union[str, int] = "30m", interval: float = 60.0):
+        self.pool = pool
+        self.keep_alive = keep_alive
+        self.interval = interval
+        self.states: Dict[str, str] = {backend.name: COLD for backend in pool.backends}
+        self.errors: Dict[str, str] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    @classmethod
+    def from_env(cls, pool: BackendPool) -> "ModelLifecycle":
+        return cls(
+            pool,
+            keep_alive=parse_keep_alive(os.getenv("OLLAMA_KEEP_ALIVE", "30m")),
+            interval=float(os.getenv("OLLAMA_WARM_INTERVAL", "60"))
+        )
+
+    def _set_state(self, backend: Backend, state: str, error: str = ""):
+        self.states[backend.name] = state
+        backend.warm = state == READY
+        metrics.set_gauge(f"llm_backend_warm:{backend.name}", 1 if backend.warm else 0)
+        if error:
+            self.errors[backend.name] = error
+        else:
+            self.errors.pop(backend.name, None)
+
+    async def _pull(self, backend: Backend):
+        self._set_state(backend, PULLING)
+        print(f"Модель {backend.model} не найдена на {backend.endpoint.url}. Загружаю...")
+        response = await backend.client.post(
+            "/api/pull",
+            json={"name": backend.model, "stream": False},
+            # Загрузка может занять много времени, ограничиваем только подключение
+            timeout=httpx.Timeout(None, connect=10.0)
+        )
+        response.raise_for_status()
+        print(f"Модель {backend.model} успешно загружена на {backend.endpoint.url}")
+        await backend.endpoint.probe()
+
+    async def _preload(self, backend: Backend):
+        """Поднимает модель в память: запрос без промпта только загружает модель"""
+        response = await backend.client.post(
+            "/api/generate",
+            json={"model": backend.model, "keep_alive": self.keep_alive},
+            timeout=httpx.Timeout(None, connect=10.0)
+        )
+        response.raise_for_status()
+
+    async def warm(self, backend: Backend):
+        """Загружает (при необходимости) и прогревает модель на бэкенде"""
+        started = time.perf_counter()
+        try:
+            if not await backend.endpoint.probe():
+                self._set_state(backend, ERROR, "Ollama недоступен")
+                return
+            if not backend.endpoint.has_model(backend.model):
+                await self._pull(backend)
+            self._set_state(backend, LOADING)
+            await self._preload(backend)
+            self._set_state(backend, READY)
+            metrics.observe("llm_warmup_seconds", time.perf_counter() - started)
+        except Exception as e:
+            print(f"Ошибка прогрева модели {backend.name}: {e}")
+            self._set_state(backend, ERROR, str(e))
+
+    async def _loaded_models(self, backend: Backend) -> Optional[List[str]]:
+        """Модели в памяти экземпляра (/api/ps) или None, если экземпляр не ответил"""
+        try:
+            response = await backend.client.get("/api/ps", timeout=5.0)
+            response.raise_for_status()
+            return [m.get("name", "") for m in response.json().get("models", [])]
+        except Exception:
+            return None
+
+    async def _rewarm(self, backend: Backend):
+        """Прогревает модель снова, если Ollama ее выгрузил или бэкенд был недоступен"""
+        if self.states.get(backend.name) != READY:
+            await self.warm(backend)
+            return
+        loaded = await self._loaded_models(backend)
+        if loaded is None:
+            self._set_state(backend, ERROR, "Ollama недоступен")
+        elif backend.model not in loaded and f"{backend.model}:latest" not in loaded:
+            # Модель выгружена по keep_alive - поднимаем ее в фоне, бэкенд остается в работе
+            try:
+                await self._preload(backend)
+                metrics.inc("llm_model_rewarms")
+            except Exception as e:
+                print(f"Ошибка прогрева модели {backend.name}: {e}")
+
+    async def _run(self):
+        await asyncio.gather(*(self.warm(backend) for backend in self.pool.backends))
+        while self.interval > 0:
+            await asyncio.sleep(self.interval)
+            await asyncio.gather(*(self._rewarm(backend) for backend in self.pool.backends))
+
+    def start(self):
+        """Запускает прогрев и фоновое поддержание моделей"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+
+    @property
+    def ready(self) -> bool:
+        """Хотя бы одна модель прогрета и может принимать запросы"""
+        return any(state == READY for state in self.states.values())
+
+    @property
+    def warming(self) -> bool:
+        return any(state in (COLD, PULLING, LOADING) for state in self.states.values())
+
+    async def wait_ready(self, timeout: float = 60.0) -> bool:
+        """Ждет прогрева хотя бы одной модели (для скриптов и бенчмарков)"""
+        self.start()
+        deadline = time.monotonic() + timeout
+        while not self.ready and self.warming and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        return self.ready
+
+    def check_ready(self):
+        """Пропускает запрос чата, только если модель прогрета (иначе ModelNotReady)"""
+        if self._task is None or (self._task.done() and not self.ready):
+            # Первый запрос до startup() или повтор после неудачного прогрева
+            self.start()
+        if self.ready:
+            return
+        metrics.inc("llm_rejected_not_ready")
+        if self.warming:
+            raise ModelNotReady("Модель ИИ загружается, попробуйте через несколько секунд", 5)
+        raise ModelNotReady("Сервис ИИ недоступен, попробуйте позже", max(int(self.interval), 5))
+
+    def status(self) -> Dict[str, object]:
+        """Состояние для эндпоинтов /health и /health/details"""
+        if self.ready:
+            status = "ok"
+        elif self.warming:
+            status = "warming"
+        else:
+            status = "unavailable"
+        return {
+            "status": status,
+            "keep_alive": self.keep_alive,
+            "backends": [
+                {
+                    "url": backend.endpoint.url,
+                    "model": backend.model,
+                    "fallback": backend.fallback,
+                    "state": self.states.get(backend.name, COLD),
+                    "error": self.errors.get(backend.name),
+                }
+                for backend in self.pool.backends
+            ],
+        }
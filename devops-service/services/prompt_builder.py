@@ -0,0 +1,153 @@
+import json
+import math
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+_CYRILLIC_RE = re.compile(r"[а-яёА-ЯЁ]")
+
+SYSTEM_PROMPT = """Ты - помощник DevOps специалиста. Ты помогаешь отвечать на вопросы по данным системы DevOps Portal.
+Используй предоставленный контекст для ответа на вопросы. Если в контексте нет информации для ответа, скажи об этом честно.
+Отвечай на русском языке, кратко и по делу."""
+
+USER_PROMPT = """Контекст из системы DevOps Portal:
+
+{context}
+
+Вопрос пользователя: {question}
+
+Ответь на вопрос пользователя, используя информацию из контекста. Если в контексте нет нужной информации, скажи об этом."""
+
+NO_DATA_CONTEXT = "В системе пока нет данных для ответа на вопросы."
+
+# Разделы контекста в порядке вывода: тип данных -> заголовок
+SECTIONS = (
+    ("news", "=== НОВОСТИ ==="),
+    ("problems", "=== ПРОБЛЕМЫ ==="),
+    ("deployments", "=== ВНЕДРЕНИЯ ==="),
+    ("infrastructure", "=== ИНФРАСТРУКТУРА ==="),
+    ("as_fp", "=== АС/ФП ==="),
+    ("settings", "=== НАСТРОЙКИ ==="),
+)
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Приблизительное число токенов: около 4 символов на токен для латиницы
+    и около 2.5 для кириллицы (типично для BPE-токенизаторов моделей Ollama).
+    """
+    if not text:
+        return 0
+    cyrillic = len(_CYRILLIC_RE.findall(text))
+    return math.ceil(cyrillic / 2.5 + (len(text) - cyrillic) / 4)
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Обрезает текст примерно до max_tokens токенов"""
+    if max_tokens <= 0:
+        return ""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    # Подбираем длину по средней "плотности" текста и добиваем по одному шагу
+    length = int(len(text) * max_tokens / estimate_tokens(text))
+    while length > 0 and estimate_tokens(text[:length]) + 1 > max_tokens:
+        length -= max(length // 20, 1)
+    return text[:length].rstrip() + "…"
+
+
+def compact_json(data: Any) -> str:
+    """JSON без отступов и лишних пробелов"""
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+def format_record(record: Dict[str, Any]) -> str:
+    """Одна строка контекста для записи"""
+    if record.get("type") == "news":
+        label = f" [{record['label']}]" if record.get("label") else ""
+        return f"- {record.get('title', '')}{label}: {record.get('content', '')}"
+    if record.get("name"):
+        return f"- {record['name']}: {compact_json(record.get('data', {}))}"
+    return f"- {compact_json(record.get('data', {}))}"
+
+
+class PromptBuilder:
+    """
+    Сборка сообщений для LLM в пределах бюджета токенов.
+
+    Из max_tokens вычитаются системный промпт и вопрос; история (вместе с
+    кратким содержанием старых сообщений) получает не более history_tokens,
+    остаток - контекст из данных портала. Записи контекста сериализуются
+    компактно и обрезаются до record_tokens; выбираются по очереди из
+    каждого раздела по убыванию релевантности, пока есть бюджет.
+    """
+
+    def __init__(self, max_tokens: int = 1536, history_tokens: int = 384, record_tokens: int = 200):
+        self.max_tokens = max_tokens
+        self.history_tokens = history_tokens
+        self.record_tokens = record_tokens
+
+    def format_context(self, relevant_data: Dict[str, List[Dict[str, Any]]], budget: int) -> str:
+        """Текстовый контекст из найденных записей, не длиннее budget токенов"""
+        selected: Dict[str, List[str]] = {section: [] for section, _ in SECTIONS}
+        used = 0
+        depth = max((len(relevant_data.get(section, [])) for section, _ in SECTIONS), default=0)
+        for rank in range(depth):
+            for section, title in SECTIONS:
+                records = relevant_data.get(section, [])
+                if rank >= len(records):
+                    continue
+                line = truncate_to_tokens(format_record(records[rank]), self.record_tokens)
+                # Заголовок раздела учитываем при первой записи в нем
+                cost = estimate_tokens(line) + (0 if selected[section] else estimate_tokens(title))
+                if used + cost > budget:
+                    continue
+                selected[section].append(line)
+                used += cost
+
+        parts = []
+        for section, title in SECTIONS:
+            if selected[section]:
+                parts.append(title)
+                parts.extend(selected[section])
+        return "\n".join(parts) if parts else NO_DATA_CONTEXT
+
+    def fit_history(self, question: str, chat_history: Optional[List[Dict[str, str]]],
+                    summary: Optional[str]) -> List[Dict[str, str]]:
+        """Последние сообщения истории и краткое содержание старых в пределах history_tokens"""
+        history = list(chat_history or [])
+        # Текущий вопрос уже сохранен в историю - он будет добавлен отдельно, с контекстом
+        if history and history[-1].get("role") == "user" and history[-1].get("content") == question:
+            history.pop()
+
+        budget = self.history_tokens
+        summary_message = []
+        if summary:
+            content = "Краткое содержание предыдущего разговора: " + truncate_to_tokens(summary, budget // 2)
+            summary_message.append({"role": "system", "content": content})
+            budget -= estimate_tokens(content)
+
+        fitted = []
+        for message in reversed(history):
+            content = message.get("content", "")
+            cost = estimate_tokens(content)
+            if cost > budget:
+                # Последнее сообщение обрезаем, более старые отбрасываем
+                if not fitted and budget > 0:
+                    fitted.append({"role": message.get("role", "user"), "content": truncate_to_tokens(content, budget)})
+                break
+            fitted.append({"role": message.get("role", "user"), "content": content})
+            budget -= cost
+        return summary_message + list(reversed(fitted))
+
+    def build(self, question: str, relevant_data: Dict[str, List[Dict[str, Any]]],
+              chat_history: Optional[List[Dict[str, str]]] = None,
+              summary: Optional[str] = None) -> Tuple[List[Dict[str, str]], str]:
+        """Возвращает (сообщения для /api/chat, текст контекста)"""
+        history = self.fit_history(question, chat_history, summary)
+        fixed = estimate_tokens(SYSTEM_PROMPT) + estimate_tokens(USER_PROMPT.format(context="", question=question))
+        history_used = sum(estimate_tokens(message["content"]) for message in history)
+        context = self.format_context(relevant_data, self.max_tokens - fixed - history_used)
+
+        messages = [{"role": "system", "content": SYSTEM_PROMPT}]
+        messages.extend(history)
+        messages.append({"role": "user", "content": USER_PROMPT.format(context=context, question=question)})
+        return messages, context
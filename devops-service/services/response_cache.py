@@ -0,0 +1,186 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+from data import events
+from data.atomic import atomic_write_text
+
+_SPACES_RE = re.compile(r"\s+")
+_TRAILING_PUNCT_RE = re.compile(r"[\s?!.…,;:]+$")
+
+
+def normalize_question(question: str) -> str:
+    """Нормализует вопрос: регистр, ё/е, пробелы и знаки препинания в конце"""
+    question = question.lower().replace("ё", "е")
+    question = _SPACES_RE.sub(" ", question).strip()
+    return _TRAILING_PUNCT_RE.sub("", question)
+
+
+class ResponseCache:
+    """
+    Кэш ответов LLM.
+
+    Ключ - нормализованный вопрос, отпечаток найденного контекста, отпечаток
+    истории диалога и краткого содержания, попавших в промпт, и имя модели:
+    уточняющий вопрос ("а подробнее?") в другом разговоре - другой ключ.
+    В памяти - LRU на max_entries записей с TTL; записи из памяти сбрасываются
+    при изменении коллекций, из которых берется контекст (sources; запись
+    истории чата кэш не сбрасывает). Опционально второй
+    уровень на диске (disk_dir): ключ содержит отпечаток контекста, поэтому
+    ответ с диска используется, только если найденные данные не изменились.
+    """
+
+    # Как часто (в записях) проверять размер дискового уровня
+    DISK_PRUNE_EVERY = 50
+
+    def __init__(self, max_entries: int = 256, ttl: float = 3600, disk_dir: Optional[str] = None,
+                 disk_max_entries: int = 5000, sources: Iterable[str] = ()):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        self.disk_max_entries = disk_max_entries
+        if self.disk_dir:
+            self.disk_dir.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        # ключ -> (ответ, время истечения)
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._disk_puts = 0
+        self.sources = frozenset(sources)
+        # Выставляется подписчиком событий (из пути записи), сбрасывается в _check_data_version
+        self._stale = False
+        events.subscribe(self._on_change)
+
+    def close(self):
+        """Отписывается от изменений данных"""
+        events.unsubscribe(self._on_change)
+
+    def _on_change(self, collection: Optional[str], name: Optional[str]):
+        if collection in self.sources:
+            self._stale = True
+
+    @staticmethod
+    def make_key(model: str, question: str, context: str,
+                 history: Sequence[Dict[str, str]] = ()) -> str:
+        context_fingerprint = hashlib.sha256(context.encode("utf-8")).hexdigest()
+        history_fingerprint = hashlib.sha256(
+            json.dumps(list(history), ensure_ascii=False, sort_keys=True).encode("utf-8")
+        ).hexdigest()
+        raw = f"{model}\0{normalize_question(question)}\0{context_fingerprint}\0{history_fingerprint}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _check_data_version(self):
+        """Сбрасывает кэш в памяти, если изменились данные контекста (вызывается под блокировкой)"""
+        # Изменения из других процессов (общий журнал событий)
+        events.poll()
+        if self._stale:
+            self._stale = False
+            self._entries.clear()
+
+    def _disk_path(self, key: str) -> Path:
+        return self.disk_dir / f"{key}.json"
+
+    def _get_disk(self, key: str) -> Optional[Tuple[str, float]]:
+        path = self._disk_path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if entry.get("expires_at", 0) < time.time():
+            try:
+                path.unlink()
+            except OSError:
+                pass
+            return None
+        answer = entry.get("answer")
+        return (answer, entry["expires_at"]) if answer is not None else None
+
+    def _put_disk(self, key: str, answer: str, expires_at: float):
+        # Блокировка записи не нужна: одинаковый ключ - одинаковый ответ, замена атомарна
+        try:
+            text = json.dumps({"answer": answer, "expires_at": expires_at}, ensure_ascii=False)
+            atomic_write_text(str(self._disk_path(key)), text, fsync_dir=False)
+        except Exception as e:
+            print(f"Ошибка записи кэша ответов: {e}")
+            return
+        self._disk_puts += 1
+        if self._disk_puts % self.DISK_PRUNE_EVERY == 0:
+            self._prune_disk()
+
+    def _prune_disk(self):
+        """Удаляет самые старые записи дискового уровня сверх disk_max_entries"""
+        try:
+            files = sorted(self.disk_dir.glob("*.json"), key=lambda path: path.stat().st_mtime)
+        except OSError:
+            return
+        for path in files[:max(len(files) - self.disk_max_entries, 0)]:
+            try:
+                path.unlink()
+            except OSError:
+                pass
+
+    def get(self, key: str) -> Optional[str]:
+        """Ответ из кэша или None"""
+        now = time.time()
+        with self._lock:
+            self._check_data_version()
+            entry = self._entries.get(key)
+            if entry is not None:
+                answer, expires_at = entry
+                if expires_at >= now:
+                    self._entries.move_to_end(key)
+                    return answer
+                del self._entries[key]
+
+        if self.disk_dir is None:
+            return None
+        entry = self._get_disk(key)
+        if entry is None:
+            return None
+        with self._lock:
+            self._store(key, *entry)
+        return entry[0]
+
+    def _store(self, key: str, answer: str, expires_at: float):
+        self._entries[key] = (answer, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def put(self, key: str, answer: str):
+        """Сохраняет ответ"""
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._check_data_version()
+            self._store(key, answer, expires_at)
+        if self.disk_dir is not None:
+            self._put_disk(key, answer, expires_at)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def create_response_cache(sources: Iterable[str] = ()) -> Optional[ResponseCache]:
+    """
+    Кэш ответов по переменным окружения (LLM_CACHE_MAX_ENTRIES=0 отключает кэш);
+    sources - коллекции данных, из которых берется контекст
+    """
+    max_entries = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "256"))
+    if max_entries <= 0:
+        return None
+    return ResponseCache(
+        max_entries=max_entries,
+        ttl=float(os.getenv("LLM_CACHE_TTL", "3600")),
+        disk_dir=os.getenv("LLM_CACHE_DIR") or None,
+        disk_max_entries=int(os.getenv("LLM_CACHE_DISK_MAX_ENTRIES", "5000")),
+        sources=sources
+    )
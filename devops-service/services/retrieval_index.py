@@ -0,0 +1,209 @@
+import json
+import threading
+from typing import Any, Dict, List, Optional, Set, Tuple
+from data import events
+from data.data_manager import DataManager
+from data.news_manager import NewsManager
+from data.search_index import InvertedIndex
+
+# Источники данных для контекста LLM и тип записи в каждом из них
+SOURCES = {
+    "news": "news",
+    "problems": "problem",
+    "deployments": "deployment",
+    "infrastructure": "infrastructure",
+    "as_fp": "as_fp",
+    "settings": "settings",
+}
+
+
+class RetrievalIndex:
+    """
+    Постоянный (на время жизни процесса) поисковый индекс по данным портала
+    для контекста LLM.
+
+    Записи всех источников сериализуются и индексируются один раз;
+    при записи через DataManager/NewsManager (см. data.events) изменившиеся
+    записи помечаются устаревшими и переиндексируются при следующем запросе.
+    Поиск по вопросу - обращение к инвертированному индексу, без обхода корпуса.
+    """
+
+    def __init__(self, data_manager: DataManager, news_manager: NewsManager):
+        self.data_manager = data_manager
+        self.news_manager = news_manager
+        self._lock = threading.Lock()
+        # Отдельная короткая блокировка для списка устаревших записей: события
+        # публикуются из пути записи (в т.ч. под блокировкой NewsStore)
+        self._dirty_lock = threading.Lock()
+        self._index = InvertedIndex()
+        # doc_id -> запись в формате контекста LLM
+        self._records: Dict[str, Dict[str, Any]] = {}
+        # doc_id -> (заголовок, текст) в том виде, в котором запись проиндексирована
+        self._texts: Dict[str, Tuple[str, str]] = {}
+        # Счетчик изменений индекса (для производных индексов, например векторного)
+        self.generation = 0
+        # Источник -> doc_id его записей (для полной переиндексации источника)
+        self._source_docs: Dict[str, Set[str]] = {source: set() for source in SOURCES}
+        self._built = False
+        # Устаревшие записи: (источник, имя) или (источник, None) - весь источник
+        self._dirty: Set[Tuple[str, Optional[str]]] = set()
+        events.subscribe(self._on_change)
+
+    def close(self):
+        """Отписывается от изменений данных"""
+        events.unsubscribe(self._on_change)
+
+    def _on_change(self, collection: str, name: Optional[str]):
+        if collection not in SOURCES:
+            return
+        with self._dirty_lock:
+            self._dirty.add((collection, name))
+
+    @staticmethod
+    def _doc_id(source: str, key: str) -> str:
+        return f"{source}:{key}"
+
+    @staticmethod
+    def _news_record(news) -> Dict[str, Any]:
+        return {
+            "type": "news",
+            "id": news.id,
+            "title": news.title,
+            "content": news.content,
+            "label": news.label,
+            "author": news.author,
+            "created_at": str(news.created_at)
+        }
+
+    def _load_source(self, source: str) -> List[Tuple[str, Dict[str, Any]]]:
+        """Загружает все записи источника в виде (ключ, запись)"""
+        if source == "news":
+            return [(news.id, self._news_record(news)) for news in self.news_manager.store.values()]
+        if source == "problems":
+            # Проблемы хранятся списком в одном файле
+            problems = self.data_manager.load_problems_data("problems") or []
+            return [
+                (str(i), {"type": "problem", "data": problem})
+                for i, problem in enumerate(problems)
+            ]
+        return [
+            (record["name"], {"type": SOURCES[source], "name": record["name"], "data": record["data"]})
+            for record in self.data_manager.load_all(source)
+        ]
+
+    def _load_one(self, source: str, key: str) -> Optional[Dict[str, Any]]:
+        """Загружает одну запись источника"""
+        if source == "news":
+            news = self.news_manager.get_news(key)
+            return self._news_record(news) if news else None
+        data = self.data_manager.load_json(key, source)
+        if not data:
+            return None
+        return {"type": SOURCES[source], "name": key, "data": data}
+
+    @staticmethod
+    def _record_text(record: Dict[str, Any]) -> Tuple[str, str]:
+        """Заголовок и текст записи для индексации"""
+        if record["type"] == "news":
+            return record.get("title", ""), record.get("content", "")
+        return record.get("name", ""), json.dumps(record.get("data", {}), ensure_ascii=False)
+
+    def _add(self, source: str, key: str, record: Dict[str, Any]):
+        doc_id = self._doc_id(source, key)
+        title, text = self._record_text(record)
+        self._records[doc_id] = record
+        self._texts[doc_id] = (title, text)
+        self._source_docs[source].add(doc_id)
+        self._index.add(doc_id, title, text)
+        self.generation += 1
+
+    def _remove(self, source: str, key: str):
+        doc_id = self._doc_id(source, key)
+        self._records.pop(doc_id, None)
+        self._texts.pop(doc_id, None)
+        self._source_docs[source].discard(doc_id)
+        self._index.remove(doc_id)
+        self.generation += 1
+
+    def _reindex_source(self, source: str):
+        for doc_id in list(self._source_docs[source]):
+            self._records.pop(doc_id, None)
+            self._texts.pop(doc_id, None)
+            self._index.remove(doc_id)
+        self._source_docs[source] = set()
+        self.generation += 1
+        try:
+            for key, record in self._load_source(source):
+                self._add(source, key, record)
+        except Exception as e:
+            print(f"Ошибка индексации {source}: {e}")
+
+    def _reindex_one(self, source: str, key: str):
+        # Проблемы лежат в одном файле - переиндексируем источник целиком
+        if source == "problems":
+            self._reindex_source(source)
+            return
+        record = self._load_one(source, key)
+        if record is None:
+            self._remove(source, key)
+        else:
+            self._add(source, key, record)
+
+    def _take_dirty(self) -> Set[Tuple[str, Optional[str]]]:
+        with self._dirty_lock:
+            dirty, self._dirty = self._dirty, set()
+        return dirty
+
+    def refresh(self):
+        """Строит индекс при первом обращении и переиндексирует устаревшие записи"""
+        # Изменения, сделанные другими воркерами
+        events.poll()
+        with self._lock:
+            if not self._built:
+                # Прогреваем кэш новостей, чтобы его первая загрузка не пометила новости устаревшими
+                self.news_manager.store.values()
+                self._take_dirty()
+                for source in SOURCES:
+                    self._reindex_source(source)
+                self._built = True
+                return
+
+            dirty = self._take_dirty()
+            if not dirty:
+                return
+            full_sources = {source for source, name in dirty if name is None}
+            for source in full_sources:
+                self._reindex_source(source)
+            for source, name in dirty:
+                if name is not None and source not in full_sources:
+                    self._reindex_one(source, name)
+
+    def documents(self) -> Dict[str, Tuple[str, str]]:
+        """Снимок проиндексированных текстов: doc_id -> (заголовок, текст)"""
+        self.refresh()
+        with self._lock:
+            return dict(self._texts)
+
+    def group_records(self, doc_ids: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+        """Раскладывает записи по типам данных в порядке doc_ids"""
+        relevant_data: Dict[str, List[Dict[str, Any]]] = {source: [] for source in SOURCES}
+        with self._lock:
+            for doc_id in doc_ids:
+                record = self._records.get(doc_id)
+                if record is not None:
+                    relevant_data[doc_id.split(":", 1)[0]].append(record)
+        return relevant_data
+
+    def search(self, query: str, limit: int = 5) -> Dict[str, List[Dict[str, Any]]]:
+        """Ищет релевантные записи, не более limit на каждый тип данных"""
+        self.refresh()
+        relevant_data: Dict[str, List[Dict[str, Any]]] = {source: [] for source in SOURCES}
+        with self._lock:
+            for doc_id, _ in self._index.search(query):
+                source = doc_id.split(":", 1)[0]
+                if len(relevant_data[source]) < limit:
+                    relevant_data[source].append(self._records[doc_id])
+        return relevant_data
+
+    def __len__(self) -> int:
+        return len(self._records)
@@ -0,0 +1,247 @@
+import asyncio
+import hashlib
+import multiprocessing
+import os
+import signal
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, Optional, Set
+from jinja2 import Template, TemplateError
+from jinja2.sandbox import SandboxedEnvironment
+from services.metrics import metrics
+
+try:
+    import resource
+except ImportError:  # Windows - ограничение памяти недоступно
+    resource = None
+
+
+class RenderRejected(Exception):
+    """Очередь рендеринга заполнена (HTTP 503 с Retry-After)"""
+
+    def __init__(self, detail: str, retry_after: int = 1):
+        super().__init__(detail)
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class RenderLimitExceeded(Exception):
+    """Шаблон превысил лимит процессорного времени или размера результата"""
+
+
+# --- Код процесса-воркера ---------------------------------------------------
+
+_cache: "OrderedDict[str, Template]" = OrderedDict()
+_cache_size = 128
+_cpu_seconds = 2.0
+_max_output = 1_000_000
+_env: Optional[SandboxedEnvironment] = None
+
+
+class LimitedSandbox(SandboxedEnvironment):
+    """
+    Песочница Jinja2 (без доступа к внутренностям объектов Python), которая
+    еще и не дает построить строку или список больше лимита результата
+    через "*" ("x" * 10**9).
+    """
+
+    intercepted_binops = frozenset(["*"])
+
+    def call_binop(self, context, operator, left, right):
+        if operator == "*":
+            for seq, times in ((left, right), (right, left)):
+                if isinstance(seq, (str, list, tuple)) and isinstance(times, int):
+                    if len(seq) * times > _max_output:
+                        raise RenderLimitExceeded(f"Результат больше {_max_output} символов")
+        return super().call_binop(context, operator, left, right)
+
+
+def _on_cpu_limit(signum, frame):
+    raise RenderLimitExceeded(f"Превышен лимит процессорного времени ({_cpu_seconds:g} с)")
+
+
+def _init_worker(cache_size: int, cpu_seconds: float, max_output: int, memory_mb: int):
+    """Инициализация процесса-воркера: лимиты и песочница"""
+    global _cache_size, _cpu_seconds, _max_output, _env
+    _cache_size, _cpu_seconds, _max_output = cache_size, cpu_seconds, max_output
+    _env = LimitedSandbox()
+    if hasattr(signal, "setitimer"):
+        signal.signal(signal.SIGPROF, _on_cpu_limit)
+    if resource is not None and memory_mb > 0:
+        limit = memory_mb * 1024 * 1024
+        try:
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+        except (ValueError, OSError) as e:
+            print(f"Не удалось ограничить память воркера рендеринга: {e}")
+
+
+def _compile(source: str):
+    """Скомпилированный шаблон из LRU-кэша (ключ - sha256 текста) и признак попадания"""
+    key = hashlib.sha256(source.encode("utf-8")).hexdigest()
+    template = _cache.get(key)
+    if template is not None:
+        _cache.move_to_end(key)
+        return template, True
+    template = _env.from_string(source)
+    if _cache_size > 0:
+        _cache[key] = template
+        while len(_cache) > _cache_size:
+            _cache.popitem(last=False)
+    return template, False
+
+
+def _render(source: str, variables: Dict[str, Any]) -> Dict[str, Any]:
+    """Компиляция (с кэшем) и рендеринг под лимитами; ошибки возвращаются в результате"""
+    if hasattr(signal, "setitimer"):
+        # Таймер процессорного времени процесса: бесконечный цикл в шаблоне прерывается
+        signal.setitimer(signal.ITIMER_PROF, _cpu_seconds)
+    try:
+        template, cached = _compile(source)
+        parts, size = [], 0
+        for chunk in template.generate(**variables):
+            size += len(chunk)
+            if size > _max_output:
+                raise RenderLimitExceeded(f"Результат больше {_max_output} символов")
+            parts.append(chunk)
+        return {"rendered": "".join(parts), "cached": cached}
+    except RenderLimitExceeded as e:
+        return {"error": str(e), "limit": True}
+    except MemoryError:
+        return {"error": "Превышен лимит памяти при рендеринге", "limit": True}
+    except TemplateError as e:
+        return {"error": str(e)}
+    except Exception as e:
+        return {"error": f"{type(e).__name__}: {e}"}
+    finally:
+        if hasattr(signal, "setitimer"):
+            signal.setitimer(signal.ITIMER_PROF, 0)
+
+
+# --- Код процесса приложения ------------------------------------------------
+
+class TemplateRenderer:
+    """
+    Рендеринг пользовательских Jinja2-шаблонов (/settings/render) в пуле процессов.
+
+    Каждый воркер рендерит в песочнице (SandboxedEnvironment) с лимитами
+    процессорного времени (cpu_seconds), размера результата (max_output
+    символов) и памяти (memory_mb), поэтому тяжелый шаблон не блокирует
+    цикл событий и других пользователей. Скомпилированные шаблоны хранятся
+    в LRU-кэше воркера (cache_size, ключ - sha256 текста шаблона). Ожидающих
+    рендеринга запросов не больше queue_limit, иначе RenderRejected.
+    """
+
+    def __init__(self, workers: int = 2, queue_limit: int = 16, cpu_seconds: float = 2.0,
+                 max_output: int = 1_000_000, cache_size: int = 128, memory_mb: int = 512):
+        self.workers = max(1, workers)
+        self.queue_limit = queue_limit
+        self.cpu_seconds = cpu_seconds
+        self.max_output = max_output
+        self.cache_size = cache_size
+        self.memory_mb = memory_mb
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._pending = 0
+        # Рендеринги, использующие пул, и пулы с зависшим воркером: такой пул
+        # больше не получает задач и останавливается после последнего
+        # рендеринга в нем (остальные запросы не получают BrokenProcessPool)
+        self._users: Dict[ProcessPoolExecutor, int] = {}
+        self._retired: Set[ProcessPoolExecutor] = set()
+        # Задача передается в пул, только когда есть свободный воркер, поэтому
+        # лимит времени ниже не включает ожидание в очереди
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    @classmethod
+    def from_env(cls) -> "TemplateRenderer":
+        return cls(
+            workers=int(os.getenv("RENDER_WORKERS", "2")),
+            queue_limit=int(os.getenv("RENDER_QUEUE", "16")),
+            cpu_seconds=float(os.getenv("RENDER_CPU_SECONDS", "2")),
+            max_output=int(os.getenv("RENDER_MAX_OUTPUT", "1000000")),
+            cache_size=int(os.getenv("RENDER_CACHE_SIZE", "128")),
+            memory_mb=int(os.getenv("RENDER_MEMORY_MB", "512"))
+        )
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn: воркеры не наследуют потоки и состояние процесса приложения
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self.cache_size, self.cpu_seconds, self.max_output, self.memory_mb)
+            )
+        return self._executor
+
+    def _acquire(self) -> ProcessPoolExecutor:
+        executor = self._pool()
+        self._users[executor] = self._users.get(executor, 0) + 1
+        return executor
+
+    def _release(self, executor: ProcessPoolExecutor, retire: bool = False):
+        """
+        Завершение рендеринга в пуле; retire - воркер завис или упал: пул
+        больше не используется и останавливается после последнего рендеринга в нем
+        """
+        if retire:
+            self._retired.add(executor)
+            if self._executor is executor:
+                self._executor = None
+        self._users[executor] -= 1
+        if self._users[executor] > 0:
+            return
+        del self._users[executor]
+        if executor in self._retired:
+            self._retired.discard(executor)
+            for process in list(getattr(executor, "_processes", {}).values()):
+                process.terminate()
+            executor.shutdown(wait=False)
+
+    async def render(self, source: str, variables: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Результат рендеринга: {"rendered": ...} или {"error": ..., "limit": True, если превышен лимит}.
+        RenderRejected, если очередь заполнена.
+        """
+        if self._pending >= self.queue_limit:
+            metrics.inc("render_rejected")
+            raise RenderRejected("Сервер занят рендерингом шаблонов. Попробуйте через несколько секунд")
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.workers)
+        self._pending += 1
+        metrics.set_gauge("render_pending", self._pending)
+        started = time.perf_counter()
+        try:
+            async with self._slots:
+                executor, retire = self._acquire(), False
+                try:
+                    future = asyncio.get_running_loop().run_in_executor(executor, _render, source, variables or {})
+                    # Лимит процессорного времени срабатывает внутри воркера; по общему
+                    # времени страхуемся от зависания вне интерпретатора
+                    result = await asyncio.wait_for(future, timeout=self.cpu_seconds * 2 + 5)
+                except asyncio.TimeoutError:
+                    retire = True
+                    result = {"error": "Превышено время рендеринга", "limit": True}
+                except BrokenProcessPool:
+                    # Воркер завершился аварийно (например, по лимиту памяти)
+                    retire = True
+                    result = {"error": "Рендеринг прерван: превышен лимит ресурсов", "limit": True}
+                finally:
+                    self._release(executor, retire)
+        except RenderLimitExceeded as e:
+            # Таймер сработал уже после рендеринга
+            result = {"error": str(e), "limit": True}
+        finally:
+            self._pending -= 1
+            metrics.set_gauge("render_pending", self._pending)
+            metrics.observe("render_seconds", time.perf_counter() - started)
+        if result.get("cached"):
+            metrics.inc("render_cache_hits")
+        if result.get("limit"):
+            metrics.inc("render_limit_exceeded")
+        return result
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
@@ -1,15 +1,189 @@
+import copy
+import hashlib
+import json
+import os
 import re
-import yaml
-from typing import Dict, List, Any, Optional, Tuple
-from jinja2 import Environment, TemplateSyntaxError, UndefinedError
-from jinja2.meta import find_undeclared_variables
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Any, Optional, Tuple
+from jinja2 import Environment, TemplateSyntaxError
+from jinja2.compiler import CodeGenerator
+from jinja2.nodes import Template as TemplateNode
+from services.helm_lint import HelmLinter
+from services.metrics import metrics
+from services.yaml_stream import validate_yaml_stream
+
+# Наличие Helm-директив: поиск останавливается на первой
+HELM_DIRECTIVE_RE = re.compile(r'\{\{.*?\}\}')
+
+# Действие Go-шаблона (синтаксис Helm), которое не бывает выражением Jinja2:
+# обращение к .Values/$var, комментарий, end/else, ключевое слово или функция Helm с аргументом
+GO_ACTION_RE = re.compile(
+    r'\{\{-?\s*(?:[.$]|/\*|(?:end|else)\s*-?\}\}|else\s|'
+    r'(?:if|range|with|define|template|block|include|tpl|toYaml|toJson|required|default|printf|quote|not|eq|ne)\s+[^\s}])'
+)
+GO_ACTION_SPAN_RE = re.compile(r'\{\{.*?\}\}', re.DOTALL)
+GO_ACTIONS_LINE_RE = re.compile(r'^\s*(?:\{\{.*?\}\}\s*)+$')
+GO_BLOCK_RE = re.compile(r'-?\s*(if|range|with|define|block|end)\b')
+
+
+def is_go_template(content: str) -> bool:
+    """Текст с директивами Go-шаблона (Helm), а не Jinja2"""
+    return GO_ACTION_RE.search(content) is not None
+
+
+def neutralize_go_actions(content: str) -> str:
+    """
+    Текст шаблона для проверки YAML без рендеринга: строки только из
+    действий ({{- if }}, {{ end }}, {{ include ... | nindent 4 }}) становятся
+    пустыми, остальные действия заменяются строкой "_" той же длины.
+    Номера строк и столбцы сохраняются.
+    """
+    content = GO_ACTION_SPAN_RE.sub(
+        lambda m: "\n" * m.group(0).count("\n") if "\n" in m.group(0) else m.group(0), content
+    )
+    lines = []
+    for line in content.split("\n"):
+        if GO_ACTIONS_LINE_RE.match(line):
+            lines.append("")
+        else:
+            lines.append(GO_ACTION_SPAN_RE.sub(lambda m: "_" * len(m.group(0)), line))
+    return "\n".join(lines)
+
+
+def check_go_blocks(content: str) -> List[Dict[str, Any]]:
+    """Незакрытые {{ и парность блоков if/range/with/define/block и {{ end }}"""
+    errors: List[Dict[str, Any]] = []
+    stack: List[Tuple[str, int]] = []
+    line, counted, pos = 1, 0, 0
+    while True:
+        start = content.find("{{", pos)
+        if start < 0:
+            break
+        line += content.count("\n", counted, start)
+        counted = start
+        end = content.find("}}", start + 2)
+        if end < 0:
+            errors.append({"message": "Незакрытое действие шаблона {{", "line": line, "filename": "template"})
+            break
+        pos = end + 2
+        block = GO_BLOCK_RE.match(content, start + 2, end)
+        if block is None:
+            continue
+        if block.group(1) != "end":
+            stack.append((block.group(1), line))
+        elif stack:
+            stack.pop()
+        else:
+            errors.append({"message": "Лишний {{ end }} без открытого блока", "line": line, "filename": "template"})
+    for keyword, opened in stack:
+        errors.append({
+            "message": f"Блок {{{{ {keyword} }}}} не закрыт (нет {{{{ end }}}})",
+            "line": opened,
+            "filename": "template"
+        })
+    return errors
+
+
+class TrackingCompiler(CodeGenerator):
+    """
+    Генератор кода Jinja2, который при генерации собирает необъявленные
+    переменные (как jinja2.meta.find_undeclared_variables). Заодно находит
+    ошибки, которые Jinja2 сообщает только при компиляции (неизвестный
+    фильтр или тест). Шаблон при этом не выполняется.
+    """
+
+    def __init__(self, environment: Environment):
+        super().__init__(environment, None, None)
+        self.undeclared_identifiers = set()
+
+    def enter_frame(self, frame):
+        super().enter_frame(frame)
+        for _, (action, param) in frame.symbols.loads.items():
+            if action == "resolve" and param not in self.environment.globals:
+                self.undeclared_identifiers.add(param)
+
+    @classmethod
+    def find_undeclared(cls, environment: Environment, ast: TemplateNode) -> List[str]:
+        """Отсортированный список необъявленных переменных шаблона"""
+        generator = cls(environment)
+        generator.visit(ast)
+        return sorted(generator.undeclared_identifiers)
+
+
+class ValidationCache:
+    """
+    LRU-кэш результатов валидации по хешу содержимого.
+
+    Интерфейс «Шаблонизации» проверяет шаблон на каждое изменение текста,
+    повторная проверка того же содержимого берется из кэша.
+    """
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+    @staticmethod
+    def key(*parts: Any) -> str:
+        digest = hashlib.sha256()
+        for part in parts:
+            if not isinstance(part, str):
+                part = json.dumps(part, sort_keys=True, ensure_ascii=False, default=str)
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Копия результата из кэша или None"""
+        with self._lock:
+            result = self._entries.get(key)
+            if result is None:
+                return None
+            self._entries.move_to_end(key)
+        metrics.inc("template_validate_cache_hits")
+        return copy.deepcopy(result)
+
+    def put(self, key: str, result: Dict[str, Any]):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = copy.deepcopy(result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_or_compute(self, key: str, compute: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        """Результат из кэша или compute(); возвращается копия, ее можно изменять"""
+        result = self.get(key)
+        if result is not None:
+            return result
+        started = time.perf_counter()
+        result = compute()
+        metrics.observe("template_validate_seconds", time.perf_counter() - started)
+        self.put(key, result)
+        return result
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
 
 
 class TemplateValidator:
     """Валидатор для Jinja2 и Helm шаблонов"""
     
-    def __init__(self):
+    def __init__(self, cache_size: Optional[int] = None, linter: Optional[HelmLinter] = None):
         self.jinja_env = Environment()
+        if cache_size is None:
+            cache_size = int(os.getenv("VALIDATION_CACHE_SIZE", "256"))
+        self.cache = ValidationCache(cache_size)
+        # Правила проверки Helm; дополнительные - self.linter.register(...)
+        self.linter = linter or HelmLinter.from_env()
+    
+    def file_cache_key(self, filename: str, content: str) -> str:
+        """Ключ кэша validate_file (с версией набора правил Helm)"""
+        return self.cache.key("file", self.linter.version, filename, content)
     
     def validate_jinja(self, template_content: str, context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """
@@ -22,6 +196,16 @@ class TemplateValidator:
         Returns:
             Словарь с результатами валидации
         """
+        key = self.cache.key("jinja", context, template_content)
+        return self.cache.get_or_compute(key, lambda: self._validate_jinja(template_content, context))
+    
+    def _validate_jinja(self, template_content: str, context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Валидация Jinja2 шаблона за один разбор: синтаксис и поиск переменных
+        по одному и тому же AST. Пробного рендеринга нет: проверяемый текст
+        приходит от пользователя, и его выполнение в процессе приложения (и в
+        воркерах проверки чартов) не ограничено ни песочницей, ни временем
+        """
         result = {
             "valid": True,
             "errors": [],
@@ -31,38 +215,35 @@ class TemplateValidator:
         }
         
         try:
-            # Парсим шаблон для проверки синтаксиса
-            template = self.jinja_env.parse(template_content)
+            # Единственный разбор шаблона: проверка синтаксиса
+            started = time.perf_counter()
+            ast = self.jinja_env.parse(template_content)
+            metrics.observe("template_validate_parse_seconds", time.perf_counter() - started)
             result["syntax_ok"] = True
             
-            # Находим необъявленные переменные
+            # Поиск необъявленных переменных - один проход генератора кода
             try:
-                ast = self.jinja_env.parse(template_content)
-                undeclared = find_undeclared_variables(ast)
-                result["variables"] = list(undeclared)
-                
-                # Если есть контекст, проверяем, все ли переменные определены
-                if context:
-                    missing_vars = [var for var in undeclared if var not in context]
-                    if missing_vars:
-                        result["warnings"].append(
-                            f"Переменные не определены в контексте: {', '.join(missing_vars)}"
-                        )
-                elif undeclared:
-                    result["warnings"].append(
-                        f"Найдены переменные, которые могут быть не определены: {', '.join(undeclared)}"
-                    )
+                started = time.perf_counter()
+                undeclared = TrackingCompiler.find_undeclared(self.jinja_env, ast)
+                metrics.observe("template_validate_compile_seconds", time.perf_counter() - started)
             except Exception as e:
+                # Например, неизвестный фильтр
                 result["warnings"].append(f"Не удалось проанализировать переменные: {str(e)}")
+                return result
             
-            # Пытаемся отрендерить шаблон с пустым контекстом для проверки
-            try:
-                test_template = self.jinja_env.from_string(template_content)
-                test_template.render(context or {})
-            except UndefinedError as e:
-                result["warnings"].append(f"Неопределенная переменная при рендеринге: {str(e)}")
-            except Exception as e:
-                result["warnings"].append(f"Предупреждение при рендеринге: {str(e)}")
+            result["variables"] = undeclared
+            
+            # Если есть контекст, проверяем, все ли переменные определены
+            if context:
+                missing_vars = [var for var in undeclared if var not in context]
+                if missing_vars:
+                    result["warnings"].append(
+                        f"Переменные не определены в контексте: {', '.join(missing_vars)}"
+                    )
+            elif undeclared:
+                result["warnings"].append(
+                    f"Найдены переменные, которые могут быть не определены: {', '.join(undeclared)}"
+                )
         
         except TemplateSyntaxError as e:
             result["valid"] = False
@@ -88,11 +269,23 @@ class TemplateValidator:
         
         Args:
             template_content: Содержимое Helm шаблона
-            chart_type: Тип файла (template, values, Chart.yaml)
+            chart_type: Тип файла (template, values, Chart.yaml; text - шаблон не YAML,
+                например _helpers.tpl или NOTES.txt)
         
         Returns:
             Словарь с результатами валидации
         """
+        key = self.cache.key("helm", self.linter.version, chart_type, template_content)
+        return self.cache.get_or_compute(key, lambda: self._validate_helm(template_content, chart_type))
+    
+    def _validate_helm(self, template_content: str, chart_type: str = "template") -> Dict[str, Any]:
+        """
+        Валидация Helm шаблона: YAML, затем синтаксис директив и типичные ошибки Helm.
+
+        Директивы Go-шаблона (синтаксис Helm) перед проверкой YAML заменяются
+        заполнителями, а вместо разбора Jinja2 проверяется парность блоков;
+        шаблоны с выражениями Jinja2 разбираются Jinja2, как раньше
+        """
         result = {
             "valid": True,
             "errors": [],
@@ -102,35 +295,46 @@ class TemplateValidator:
             "helm_errors": []
         }
         
-        # Проверяем, является ли файл YAML
-        try:
-            yaml_data = yaml.safe_load(template_content)
+        go_template = chart_type == "text" or is_go_template(template_content)
+        result["go_template"] = go_template
+        
+        # Проверяем, является ли файл YAML (все документы, ошибки со строкой и столбцом)
+        if chart_type != "text":
+            started = time.perf_counter()
+            yaml_source = neutralize_go_actions(template_content) if go_template else template_content
+            yaml_result = validate_yaml_stream(yaml_source, keep_first=chart_type == "Chart.yaml")
+            metrics.observe("template_validate_yaml_seconds", time.perf_counter() - started)
+            if not yaml_result["valid"]:
+                result["valid"] = False
+                result["errors"].extend(yaml_result["errors"])
+                if go_template:
+                    result["errors"].extend(check_go_blocks(template_content))
+                return result
             result["is_yaml"] = True
-            
-            # Для Chart.yaml проверяем обязательные поля
-            if chart_type == "Chart.yaml":
-                required_fields = ["apiVersion", "name", "version"]
-                for field in required_fields:
-                    if field not in yaml_data:
-                        result["errors"].append(f"Отсутствует обязательное поле: {field}")
-                        result["valid"] = False
-        except yaml.YAMLError as e:
-            result["valid"] = False
-            result["errors"].append({
-                "message": f"Ошибка YAML: {str(e)}",
-                "line": getattr(e, 'problem_mark', None),
-                "filename": "template"
-            })
-            return result
+            result["documents"] = yaml_result["documents"]
+        
+        # Для Chart.yaml проверяем обязательные поля
+        if chart_type == "Chart.yaml":
+            chart_data = yaml_result["first_document"]
+            required_fields = ["apiVersion", "name", "version"]
+            for field in required_fields:
+                if not isinstance(chart_data, dict) or field not in chart_data:
+                    result["errors"].append(f"Отсутствует обязательное поле: {field}")
+                    result["valid"] = False
         
         # Проверяем наличие Helm директив ({{ }})
-        helm_pattern = r'\{\{.*?\}\}'
-        helm_matches = re.findall(helm_pattern, template_content)
-        result["has_helm_directives"] = len(helm_matches) > 0
+        result["has_helm_directives"] = HELM_DIRECTIVE_RE.search(template_content) is not None
         
-        # Проверяем Jinja2 синтаксис внутри Helm директив
-        if result["has_helm_directives"]:
-            jinja_result = self.validate_jinja(template_content)
+        if go_template:
+            # Директивы Go-шаблона Jinja2 не разбирает: проверяем парность блоков
+            block_errors = check_go_blocks(template_content)
+            if block_errors:
+                result["valid"] = False
+                result["helm_errors"] = block_errors
+                result["errors"].extend(block_errors)
+        elif result["has_helm_directives"]:
+            # Проверяем Jinja2 синтаксис внутри директив
+            jinja_result = self._validate_jinja(template_content)
             if not jinja_result["valid"]:
                 result["valid"] = False
                 result["helm_errors"] = jinja_result["errors"]
@@ -138,30 +342,33 @@ class TemplateValidator:
             if jinja_result["warnings"]:
                 result["warnings"].extend(jinja_result["warnings"])
         
-        # Проверяем типичные ошибки Helm
-        # Проверка на неправильное использование .Values, .Release и т.д.
-        invalid_patterns = [
-            (r'\.Values\s*\.', "Неправильное использование .Values (должно быть .Values.field)"),
-            (r'\.Release\s*\.', "Неправильное использование .Release (должно быть .Release.field)"),
-        ]
-        
-        for pattern, message in invalid_patterns:
-            if re.search(pattern, template_content):
-                result["warnings"].append(message)
-        
-        # Проверяем правильность использования функций Helm
-        helm_functions = [
-            'include', 'required', 'tpl', 'default', 'empty', 'coalesce',
-            'toYaml', 'toJson', 'b64enc', 'b64dec', 'indent', 'nindent'
-        ]
-        
-        for func in helm_functions:
-            # Проверяем, что функции используются правильно
-            func_pattern = r'\{\{\s*' + func + r'\s*[^(]'
-            if re.search(func_pattern, template_content):
-                result["warnings"].append(
-                    f"Возможно неправильное использование функции {func} (проверьте синтаксис)"
+        # Типичные ошибки Helm: все правила за один проход по тексту
+        started = time.perf_counter()
+        findings = self.linter.lint(template_content)
+        metrics.observe("template_validate_lint_seconds", time.perf_counter() - started)
+        result["lint"] = findings
+        if len(findings) >= self.linter.max_findings:
+            result["warnings"].append(
+                f"Находок проверки Helm больше {self.linter.max_findings}: показаны первые (и первая ошибка, если есть)"
+            )
+        
+        # Одно сообщение на правило: первое место и число остальных
+        grouped: Dict[str, List[Dict[str, Any]]] = {}
+        for finding in findings:
+            grouped.setdefault(finding["message"], []).append(finding)
+        for message, same in grouped.items():
+            first = same[0]
+            if first["severity"] == "error":
+                result["valid"] = False
+                result["errors"].extend(
+                    {"message": f["message"], "line": f["line"], "column": f["column"], "filename": "template"}
+                    for f in same
                 )
+                continue
+            location = f"строка {first['line']}, столбец {first['column']}"
+            if len(same) > 1:
+                location += f"; еще {len(same) - 1}"
+            result["warnings"].append(f"{message} ({location})")
         
         return result
     
@@ -176,6 +383,10 @@ class TemplateValidator:
         Returns:
             Словарь с результатами валидации
         """
+        key = self.file_cache_key(filename, content)
+        return self.cache.get_or_compute(key, lambda: self._validate_file(filename, content))
+    
+    def _validate_file(self, filename: str, content: str) -> Dict[str, Any]:
         filename_lower = filename.lower()
         
         # Определяем тип файла
@@ -183,46 +394,43 @@ class TemplateValidator:
             if 'chart.yaml' in filename_lower or 'Chart.yaml' in filename:
                 return {
                     "type": "helm_chart",
-                    "validation": self.validate_helm(content, "Chart.yaml")
+                    "validation": self._validate_helm(content, "Chart.yaml")
                 }
             elif 'values.yaml' in filename_lower or 'values.yml' in filename:
                 return {
                     "type": "helm_values",
-                    "validation": self.validate_helm(content, "values")
+                    "validation": self._validate_helm(content, "values")
                 }
             elif any(x in filename_lower for x in ['template', 'templates']):
                 return {
                     "type": "helm_template",
-                    "validation": self.validate_helm(content, "template")
+                    "validation": self._validate_helm(content, "template")
                 }
             else:
-                # Обычный YAML
-                try:
-                    yaml.safe_load(content)
-                    return {
-                        "type": "yaml",
-                        "validation": {
-                            "valid": True,
-                            "errors": [],
-                            "warnings": [],
-                            "is_yaml": True
-                        }
-                    }
-                except yaml.YAMLError as e:
-                    return {
-                        "type": "yaml",
-                        "validation": {
-                            "valid": False,
-                            "errors": [{"message": f"Ошибка YAML: {str(e)}"}],
-                            "warnings": [],
-                            "is_yaml": False
-                        }
+                # Обычный YAML (в том числе несколько документов через ---)
+                yaml_result = validate_yaml_stream(content)
+                return {
+                    "type": "yaml",
+                    "validation": {
+                        "valid": yaml_result["valid"],
+                        "errors": yaml_result["errors"],
+                        "warnings": [],
+                        "is_yaml": yaml_result["valid"],
+                        "documents": yaml_result["documents"]
                     }
+                }
+        
+        elif filename_lower.endswith('.tpl'):
+            # Именованные шаблоны Helm (_helpers.tpl): Go-шаблон, не YAML
+            return {
+                "type": "helm_template",
+                "validation": self._validate_helm(content, "text")
+            }
         
         elif filename_lower.endswith('.j2') or filename_lower.endswith('.jinja') or filename_lower.endswith('.jinja2'):
             return {
                 "type": "jinja",
-                "validation": self.validate_jinja(content)
+                "validation": self._validate_jinja(content)
             }
         
         elif '{{' in content and '}}' in content:
@@ -230,12 +438,18 @@ class TemplateValidator:
             if '.yaml' in filename_lower or '.yml' in filename_lower:
                 return {
                     "type": "helm_template",
-                    "validation": self.validate_helm(content, "template")
+                    "validation": self._validate_helm(content, "template")
+                }
+            elif is_go_template(content):
+                # Например, templates/NOTES.txt
+                return {
+                    "type": "helm_template",
+                    "validation": self._validate_helm(content, "text")
                 }
             else:
                 return {
                     "type": "jinja",
-                    "validation": self.validate_jinja(content)
+                    "validation": self._validate_jinja(content)
                 }
         
         else:
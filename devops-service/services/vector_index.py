@@ -0,0 +1,233 @@
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+from data.atomic import atomic_dump_json, file_lock
+from services.metrics import metrics
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
+
+
+def chunk_text(title: str, text: str, size: int = 1000, overlap: int = 100) -> List[str]:
+    """Делит текст записи на фрагменты по size символов с перекрытием (заголовок - в каждом)"""
+    text = text.strip()
+    if len(text) <= size:
+        return [f"{title}\n{text}".strip()]
+    chunks = []
+    step = max(size - overlap, 1)
+    for start in range(0, len(text), step):
+        chunks.append(f"{title}\n{text[start:start + size]}".strip())
+        if start + size >= len(text):
+            break
+    return chunks
+
+
+class VectorIndex:
+    """
+    Семантический индекс по эмбеддингам Ollama (/api/embeddings).
+
+    Записи делятся на фрагменты, векторы фрагментов нормализуются и хранятся
+    в матрице NumPy на диске (<index_dir>/vectors.npy, открывается через mmap)
+    с метаданными в vectors.json. При синхронизации эмбеддинги считаются
+    только для новых и изменившихся записей (по хэшу текста).
+    Поиск - косинусная близость запроса со всей матрицей одним умножением.
+    """
+
+    def __init__(self, client_getter, model: str, index_dir: str = "data/vectors",
+                 chunk_size: int = 1000, concurrency: int = 4, keep_alive: Union[str, int, None] = None):
+        # client_getter возвращает общий httpx.AsyncClient LLMService
+        self._client_getter = client_getter
+        self.model = model
+        self.index_dir = Path(index_dir)
+        self.matrix_path = self.index_dir / "vectors.npy"
+        self.meta_path = self.index_dir / "vectors.json"
+        self.chunk_size = chunk_size
+        self.concurrency = concurrency
+        # Сколько Ollama держит модель эмбеддингов в памяти после запроса
+        self.keep_alive = keep_alive
+        self._lock = asyncio.Lock()
+        self._matrix = None
+        # Строка матрицы -> doc_id и хэш текста записи
+        self._row_docs: List[str] = []
+        self._doc_hashes: Dict[str, str] = {}
+        # Версия RetrievalIndex, с которой индекс синхронизирован последним
+        self.synced_generation: Optional[int] = None
+        self._loaded = False
+
+    def _text_hash(self, title: str, text: str) -> str:
+        return hashlib.sha1(f"{self.model}\0{self.chunk_size}\0{title}\0{text}".encode("utf-8")).hexdigest()
+
+    def _load(self):
+        """Открывает сохраненный индекс (матрица через mmap)"""
+        if self._loaded:
+            return
+        self._loaded = True
+        if not self.meta_path.exists() or not self.matrix_path.exists():
+            return
+        try:
+            with open(self.meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            matrix = np.load(self.matrix_path, mmap_mode='r')
+            if meta.get("model") != self.model or matrix.shape[0] != len(meta.get("rows", [])):
+                # Другая модель или несогласованные файлы - индекс строится заново
+                return
+            self._matrix = matrix
+            self._row_docs = meta["rows"]
+            self._doc_hashes = meta.get("hashes", {})
+        except Exception as e:
+            print(f"Ошибка загрузки векторного индекса: {e}")
+
+    def _save(self, matrix, row_docs: List[str], doc_hashes: Dict[str, str]):
+        """Атомарно сохраняет матрицу и метаданные, возвращает матрицу, заново открытую через mmap"""
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        with file_lock(str(self.matrix_path)):
+            fd, tmp_path = tempfile.mkstemp(dir=str(self.index_dir), prefix=".vectors.", suffix=".npy")
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    np.save(f, matrix)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.chmod(tmp_path, 0o644)
+                os.replace(tmp_path, self.matrix_path)
+            except BaseException:
+                try:
+                    os.unlink(tmp_path)
+                except OSError:
+                    pass
+                raise
+            atomic_dump_json(str(self.meta_path), {
+                "model": self.model,
+                "dim": int(matrix.shape[1]) if matrix.ndim == 2 else 0,
+                "rows": row_docs,
+                "hashes": doc_hashes,
+            }, indent=None)
+        return np.load(self.matrix_path, mmap_mode='r') if len(row_docs) else matrix
+
+    def _payload(self, text: str) -> Dict[str, object]:
+        payload = {"model": self.model, "prompt": text}
+        if self.keep_alive is not None:
+            payload["keep_alive"] = self.keep_alive
+        return payload
+
+    async def _embed_one(self, text: str, semaphore: asyncio.Semaphore):
+        async with semaphore:
+            response = await self._client_getter().post(
+                "/api/embeddings",
+                json=self._payload(text)
+            )
+        response.raise_for_status()
+        vector = np.asarray(response.json()["embedding"], dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    async def _embed(self, texts: List[str]):
+        """Эмбеддинги пачки текстов (параллельно, не более concurrency запросов)"""
+        semaphore = asyncio.Semaphore(self.concurrency)
+        vectors = await asyncio.gather(*(self._embed_one(text, semaphore) for text in texts))
+        return np.vstack(vectors) if vectors else None
+
+    async def sync(self, documents: Dict[str, Tuple[str, str]], generation: Optional[int] = None):
+        """Приводит индекс к набору документов, пересчитывая эмбеддинги только измененных"""
+        async with self._lock:
+            self._load()
+            if generation is not None and generation == self.synced_generation:
+                return
+
+            hashes = {doc_id: self._text_hash(title, text) for doc_id, (title, text) in documents.items()}
+            changed = [doc_id for doc_id, digest in hashes.items() if self._doc_hashes.get(doc_id) != digest]
+            removed = set(self._doc_hashes) - set(hashes)
+
+            if changed or removed:
+                started = time.perf_counter()
+                new_chunks: List[Tuple[str, str]] = []
+                for doc_id in changed:
+                    title, text = documents[doc_id]
+                    new_chunks.extend((doc_id, chunk) for chunk in chunk_text(title, text, self.chunk_size))
+                new_vectors = await self._embed([chunk for _, chunk in new_chunks])
+
+                # Сохраняем строки неизмененных записей и дописываем новые
+                stale = removed.union(changed)
+                keep = [i for i, doc_id in enumerate(self._row_docs) if doc_id not in stale]
+                parts = []
+                if keep and self._matrix is not None:
+                    parts.append(np.asarray(self._matrix[keep]))
+                if new_vectors is not None:
+                    parts.append(new_vectors)
+                row_docs = [self._row_docs[i] for i in keep] + [doc_id for doc_id, _ in new_chunks]
+                matrix = np.vstack(parts) if parts else np.zeros((0, 0), dtype=np.float32)
+                matrix = await asyncio.get_running_loop().run_in_executor(None, self._save, matrix, row_docs, hashes)
+                # Состояние меняется в цикле событий, чтобы поиск не увидел матрицу без строк
+                self._matrix, self._row_docs, self._doc_hashes = matrix, row_docs, hashes
+
+                metrics.inc("rag_embedded_chunks", len(new_chunks))
+                metrics.observe("rag_sync_seconds", time.perf_counter() - started)
+            self.synced_generation = generation
+
+    @staticmethod
+    def _rank(matrix, row_docs: List[str], query_vector, top_k: int, min_score: float) -> List[Tuple[str, float]]:
+        """Косинусная близость запроса со всеми фрагментами и лучшие записи"""
+        scores = np.asarray(matrix @ query_vector)
+
+        # Берем с запасом фрагментов: у одной записи их может быть несколько
+        candidates = min(len(scores), top_k * 4)
+        top_rows = np.argpartition(-scores, candidates - 1)[:candidates]
+        top_rows = top_rows[np.argsort(-scores[top_rows])]
+
+        results: List[Tuple[str, float]] = []
+        seen = set()
+        for row in top_rows:
+            score = float(scores[row])
+            if score < min_score:
+                break
+            doc_id = row_docs[row]
+            if doc_id in seen:
+                continue
+            seen.add(doc_id)
+            results.append((doc_id, score))
+            if len(results) >= top_k:
+                break
+        return results
+
+    async def search(self, query: str, top_k: int = 6, min_score: float = 0.0) -> List[Tuple[str, float]]:
+        """Возвращает до top_k записей [(doc_id, score)] по убыванию близости к запросу"""
+        self._load()
+        if self._matrix is None or not len(self._row_docs):
+            return []
+        started = time.perf_counter()
+        query_vector = (await self._embed([query]))[0]
+        # Умножение на матрицу (с чтением mmap) и сортировка - в пуле потоков, как и запись индекса
+        results = await asyncio.get_running_loop().run_in_executor(
+            None, self._rank, self._matrix, self._row_docs, query_vector, top_k, min_score
+        )
+        metrics.observe("rag_search_seconds", time.perf_counter() - started)
+        return results
+
+
+def create_vector_index(client_getter, keep_alive: Union[str, int, None] = None) -> Optional[VectorIndex]:
+    """
+    Создает векторный индекс, если задана модель эмбеддингов (OLLAMA_EMBED_MODEL)
+    и установлен numpy; иначе контекст ищется только по BM25.
+    """
+    model = os.getenv("OLLAMA_EMBED_MODEL", "")
+    if not model:
+        return None
+    if not NUMPY_AVAILABLE:
+        print("Предупреждение: OLLAMA_EMBED_MODEL задан, но numpy не установлен - семантический поиск отключен")
+        return None
+    return VectorIndex(
+        client_getter,
+        model,
+        index_dir=os.getenv("RAG_INDEX_DIR", "data/vectors"),
+        chunk_size=int(os.getenv("RAG_CHUNK_SIZE", "1000")),
+        concurrency=int(os.getenv("RAG_EMBED_CONCURRENCY", "4")),
+        keep_alive=keep_alive
+    )
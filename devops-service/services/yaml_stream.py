@@ -0,0 +1,83 @@
+import re
+from typing import Any, Dict
+import yaml
+
+try:
+    # Парсер на libyaml (C) - в разы быстрее чистого Python
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:  # PyYAML собран без libyaml
+    from yaml import SafeLoader
+
+# Начало документа: строка "---" (возможно, с содержимым после пробела)
+DOCUMENT_START_RE = re.compile(r'^---(?=[ \t]|$)', re.M)
+
+
+def load_yaml(content: str) -> Any:
+    """yaml.safe_load через SafeLoader на libyaml, если он доступен"""
+    return yaml.load(content, Loader=SafeLoader)
+
+
+def _error(e: yaml.YAMLError, line_offset: int, document: int) -> Dict[str, Any]:
+    """Ошибка YAML с номером строки и столбца (с 1) во всем тексте"""
+    mark = getattr(e, "problem_mark", None) or getattr(e, "context_mark", None)
+    if isinstance(e, yaml.MarkedYAMLError):
+        message = ", ".join(part for part in (e.context, e.problem) if part) or str(e)
+    else:
+        message = str(e)
+    return {
+        "message": f"Ошибка YAML: {message}",
+        "line": mark.line + line_offset + 1 if mark is not None else None,
+        "column": mark.column + 1 if mark is not None else None,
+        "document": document,
+        "filename": "template"
+    }
+
+
+def _next_document(content: str, pos: int, line: int, error: Dict[str, Any]):
+    """
+    Позиция и номер строки (с 0) "---", с которого продолжается разбор после
+    ошибки, или None. Ошибка на самом "---" (незавершенный предыдущий
+    документ) - продолжаем с него, иначе - со следующего.
+    """
+    error_line = error["line"] - 1
+    start = pos
+    for match in DOCUMENT_START_RE.finditer(content, pos):
+        line += content.count("\n", pos, match.start())
+        pos = match.start()
+        if line > error_line or (line == error_line and error["column"] == 1 and pos > start):
+            return pos, line
+    return None
+
+
+def validate_yaml_stream(content: str, max_errors: int = 20, keep_first: bool = False) -> Dict[str, Any]:
+    """
+    Проверка YAML из нескольких документов (---) с ошибками по строкам и столбцам.
+
+    Документы разбираются по одному (safe_load_all), дерево объектов
+    каждого документа освобождается перед разбором следующего, поэтому
+    память ограничена размером самого большого документа, а не всего
+    релиза. После ошибки разбор продолжается со следующего "---", так что
+    ошибки в разных документах находятся за одну проверку (не больше
+    max_errors). keep_first - вернуть первый документ в "first_document"
+    (нужен для проверки полей Chart.yaml).
+    """
+    result = {"valid": True, "errors": [], "documents": 0, "first_document": None}
+    pos, line = 0, 0
+    while True:
+        try:
+            for data in yaml.load_all(content[pos:] if pos else content, Loader=SafeLoader):
+                if keep_first and result["documents"] == 0:
+                    result["first_document"] = data
+                result["documents"] += 1
+            return result
+        except yaml.YAMLError as e:
+            result["valid"] = False
+            result["documents"] += 1
+            error = _error(e, line, result["documents"])
+            result["errors"].append(error)
+            if error["line"] is None or len(result["errors"]) >= max_errors:
+                return result
+            resume = _next_document(content, pos, line, error)
+            if resume is None:
+                return result
+            pos, line = resume
@@ -0,0 +1,64 @@
+import os
+import threading
+import time
+import pytest
+from data import atomic
+from data.atomic import atomic_dump_json, atomic_write_text, file_lock
+
+
+def test_atomic_write_replaces_file_and_keeps_mode(tmp_path):
+    path = tmp_path / "data.json"
+    path.write_text("old", encoding="utf-8")
+    os.chmod(path, 0o640)
+    atomic_write_text(str(path), "new")
+    assert path.read_text(encoding="utf-8") == "new"
+    assert os.stat(path).st_mode & 0o777 == 0o640
+    assert os.listdir(tmp_path) == ["data.json"]
+
+
+def test_failed_write_keeps_old_content_and_removes_temp_file(tmp_path, monkeypatch):
+    path = tmp_path / "data.json"
+    path.write_text("old", encoding="utf-8")
+
+    def broken_replace(src, dst):
+        raise OSError("диск заполнен")
+
+    monkeypatch.setattr(atomic.os, "replace", broken_replace)
+    with pytest.raises(OSError):
+        atomic_write_text(str(path), "new")
+    assert path.read_text(encoding="utf-8") == "old"
+    assert os.listdir(tmp_path) == ["data.json"]
+
+
+def test_atomic_dump_json(tmp_path):
+    path = tmp_path / "data.json"
+    atomic_dump_json(str(path), {"имя": "значение"})
+    assert "значение" in path.read_text(encoding="utf-8")
+
+
+def test_file_lock_is_reentrant(tmp_path):
+    path = str(tmp_path / "data.json")
+    with file_lock(path):
+        with file_lock(path):
+            atomic_write_text(path, "x")
+    assert os.path.exists(f"{path}.lock")
+
+
+def test_file_lock_excludes_other_threads(tmp_path):
+    path = str(tmp_path / "data.json")
+    events = []
+    locked = threading.Event()
+
+    def writer():
+        locked.wait()
+        with file_lock(path):
+            events.append("второй")
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    with file_lock(path):
+        locked.set()
+        time.sleep(0.1)
+        events.append("первый")
+    thread.join(timeout=5)
+    assert events == ["первый", "второй"]
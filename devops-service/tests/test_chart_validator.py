@@ -0,0 +1,81 @@
+import asyncio
+import io
+import tarfile
+import zipfile
+import pytest
+from services.chart_validator import ChartError, ChartValidator
+from services.template_validator import TemplateValidator
+
+
+@pytest.fixture
+def charts():
+    validator = ChartValidator(TemplateValidator(cache_size=0), max_files=5, max_bytes=1024 * 1024)
+    yield validator
+    validator.shutdown()
+
+
+def tar_archive(members) -> io.BytesIO:
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w:gz") as archive:
+        for name, data in members:
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            archive.addfile(info, io.BytesIO(data))
+    buffer.seek(0)
+    return buffer
+
+
+def test_extracts_chart_files_and_skips_others(charts):
+    archive = tar_archive([
+        ("mychart/Chart.yaml", b"apiVersion: v2\nname: mychart\nversion: 0.1.0\n"),
+        ("mychart/templates/_helpers.tpl", b'{{- define "x" }}x{{- end }}\n'),
+        ("mychart/logo.png", b"\x89PNG"),
+        ("mychart/templates/bin.yaml", b"\xff\xfe"),
+    ])
+    files, skipped = charts.extract([("mychart.tgz", archive)])
+    assert [name for name, _ in files] == ["mychart/Chart.yaml", "mychart/templates/_helpers.tpl"]
+    assert {item["filename"] for item in skipped} == {"mychart/logo.png", "mychart/templates/bin.yaml"}
+
+
+def test_zip_bomb_is_stopped_at_the_size_limit(charts):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("chart/values.yaml", b"a" * (50 * 1024 * 1024))
+    buffer.seek(0)
+    assert len(buffer.getvalue()) < 1024 * 1024
+    with pytest.raises(ChartError, match="МБ"):
+        charts.extract([("bomb.zip", buffer)])
+
+
+def test_file_count_limit(charts):
+    archive = tar_archive([(f"chart/templates/{i}.yaml", b"a: 1\n") for i in range(6)])
+    with pytest.raises(ChartError, match="файлов"):
+        charts.extract([("many.tgz", archive)])
+
+
+def test_path_traversal_is_not_extracted(charts):
+    archive = tar_archive([
+        ("../../etc/evil.yaml", b"a: 1\n"),
+        ("chart/../../escape.yaml", b"a: 1\n"),
+        ("/abs/values.yaml", b"a: 1\n"),
+    ])
+    files, skipped = charts.extract([("evil.tgz", archive)])
+    assert [name for name, _ in files] == ["abs/values.yaml"]
+    assert {item["filename"] for item in skipped} == {"../../etc/evil.yaml", "../escape.yaml"}
+
+
+def test_broken_archive(charts):
+    with pytest.raises(ChartError):
+        charts.extract([("broken.tgz", io.BytesIO(b"not an archive"))])
+
+
+def test_same_path_in_two_uploads_keeps_both_results(charts):
+    first = tar_archive([("mychart/values.yaml", b"a: 1\n")])
+    second = tar_archive([("mychart/values.yaml", b"a: [\n")])
+    files, _ = charts.extract([("v1.tgz", first), ("v2.tgz", second)])
+    assert [name for name, _ in files] == ["mychart/values.yaml", "#2/mychart/values.yaml"]
+    report = asyncio.run(charts.validate(files))
+    assert {f["filename"]: f["validation"]["valid"] for f in report["files"]} == {
+        "mychart/values.yaml": True,
+        "#2/mychart/values.yaml": False,
+    }
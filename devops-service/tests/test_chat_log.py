@@ -0,0 +1,57 @@
+import json
+from data.chat_log import ChatLog
+
+
+def message(i: int) -> dict:
+    return {"role": "user", "content": f"сообщение {i}"}
+
+
+def test_tail_across_block_boundaries(tmp_path):
+    log = ChatLog(str(tmp_path), compact_every=0)
+    log.TAIL_BLOCK_SIZE = 16
+    for i in range(50):
+        log.append("alice", message(i))
+    assert log.tail("alice", 5) == [message(i) for i in range(45, 50)]
+    assert log.tail("alice", 100) == [message(i) for i in range(50)]
+    assert log.tail("alice", 0) == []
+    assert log.tail("nobody", 5) == []
+
+
+def test_broken_line_is_skipped_and_next_append_starts_new_line(tmp_path):
+    log = ChatLog(str(tmp_path), compact_every=0)
+    log.append("alice", message(1))
+    with open(tmp_path / "alice.jsonl", "ab") as f:
+        f.write(b'{"role": "user", "cont')
+    log.append("alice", message(2))
+    assert log.read_all("alice") == [message(1), message(2)]
+    assert log.tail("alice", 1) == [message(2)]
+
+
+def test_compaction_keeps_last_messages_and_drops_broken_lines(tmp_path):
+    log = ChatLog(str(tmp_path), compact_every=0, max_messages=3)
+    for i in range(5):
+        log.append("alice", message(i))
+    with open(tmp_path / "alice.jsonl", "ab") as f:
+        f.write(b"not json\n")
+    log.compact("alice")
+    lines = (tmp_path / "alice.jsonl").read_text(encoding="utf-8").splitlines()
+    assert [json.loads(line) for line in lines] == [message(i) for i in range(2, 5)]
+
+
+def test_compaction_runs_every_n_appends(tmp_path):
+    log = ChatLog(str(tmp_path), compact_every=4, max_messages=2)
+    for i in range(4):
+        log.append("alice", message(i))
+    assert log.read_all("alice") == [message(2), message(3)]
+    log.append("alice", message(4))
+    assert log.read_all("alice") == [message(2), message(3), message(4)]
+
+
+def test_legacy_json_is_read_and_migrated_on_append(tmp_path):
+    (tmp_path / "bob.json").write_text(json.dumps({"messages": [message(1)]}), encoding="utf-8")
+    log = ChatLog(str(tmp_path), compact_every=0)
+    assert log.tail("bob", 5) == [message(1)]
+    log.append("bob", message(2))
+    assert not (tmp_path / "bob.json").exists()
+    assert log.read_all("bob") == [message(1), message(2)]
+    assert log.usernames() == ["bob"]
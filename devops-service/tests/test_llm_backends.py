@@ -0,0 +1,110 @@
+import asyncio
+import time
+import httpx
+import pytest
+from services.llm_backends import Backend, BackendPool, Endpoint, NoBackendAvailable
+
+
+def make_backend(url: str, fallback: bool = False, capacity: int = 1) -> Backend:
+    return Backend(Endpoint(url), "llama", capacity=capacity, fallback=fallback, failure_threshold=2, cooldown=30)
+
+
+def open_circuit(backend: Backend):
+    """Отключает бэкенд и переносит конец cooldown в прошлое"""
+    for _ in range(backend.failure_threshold):
+        backend.record_failure()
+    backend.open_until = time.time() - 1
+
+
+def test_circuit_opens_after_threshold_and_half_opens_after_cooldown():
+    backend = make_backend("http://a")
+    now = time.time()
+    backend.record_failure()
+    assert backend.available(now) and backend.state(now) == Backend.CLOSED
+    backend.record_failure()
+    assert not backend.available(now) and backend.state(now) == Backend.OPEN
+    assert backend.available(now + 31) and backend.state(now + 31) == Backend.HALF_OPEN
+    backend.record_success()
+    assert backend.failures == 0 and backend.state(time.time()) == Backend.CLOSED
+
+
+def test_half_open_admits_single_probe():
+    async def scenario():
+        backend = make_backend("http://a")
+        pool = BackendPool([backend])
+        open_circuit(backend)
+        async with pool.lease() as probe:
+            assert probe.probe
+            # Пока идет пробный запрос, другие запросы бэкенд не получает
+            with pytest.raises(NoBackendAvailable):
+                pool.choose()
+        assert backend.state(time.time()) == Backend.CLOSED and not backend.probing
+
+        open_circuit(backend)
+        async with pool.lease() as probe:
+            probe.fail()
+        assert backend.state(time.time()) == Backend.OPEN and not backend.probing
+
+    asyncio.run(scenario())
+
+
+def test_choose_skips_open_circuit_and_uses_fallback():
+    primary, fallback = make_backend("http://a"), make_backend("http://b", fallback=True)
+    pool = BackendPool([primary], [fallback])
+    assert pool.choose() is primary
+    primary.record_failure()
+    primary.record_failure()
+    assert pool.choose() is fallback
+    fallback.record_failure()
+    fallback.record_failure()
+    with pytest.raises(NoBackendAvailable):
+        pool.choose()
+
+
+def test_saturated_primary_spills_to_free_fallback():
+    primary, fallback = make_backend("http://a"), make_backend("http://b", fallback=True)
+    pool = BackendPool([primary], [fallback])
+    primary.outstanding = 1
+    assert pool.choose() is fallback
+    fallback.outstanding = 1
+    assert pool.choose() is primary
+
+
+def test_lease_counts_failures_and_successes():
+    async def scenario():
+        backend = make_backend("http://a")
+        pool = BackendPool([backend])
+        async with pool.lease() as lease:
+            assert backend.outstanding == 1
+            lease.fail()
+        assert backend.failures == 1 and backend.outstanding == 0
+        with pytest.raises(httpx.ConnectError):
+            async with pool.lease():
+                raise httpx.ConnectError("connection refused")
+        assert not backend.available(time.time())
+        backend.open_until = time.time() - 1
+        async with pool.lease():
+            pass
+        assert backend.failures == 0
+
+    asyncio.run(scenario())
+
+
+def test_read_timeout_is_not_a_backend_failure():
+    async def scenario():
+        backend = make_backend("http://a")
+        pool = BackendPool([backend])
+        for _ in range(3):
+            with pytest.raises(httpx.ReadTimeout):
+                async with pool.lease():
+                    raise httpx.ReadTimeout("slow answer")
+        assert backend.failures == 0 and backend.available(time.time())
+
+        # Таймаут пробного запроса не закрывает и не отключает бэкенд, а освобождает пробу
+        open_circuit(backend)
+        with pytest.raises(httpx.ReadTimeout):
+            async with pool.lease():
+                raise httpx.ReadTimeout("slow answer")
+        assert backend.state(time.time()) == Backend.HALF_OPEN and backend.available(time.time())
+
+    asyncio.run(scenario())
@@ -0,0 +1,108 @@
+import asyncio
+import pytest
+from services.llm_scheduler import LLMScheduler, SchedulerRejected
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_per_user_limit_rejects_with_429():
+    async def scenario():
+        scheduler = LLMScheduler(max_concurrency=2, per_user=1)
+        async with scheduler.slot("alice"):
+            with pytest.raises(SchedulerRejected) as rejected:
+                await scheduler.acquire("alice")
+            assert rejected.value.status_code == 429
+            assert rejected.value.retry_after >= 1
+        # Слот освобожден - снова можно
+        async with scheduler.slot("alice"):
+            pass
+
+    run(scenario())
+
+
+def test_queue_full_rejects_with_503():
+    async def scenario():
+        scheduler = LLMScheduler(max_concurrency=1, max_queue=1, per_user=5)
+        running = await scheduler.acquire("a")
+        waiting = asyncio.ensure_future(scheduler.acquire("b"))
+        await asyncio.sleep(0)
+        with pytest.raises(SchedulerRejected) as rejected:
+            await scheduler.acquire("c")
+        assert rejected.value.status_code == 503
+        running.release()
+        (await waiting).release()
+        assert scheduler._running == 0 and scheduler._waiting == 0
+
+    run(scenario())
+
+
+def test_concurrency_limit_and_fifo_handover():
+    async def scenario():
+        scheduler = LLMScheduler(max_concurrency=2, per_user=10)
+        peak = 0
+
+        async def job():
+            nonlocal peak
+            async with scheduler.slot("user"):
+                peak = max(peak, scheduler._running)
+                await asyncio.sleep(0.01)
+
+        await asyncio.gather(*(job() for _ in range(6)))
+        assert peak == 2
+        assert scheduler._user_counts == {}
+
+    run(scenario())
+
+
+def test_queue_timeout_and_cancellation_release_counters():
+    async def scenario():
+        scheduler = LLMScheduler(max_concurrency=1, per_user=5, queue_timeout=0.05)
+        running = await scheduler.acquire("a")
+        with pytest.raises(SchedulerRejected) as rejected:
+            await scheduler.acquire("b")
+        assert rejected.value.status_code == 503
+
+        waiting = asyncio.ensure_future(scheduler.acquire("c"))
+        await asyncio.sleep(0)
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        assert scheduler._waiting == 0
+        assert scheduler._user_counts == {"a": 1}
+        running.release()
+        running.release()
+        assert scheduler._user_counts == {} and scheduler._running == 0
+
+    run(scenario())
+
+
+def test_no_wait_acquire_fails_when_busy():
+    async def scenario():
+        scheduler = LLMScheduler(max_concurrency=1, per_user=5)
+        async with scheduler.slot("a"):
+            with pytest.raises(SchedulerRejected):
+                await scheduler.acquire("warmup", wait=False)
+
+    run(scenario())
+
+
+def test_cancel_right_after_handover_does_not_leak_slot():
+    async def scenario():
+        scheduler = LLMScheduler(max_concurrency=1, per_user=5)
+        running = await scheduler.acquire("a")
+        waiting = asyncio.ensure_future(scheduler.acquire("b"))
+        await asyncio.sleep(0)
+        # Слот передан ожидающему, но запрос отменен до того, как он его забрал
+        running.release()
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        ticket = await asyncio.wait_for(scheduler.acquire("c"), timeout=1)
+        ticket.release()
+        await asyncio.sleep(0)
+        assert not scheduler._semaphore.locked()
+        assert scheduler._running == 0 and scheduler._user_counts == {}
+
+    run(scenario())
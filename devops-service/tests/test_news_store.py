@@ -0,0 +1,93 @@
+from datetime import datetime, timedelta
+import pydantic
+import pytest
+from auth.models import News
+from data.news_manager import NewsManager
+from data.news_store import NewsStore
+
+BASE = datetime(2024, 5, 1, 12, 0, 0)
+
+
+def make_news(news_id: str, created_at: datetime, label: str = "release") -> News:
+    return News(id=news_id, title=f"Новость {news_id}", content="текст", label=label,
+                author="admin", created_at=created_at)
+
+
+def make_store(tmp_path, items) -> NewsStore:
+    store = NewsStore(str(tmp_path / "news.json"))
+    store.ensure_file()
+    for news in items:
+        store.put(news)
+    return store
+
+
+def walk_pages(store: NewsStore, limit: int, **filters):
+    """Все страницы по курсору (created_at, id) последней новости"""
+    seen, cursor = [], None
+    while True:
+        if cursor is None:
+            items, _, has_next = store.page(0, limit, **filters)
+        else:
+            items, _, has_next = store.page(0, limit, created_before=cursor[0], before_id=cursor[1], **filters)
+        seen.extend(news.id for news in items)
+        if not has_next:
+            return seen
+        cursor = (items[-1].created_at, items[-1].id)
+
+
+def test_page_orders_newest_first(tmp_path):
+    store = make_store(tmp_path, [make_news(str(i), BASE + timedelta(minutes=i)) for i in range(5)])
+    items, total, has_next = store.page(0, 3)
+    assert [news.id for news in items] == ["4", "3", "2"]
+    assert total == 5 and has_next
+    items, _, has_next = store.page(3, 3)
+    assert [news.id for news in items] == ["1", "0"] and not has_next
+
+
+def test_cursor_does_not_skip_equal_timestamps(tmp_path):
+    items = [make_news(f"n{i:02d}", BASE) for i in range(10)]
+    items += [make_news("older", BASE - timedelta(days=1)), make_news("newer", BASE + timedelta(days=1))]
+    store = make_store(tmp_path, items)
+    seen = walk_pages(store, limit=3)
+    assert len(seen) == len(set(seen)) == 12
+    assert seen[0] == "newer" and seen[-1] == "older"
+
+
+def test_cursor_with_label_and_date_filters(tmp_path):
+    items = [make_news(f"a{i}", BASE, "release") for i in range(4)]
+    items += [make_news(f"b{i}", BASE, "incident") for i in range(4)]
+    items.append(make_news("late", BASE + timedelta(days=10), "release"))
+    store = make_store(tmp_path, items)
+    seen = walk_pages(store, limit=3, label="release", date_to=BASE + timedelta(days=1))
+    assert sorted(seen) == ["a0", "a1", "a2", "a3"]
+
+
+def test_manager_cursor_round_trip(tmp_path):
+    manager = NewsManager(str(tmp_path))
+    for i in range(7):
+        manager.store.put(make_news(f"m{i}", BASE))
+    seen, cursor = [], None
+    while True:
+        result = manager.get_all_news(per_page=3, created_before=cursor)
+        seen.extend(news.id for news in result["news"])
+        cursor = result["next_cursor"]
+        if cursor is None:
+            break
+    assert sorted(seen) == [f"m{i}" for i in range(7)]
+
+
+def test_external_file_change_is_reloaded(tmp_path):
+    store = make_store(tmp_path, [make_news("a", BASE)])
+    other = NewsStore(store.news_file)
+    other.put(make_news("b", BASE + timedelta(minutes=1)))
+    assert [news.id for news in store.page(0, 10)[0]] == ["b", "a"]
+
+
+def test_cached_news_cannot_be_mutated_in_place(tmp_path):
+    store = make_store(tmp_path, [make_news("a", BASE)])
+    with pytest.raises(pydantic.ValidationError):
+        store.get("a").title = "изменено"
+    updated = store.get("a").model_copy(update={"title": "изменено"})
+    store.put(updated)
+    assert store.get("a").title == "изменено"
+    assert [news.id for news in store.search("изменено")] == ["a"]
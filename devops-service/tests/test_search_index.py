@@ -0,0 +1,65 @@
+from data.search_index import InvertedIndex, stem, tokenize
+
+
+def test_stem_merges_word_forms():
+    assert stem("сервисы") == stem("сервисов") == stem("сервис")
+    assert stem("deployments") == stem("deployment")
+    assert stem("running") == stem("runs")
+
+
+def test_tokenize_lowercases_and_keeps_digits():
+    assert tokenize("Kubernetes 1.29 и K8S") == [stem("kubernetes"), "1", "29", stem("и"), "k8s"]
+    assert tokenize("") == []
+
+
+def test_bm25_ranks_title_and_frequency_higher():
+    index = InvertedIndex()
+    index.add("title", "Обновление сервиса", "плановые работы")
+    index.add("body", "Плановые работы", "обновление базы данных")
+    index.add("other", "Отпуск", "график отпусков")
+    ranked = index.search("обновление")
+    assert [doc_id for doc_id, _ in ranked] == ["title", "body"]
+    assert ranked[0][1] > ranked[1][1] > 0
+
+
+def test_word_forms_and_prefix_match():
+    index = InvertedIndex()
+    index.add("a", "Деплой сервисов", "")
+    index.add("b", "Мониторинг", "prometheus и grafana")
+    assert [doc_id for doc_id, _ in index.search("деплоя сервиса")] == ["a"]
+    assert [doc_id for doc_id, _ in index.search("promet")] == ["b"]
+
+
+def test_short_terms_match_as_substring():
+    index = InvertedIndex()
+    index.add("a", "Кластер k8s-prod", "")
+    index.add("b", "Predeploy checks", "")
+    assert {doc_id for doc_id, _ in index.search("k8")} == {"a"}
+    assert {doc_id for doc_id, _ in index.search("dep")} == {"b"}
+    index.remove("b")
+    assert index.search("dep") == []
+
+
+def test_add_replaces_and_remove_forgets_document():
+    index = InvertedIndex()
+    index.add("a", "Старый заголовок", "")
+    index.add("a", "Новый заголовок", "")
+    assert index.search("старый") == []
+    assert [doc_id for doc_id, _ in index.search("новый")] == ["a"]
+    index.remove("a")
+    assert len(index) == 0
+    assert index.search("новый") == []
+    assert index._vocab == []
+    assert index._grams == {}
+
+
+def test_rebuild_matches_incremental_add():
+    docs = [("a", "Релиз 1.2", "исправления"), ("b", "Релиз 1.3", "новые функции")]
+    incremental = InvertedIndex()
+    for doc in docs:
+        incremental.add(*doc)
+    rebuilt = InvertedIndex()
+    rebuilt.rebuild(docs)
+    assert rebuilt.search("релиз функции") == incremental.search("релиз функции")
+    assert rebuilt._vocab == incremental._vocab
+    assert rebuilt._grams == incremental._grams
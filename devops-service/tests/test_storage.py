@@ -0,0 +1,41 @@
+import pytest
+from data.data_manager import DataManager
+from data.migrate import migrate
+from data.storage import FileStorage, SQLiteStorage
+
+
+@pytest.fixture(params=["file", "sqlite"])
+def backend(request, tmp_path):
+    if request.param == "sqlite":
+        return SQLiteStorage(str(tmp_path / "portal.db"))
+    return FileStorage(str(tmp_path / "data"))
+
+
+def test_load_page_orders_by_name_and_counts_all(backend):
+    for i in reversed(range(7)):
+        backend.save("deployments", f"app{i}", {"version": i})
+    backend.save("deployments", "other", {"version": 0}, "yaml")
+    records, total = backend.load_page("deployments", 3, 3)
+    assert [name for name, _ in records] == ["app3", "app4", "app5"]
+    assert total == 7
+    assert backend.load_page("deployments", 6, 3)[0] == [("app6", {"version": 6})]
+
+
+def test_manager_page_metadata(tmp_path):
+    manager = DataManager(str(tmp_path / "data"), backend=SQLiteStorage(str(tmp_path / "portal.db")))
+    for i in range(5):
+        manager.save_json(f"item{i}", {"n": i}, "as_fp")
+    page = manager.load_page("as_fp", page=2, per_page=2)
+    assert [item["name"] for item in page["items"]] == ["item2", "item3"]
+    assert (page["total"], page["pages"], page["has_prev"], page["has_next"]) == (5, 3, True, True)
+    assert not manager.load_page("as_fp", page=3, per_page=2)["has_next"]
+
+
+def test_migration_skips_file_only_news(tmp_path):
+    source = FileStorage(str(tmp_path / "data"))
+    source.save("settings", "app", {"a": 1})
+    source.save("news", "news", {"1": {"title": "x"}})
+    migrate(str(tmp_path / "data"), str(tmp_path / "portal.db"))
+    target = SQLiteStorage(str(tmp_path / "portal.db"))
+    assert target.load("settings", "app") == {"a": 1}
+    assert target.list_names("news") == []
@@ -0,0 +1,43 @@
+import signal
+import pytest
+from services import template_renderer
+from services.template_renderer import _init_worker, _render
+
+
+@pytest.fixture(autouse=True)
+def worker_state():
+    """Состояние воркера рендеринга в текущем процессе (без лимита памяти)"""
+    handler = signal.getsignal(signal.SIGPROF) if hasattr(signal, "SIGPROF") else None
+    _init_worker(cache_size=4, cpu_seconds=0.5, max_output=1000, memory_mb=0)
+    yield
+    template_renderer._cache.clear()
+    if handler is not None:
+        signal.signal(signal.SIGPROF, handler)
+
+
+def test_render_and_cache():
+    assert _render("Привет, {{ name }}", {"name": "мир"}) == {"rendered": "Привет, мир", "cached": False}
+    assert _render("Привет, {{ name }}", {"name": "всем"})["cached"] is True
+
+
+def test_sandbox_blocks_python_internals():
+    result = _render("{{ cycler.__init__.__globals__.os.getpid() }}", {})
+    assert "rendered" not in result
+    assert "unsafe" in result["error"]
+
+
+def test_output_limit():
+    assert _render("{{ 'x' * 100000 }}", {})["limit"] is True
+    assert _render("{% for i in range(2000) %}x{% endfor %}", {})["limit"] is True
+
+
+@pytest.mark.skipif(not hasattr(signal, "setitimer"), reason="нет ITIMER_PROF")
+def test_cpu_limit():
+    result = _render("{% for i in range(100000) %}{% for j in range(100000) %}{% endfor %}{% endfor %}", {})
+    assert result["limit"] is True
+    assert "процессорного времени" in result["error"]
+
+
+def test_template_errors_are_returned():
+    assert "error" in _render("{% if %}", {})
+    assert "error" in _render("{{ x.y }}", {})
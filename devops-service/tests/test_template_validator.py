@@ -0,0 +1,72 @@
+from services.helm_lint import DEFAULT_RULES, HelmLinter, LintRule
+from services.template_validator import TemplateValidator, check_go_blocks, neutralize_go_actions
+
+DEPLOYMENT = """apiVersion: apps/v1
+kind: Deployment
+metadata:
+  name: {{ include "app.fullname" . }}
+  labels:
+    {{- include "app.labels" . | nindent 4 }}
+spec:
+  {{- if not .Values.autoscaling.enabled }}
+  replicas: {{ .Values.replicaCount }}
+  {{- end }}
+  template:
+    spec:
+      containers:
+        - name: {{ .Chart.Name }}
+          image: "{{ .Values.image.repository }}:{{ .Values.image.tag | default .Chart.AppVersion }}"
+"""
+
+
+def validator(linter=None) -> TemplateValidator:
+    return TemplateValidator(cache_size=0, linter=linter or HelmLinter())
+
+
+def test_go_template_manifest_is_valid():
+    result = validator().validate_file("templates/deployment.yaml", DEPLOYMENT)
+    assert result["type"] == "helm_template"
+    assert result["validation"]["valid"], result["validation"]["errors"]
+    assert result["validation"]["go_template"]
+
+
+def test_neutralized_text_keeps_lines_and_columns():
+    neutral = neutralize_go_actions(DEPLOYMENT)
+    assert neutral.count("\n") == DEPLOYMENT.count("\n")
+    assert neutral.splitlines()[5] == ""
+    assert neutral.splitlines()[8] == "  replicas: " + "_" * len("{{ .Values.replicaCount }}")
+
+
+def test_helpers_tpl_is_not_parsed_as_jinja():
+    helpers = '{{/* имя */}}\n{{- define "app.name" -}}\n{{ .Chart.Name | trunc 63 }}\n{{- end }}\n'
+    result = validator().validate_file("templates/_helpers.tpl", helpers)
+    assert result["validation"]["valid"], result["validation"]["errors"]
+
+
+def test_unbalanced_blocks_are_errors():
+    errors = check_go_blocks("{{ if .Values.a }}\n{{ end }}\n{{ end }}\n{{ range .Values.b }}\n")
+    assert [error["line"] for error in errors] == [3, 4]
+    assert check_go_blocks("a: {{ .Values.x ")[0]["message"].startswith("Незакрытое")
+
+
+def test_jinja_templates_are_still_parsed_by_jinja():
+    result = validator().validate_jinja("{{ name }} {% if %}")
+    assert not result["valid"]
+    result = validator().validate_file("templates/app.yaml", 'name: "{{ release | upper }}"\n')
+    assert result["validation"]["valid"] and not result["validation"]["go_template"]
+
+
+def test_validation_does_not_execute_templates():
+    result = validator().validate_jinja("{{ cycler.__init__.__globals__.os.getpid() }}")
+    assert result["valid"]
+    assert "rendered" not in result
+
+
+def test_error_after_findings_cap_keeps_template_invalid():
+    rules = DEFAULT_RULES + [LintRule("no-latest", r":latest\b", "Тег latest", "error")]
+    content = "x: {{ .Values. }}\n" * 20 + "image: app:latest\n"
+    findings = HelmLinter(rules, max_findings=5).lint(content)
+    assert len(findings) == 6
+    assert findings[-1]["rule"] == "no-latest" and findings[-1]["line"] == 21
+    result = validator(HelmLinter(rules, max_findings=5)).validate_helm(content)
+    assert not result["valid"]
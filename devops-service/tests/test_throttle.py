@@ -0,0 +1,81 @@
+import pytest
+from auth import throttle
+from auth.throttle import LoginThrottle, LoginThrottled
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(throttle.time, "time", lambda: now[0])
+    return now
+
+
+@pytest.mark.usefixtures("clock")
+def test_ip_limit():
+    limiter = LoginThrottle(ip_limit=3, user_limit=100, window=60)
+    for i in range(3):
+        limiter.check("10.0.0.1", f"user{i}")
+    with pytest.raises(LoginThrottled) as throttled:
+        limiter.check("10.0.0.1", "other")
+    assert throttled.value.status_code == 429
+    assert throttled.value.retry_after == 60
+    # Другой адрес не затронут
+    limiter.check("10.0.0.2", "other")
+
+
+@pytest.mark.usefixtures("clock")
+def test_user_limit_counts_failed_passwords_per_address():
+    limiter = LoginThrottle(ip_limit=100, user_limit=2, window=60)
+    # Попытки без неверного пароля лимит имени не расходуют
+    for _ in range(3):
+        limiter.check("10.0.0.1", "alice")
+    for _ in range(2):
+        limiter.check("10.0.0.1", "alice")
+        limiter.record_failure("10.0.0.1", "alice")
+    with pytest.raises(LoginThrottled) as throttled:
+        limiter.check("10.0.0.1", "alice")
+    assert throttled.value.retry_after == 60
+    # Перебор с одного адреса не блокирует вход владельцу с другого
+    limiter.check("10.0.0.2", "alice")
+    limiter.record_success("10.0.0.1", "alice")
+    limiter.check("10.0.0.1", "alice")
+
+
+@pytest.mark.usefixtures("clock")
+def test_ip_limit_is_checked_before_user_limit():
+    limiter = LoginThrottle(ip_limit=2, user_limit=1, window=60)
+    limiter.check("10.0.0.1", "alice")
+    limiter.record_failure("10.0.0.1", "alice")
+    limiter.check("10.0.0.1", "bob")
+    with pytest.raises(LoginThrottled) as throttled:
+        limiter.check("10.0.0.1", "alice")
+    assert "адреса" in throttled.value.detail
+
+
+def test_window_slides(clock):
+    limiter = LoginThrottle(ip_limit=2, user_limit=100, window=60)
+    limiter.check("10.0.0.1")
+    clock[0] += 30
+    limiter.check("10.0.0.1")
+    with pytest.raises(LoginThrottled) as throttled:
+        limiter.check("10.0.0.1")
+    assert throttled.value.retry_after == 30
+    clock[0] += 31
+    limiter.check("10.0.0.1")
+
+
+def test_rejected_attempt_is_not_counted(clock):
+    limiter = LoginThrottle(ip_limit=1, user_limit=100, window=60)
+    limiter.check("10.0.0.1")
+    for _ in range(5):
+        with pytest.raises(LoginThrottled):
+            limiter.check("10.0.0.1")
+    clock[0] += 61
+    limiter.check("10.0.0.1")
+
+
+def test_key_count_is_bounded(clock):
+    window = throttle.SlidingWindow(limit=5, window=60, max_keys=3)
+    for i in range(10):
+        window.add(f"10.0.0.{i}", clock[0])
+    assert len(window._events) == 3
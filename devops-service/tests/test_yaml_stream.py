@@ -0,0 +1,34 @@
+from services.yaml_stream import validate_yaml_stream
+
+
+def test_multi_document_stream():
+    result = validate_yaml_stream("a: 1\n---\nb: 2\n---\nc: 3\n", keep_first=True)
+    assert result["valid"] and result["documents"] == 3
+    assert result["first_document"] == {"a": 1}
+
+
+def test_errors_in_several_documents_are_found_in_one_pass():
+    content = "a: [1\n---\nb: 1\n---\nc: {\n---\nd: 1\n"
+    result = validate_yaml_stream(content)
+    assert not result["valid"]
+    assert [(error["document"], error["line"]) for error in result["errors"]] == [(1, 2), (3, 6)]
+    assert result["documents"] == 4
+
+
+def test_error_reported_on_document_marker_resumes_from_that_marker():
+    # Незакрытый список первого документа обнаруживается на "---" второго
+    content = "a: [1\n---\nb: {\n---\nc: 1\n"
+    result = validate_yaml_stream(content)
+    assert [error["line"] for error in result["errors"]] == [2, 4]
+
+
+def test_error_in_the_middle_of_a_document():
+    content = "a: 1\nb: [\nc: 2\n---\nd: [\n"
+    result = validate_yaml_stream(content)
+    assert [(error["document"], error["line"]) for error in result["errors"]] == [(1, 4), (2, 6)]
+
+
+def test_max_errors():
+    content = "---\na: [\n" * 10
+    result = validate_yaml_stream(content, max_errors=3)
+    assert len(result["errors"]) == 3